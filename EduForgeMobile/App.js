@@ -281,15 +281,14 @@ function HomeScreen({ route, navigation }) {
 
     if(userRole === 'student') {
         axios.get(`${API_URL}/enrollments/`).then(res => {
-            setMyEnrollments(res.data.filter(e => e.student === userId));
+            setMyEnrollments(res.data);
         });
     }
   };
 
   const fetchNotifications = () => {
-      axios.get(`${API_URL}/notifications/`).then(res => {
-          const unread = res.data.filter(n => !n.is_read).length;
-          setUnreadCount(unread > 0 ? unread : 0);
+      axios.get(`${API_URL}/notifications/unread_count/`).then(res => {
+          setUnreadCount(res.data.unread > 0 ? res.data.unread : 0);
       }).catch(err => console.log('No Notifs'));
   };
 
@@ -369,11 +368,11 @@ function HomeScreen({ route, navigation }) {
               <View style={{flexDirection: 'row', padding: 16, paddingTop: 0, alignItems: 'center'}}>
                  <View style={{flexDirection: 'row', alignItems: 'center', marginRight: 16}}>
                     <Ionicons name="document-text-outline" size={14} color={theme.sub} />
-                    <Text style={{fontSize: 12, color: theme.sub, marginLeft: 4}}>{item.lessons?.length || 0} Lessons</Text>
+                    <Text style={{fontSize: 12, color: theme.sub, marginLeft: 4}}>{item.lesson_count ?? item.lessons?.length ?? 0} Lessons</Text>
                  </View>
                  <View style={{flexDirection: 'row', alignItems: 'center'}}>
                     <Ionicons name="code-slash-outline" size={14} color={theme.sub} />
-                    <Text style={{fontSize: 12, color: theme.sub, marginLeft: 4}}>{item.projects?.length || 0} Assignments</Text>
+                    <Text style={{fontSize: 12, color: theme.sub, marginLeft: 4}}>{item.project_count ?? item.projects?.length ?? 0} Assignments</Text>
                  </View>
               </View>
               {item.isEnrolled && (
@@ -410,7 +409,7 @@ function DetailsScreen({ route, navigation }) {
         setCourse(res.data);
         setLoading(false);
         if(userRole === 'student') {
-           axios.get(`${API_URL}/enrollments/`).then(eRes => {
+           axios.get(`${API_URL}/enrollments/?course=${courseId}`).then(eRes => {
                setEnrolled(eRes.data.some(e => e.student === userId && e.course === courseId));
            });
         }
@@ -453,11 +452,11 @@ function DetailsScreen({ route, navigation }) {
       if (url) Linking.openURL(url).catch(err => Alert.alert("Error", "Could not open link."));
   };
 
-  const handleFileOpen = (fileUrl) => {
-      if (fileUrl) {
-          const fullUrl = fileUrl.startsWith('http') ? fileUrl : `${BASE_URL}${fileUrl}`;
-          Linking.openURL(fullUrl).catch(err => Alert.alert("Error", "Could not open file."));
-      }
+  const handleFileOpen = (attachmentId) => {
+      // Media is served by an authorized view; ask for a short-lived signed link the browser can open
+      axios.get(`${API_URL}/media/lesson-attachments/${attachmentId}/link/`)
+          .then(res => Linking.openURL(res.data.url))
+          .catch(err => Alert.alert("Error", "Could not open file."));
   };
 
   const [alert, setAlert] = useState({visible: false, title:'', message:'', type:''});
@@ -617,7 +616,7 @@ function DetailsScreen({ route, navigation }) {
              <View style={{marginTop: 20}}>
               <Text style={{color: theme.sub, fontWeight: '700', marginBottom: 8}}>Attachments</Text>
               {selectedLesson.attachments.map(att => (
-                <TouchableOpacity key={att.id} style={{flexDirection:'row', alignItems:'center', padding: 12, backgroundColor: theme.card, borderRadius: 10, borderWidth:1, borderColor: theme.border, marginBottom:8}} onPress={() => handleFileOpen(att.file)}>
+                <TouchableOpacity key={att.id} style={{flexDirection:'row', alignItems:'center', padding: 12, backgroundColor: theme.card, borderRadius: 10, borderWidth:1, borderColor: theme.border, marginBottom:8}} onPress={() => handleFileOpen(att.id)}>
                   <Ionicons name="document-attach" size={20} color={theme.accent} />
                   <View style={{marginLeft: 10}}>
                     <Text style={{color: theme.text, fontWeight:'600'}} numberOfLines={1}>{att.display_name || att.file.split('/').pop()}</Text>
@@ -961,18 +960,17 @@ function GradingScreen({ route, navigation }) {
   }, [projectId]));
 
   const fetchSubmissions = () => {
-      axios.get(`${API_URL}/submissions/`).then(res => setSubs(res.data.filter(s => s.project === projectId)));
+      axios.get(`${API_URL}/submissions/?scope=all&project=${projectId}`).then(res => setSubs(res.data));
   };
 
   const handleLinkOpen = (url) => {
       if (url) Linking.openURL(url).catch(() => Alert.alert("Error", "Link invalid."));
   };
 
-  const handleFileOpen = (fileUrl) => {
-      if (fileUrl) {
-          const fullUrl = fileUrl.startsWith('http') ? fileUrl : `${BASE_URL}${fileUrl}`;
-          Linking.openURL(fullUrl).catch(() => Alert.alert("Error", "File invalid."));
-      }
+  const handleFileOpen = (submissionId) => {
+      axios.get(`${API_URL}/media/submissions/${submissionId}/link/`)
+          .then(res => Linking.openURL(res.data.url))
+          .catch(() => Alert.alert("Error", "File invalid."));
   };
 
   const openGradeModal = (item) => {
@@ -1010,7 +1008,7 @@ function GradingScreen({ route, navigation }) {
                        </TouchableOpacity>
                    ) : null}
                    {item.submitted_file ? (
-                       <TouchableOpacity onPress={() => handleFileOpen(item.submitted_file)} style={{marginTop: 5, flexDirection:'row', alignItems:'center'}}>
+                       <TouchableOpacity onPress={() => handleFileOpen(item.id)} style={{marginTop: 5, flexDirection:'row', alignItems:'center'}}>
                            <Ionicons name="document-attach" size={16} color={theme.accent}/>
                            <Text style={{color: theme.primary, marginLeft: 5, textDecorationLine:'underline'}}>View Submitted File</Text>
                        </TouchableOpacity>
@@ -1057,7 +1055,7 @@ function GradesScreen({ navigation }) {
   useFocusEffect(useCallback(() => {
      // Fetch both
      axios.get(`${API_URL}/submissions/`).then(res => setGrades(res.data));
-     axios.get(`${API_URL}/courses/`).then(res => setCourses(res.data));
+     axios.get(`${API_URL}/courses/?expand=projects`).then(res => setCourses(res.data));
   }, []));
 
   // Helper to find details
@@ -1114,23 +1112,36 @@ function QuizScreen({ route, navigation }) {
   const { theme } = useContext(ThemeContext);
   const { quizData } = route.params;
   const [qIndex, setQIndex] = useState(0);
-  const [score, setScore] = useState(0);
-  const [finished, setFinished] = useState(false);
+  const [answers, setAnswers] = useState([]);
+  const [result, setResult] = useState(null);
+  const [submitting, setSubmitting] = useState(false);
 
   if(!quizData.questions.length) return <View style={{flex:1, justifyContent:'center', alignItems:'center', backgroundColor: theme.bg}}><Text style={{color: theme.text}}>No questions.</Text></View>;
 
+  // The answer key never reaches the app: answers are graded by POST /quizzes/<id>/submit/
+  const submit = (chosen) => {
+     setSubmitting(true);
+     axios.post(`${API_URL}/quizzes/${quizData.id}/submit/`, { answers: chosen })
+       .then(res => setResult(res.data))
+       .catch(() => { setAnswers(chosen.slice(0, -1)); Alert.alert("Error", "Could not submit your answers."); })
+       .finally(() => setSubmitting(false));
+  }
+
   const handleAnswer = (choice) => {
-     if(choice.is_correct) setScore(score + 1);
-     if(qIndex < quizData.questions.length - 1) setQIndex(qIndex + 1); else setFinished(true);
+     const chosen = [...answers, choice.id];
+     setAnswers(chosen);
+     if(qIndex < quizData.questions.length - 1) setQIndex(qIndex + 1); else submit(chosen);
   }
 
-  if(finished) return (
+  if(submitting) return <View style={{flex:1, backgroundColor:theme.bg, justifyContent:'center'}}><ActivityIndicator size="large" color={theme.primary} /></View>;
+
+  if(result) return (
      <View style={{flex:1, justifyContent:'center', alignItems:'center', backgroundColor: theme.bg}}>
         <View style={{backgroundColor: theme.card, padding: 40, borderRadius: 20, alignItems: 'center', shadowColor: theme.shadow.shadowColor, shadowOpacity: 0.2, shadowRadius: 10, elevation: 5}}>
            <Ionicons name="trophy" size={80} color={theme.accent} />
            <Text style={{fontSize: 24, fontWeight: 'bold', marginVertical: 20, color: theme.text}}>Quiz Complete!</Text>
-           <Text style={{fontSize: 40, fontWeight: '800', color: theme.primary}}>{Math.round((score / quizData.questions.length) * 100)}%</Text>
-           <Text style={{color: theme.sub, marginBottom: 30}}>{score} out of {quizData.questions.length} correct</Text>
+           <Text style={{fontSize: 40, fontWeight: '800', color: theme.primary}}>{result.max_score ? Math.round((result.score / result.max_score) * 100) : 0}%</Text>
+           <Text style={{color: theme.sub, marginBottom: 30}}>{result.score} out of {result.max_score} correct</Text>
            <TouchableOpacity style={[styles.btnPrimary, {backgroundColor: theme.primary, width: 200}]} onPress={() => navigation.goBack()}>
               <Text style={styles.btnText}>Finish</Text>
            </TouchableOpacity>
@@ -0,0 +1,147 @@
+import copy
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import is_shared
+
+logger = logging.getLogger(__name__)
+
+# --- TOKEN AUTHENTICATION ---
+# CachedTokenAuthentication resolves "Authorization: Token <key>" through two
+# cache levels before falling back to DRF's token+user query:
+#   1. a per-process dict, trusted for LOCAL_TTL seconds (no I/O at all)
+#   2. the shared Django cache, for CACHE_TTL seconds
+# api.signals calls invalidate_user() when a user is saved (deactivated,
+# demoted, password changed) and invalidate_token() when a token is deleted.
+# That clears the shared entry and this process' entry; other processes may
+# keep their in-process copy for at most LOCAL_TTL seconds. This holds only
+# if CACHE_ALIAS is shared by every process (db, file, redis): on a
+# per-process backend (locmem) level 2 is skipped and each process queries
+# the database at most every LOCAL_TTL seconds per token.
+#
+# SignedTokenAuthentication ("Authorization: Signed <token>") needs no database
+# query: the token carries the user's id, name and flags, signed with SECRET_KEY
+# and expiring after SIGNED_TOKEN_MAX_AGE. Each user holding one has a "revoked
+# before" stamp under REVOCATION_ALIAS, a cache that never culls (the 'stamps'
+# alias): issuing seeds it, invalidate_user() moves it forward, so saving a user
+# rejects signed tokens issued earlier; that check is a single cache read. A
+# token whose stamp is missing or cannot be read is rejected, never trusted. A
+# stamp written in one process must be seen by all of them, so signed tokens are
+# disabled unless both aliases are shared.
+
+CACHE_KEY = 'api:auth:token:{}'
+REVOKED_KEY = 'api:auth:revoked:{}'
+SIGNED_SALT = 'api.authentication.signed-token'
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def _config():
+    return getattr(settings, 'API_AUTH', {})
+
+
+def _digest(key):
+    # Never use the raw credential as a cache key (file/db cache backends persist keys)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _shared():
+    return caches[_config().get('CACHE_ALIAS', 'default')]
+
+
+def _shared_tier():
+    return is_shared(_config().get('CACHE_ALIAS', 'default'))
+
+
+def _revocations():
+    return caches[_config().get('REVOCATION_ALIAS', 'stamps')]
+
+
+def invalidate_token(key):
+    digest = _digest(key)
+    _shared().delete(CACHE_KEY.format(digest))
+    with _local_lock:
+        _local.pop(digest, None)
+
+
+def invalidate_user(user_id):
+    _revocations().set(REVOKED_KEY.format(user_id), time.time(), timeout=None)
+    keys = list(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+    if keys:
+        _shared().delete_many([CACHE_KEY.format(_digest(key)) for key in keys])
+    with _local_lock:
+        for digest in [d for d, (user, _) in _local.items() if user.pk == user_id]:
+            del _local[digest]
+
+
+def _remember_locally(digest, user):
+    with _local_lock:
+        if len(_local) >= _config().get('LOCAL_MAX_ENTRIES', 10000):
+            _local.clear()
+        _local[digest] = (user, time.monotonic() + _config().get('LOCAL_TTL', 30))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        digest = _digest(key)
+        entry = _local.get(digest)
+        if entry is not None and entry[1] > time.monotonic():
+            # Copy so per-request state (permission caches etc.) never leaks between requests
+            return copy.copy(entry[0]), None
+        shared_tier = _shared_tier()
+        user = _shared().get(CACHE_KEY.format(digest)) if shared_tier else None
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            if shared_tier:
+                _shared().set(CACHE_KEY.format(digest), user, timeout=_config().get('CACHE_TTL', 300))
+        _remember_locally(digest, user)
+        return copy.copy(user), None
+
+
+def issue_signed_token(user):
+    # A token is only accepted while its user's stamp can be read, so make sure there is one
+    _revocations().add(REVOKED_KEY.format(user.pk), 0, timeout=None)
+    payload = {'id': user.pk, 'u': user.username, 's': user.is_staff, 'su': user.is_superuser, 'iat': time.time()}
+    return signing.dumps(payload, salt=SIGNED_SALT, compress=True)
+
+
+def signed_tokens_enabled():
+    # Revocation stamps must reach every process
+    return (_config().get('SIGNED_TOKENS', False) and _shared_tier()
+            and is_shared(_config().get('REVOCATION_ALIAS', 'stamps')))
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    keyword = 'Signed'
+
+    def authenticate_credentials(self, key):
+        if not signed_tokens_enabled():
+            raise exceptions.AuthenticationFailed('Signed tokens are disabled.')
+        try:
+            payload = signing.loads(key, salt=SIGNED_SALT, max_age=_config().get('SIGNED_TOKEN_MAX_AGE', 900))
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed('Token expired.')
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        try:
+            revoked = _revocations().get(REVOKED_KEY.format(payload['id']))
+        except Exception:
+            logger.exception('Revocation stamp unreadable')
+            revoked = None
+        if revoked is None or payload['iat'] <= revoked:
+            raise exceptions.AuthenticationFailed('Token revoked.')
+        # An unsaved-looking but pk-bearing User: enough for permissions and ownership filters
+        user = User(pk=payload['id'], username=payload['u'], is_staff=payload['s'], is_superuser=payload['su'], is_active=True)
+        user._state.adding = False
+        return user, None
@@ -0,0 +1,313 @@
+import json
+import math
+import random
+import subprocess
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test.utils import override_settings
+from django.urls import URLResolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import cache, search
+from .models import Announcement, Choice, Comment, Course, Enrollment, Lesson, Notification, Project, Question, Quiz, Submission
+
+# --- SYNTHETIC DATA ---
+# `manage.py seed_bench` fills a database with production-sized volumes using
+# bulk_create, which sends no signals: counters are written directly
+# (Course.lesson_count is known up front, nothing is completed yet, unread
+# counters are created lazily) and search documents are rebuilt at the end.
+# Bench users are named bench_<n>; bench_0 is staff and is the default user of
+# `manage.py run_bench`.
+#
+# --- ENDPOINT BENCHMARK ---
+# run_benchmark() walks api.urls, requests every GET route with the DRF test
+# client as one user, and reports latency percentiles, SQL query counts and
+# response bytes per route name. Save the JSON per commit and compare() two
+# reports to spot regressions.
+
+USERNAME = 'bench_{}'
+PASSWORD = 'bench'
+VOLUMES = {
+    'courses': 1000,
+    'lessons': 50000,
+    'projects': 3000,
+    'quizzes': 2000,
+    'users': 200000,
+    'enrollments': 2000000,
+    'notifications': 2000000,
+    'announcements': 10000,
+    'comments': 200000,
+    'submissions': 100000,
+}
+QUESTIONS_PER_QUIZ, CHOICES_PER_QUESTION = 5, 4
+WORDS = ('python django lesson course project quiz database index query cache thread async stream '
+         'design review test deploy module network storage search model schema vector graph').split()
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _insert(model, objects, batch_size):
+    objects = iter(objects)
+    created = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return created
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        created += len(batch)
+
+
+def _ids_after(model, before, **filters):
+    return list(model.objects.filter(pk__gt=before, **filters).order_by('pk').values_list('pk', flat=True))
+
+
+def _max_pk(model):
+    return model.objects.aggregate(m=Max('pk'))['m'] or 0
+
+
+def bench_data_exists():
+    return User.objects.filter(username=USERNAME.format(0)).exists()
+
+
+def seed(volumes=None, batch_size=5000, random_seed=0, index_search=True, log=lambda message: None):
+    """Bulk-load synthetic rows; returns {model: rows created}."""
+    volumes = {**VOLUMES, **(volumes or {})}
+    rng = random.Random(random_seed)
+    created = {}
+
+    def step(name, model, objects):
+        started = time.monotonic()
+        created[name] = _insert(model, objects, batch_size)
+        log(f'{name}: {created[name]} in {time.monotonic() - started:.1f}s')
+
+    # Every bench user shares one password hash; hashing 200k passwords would take hours
+    password = make_password(PASSWORD)
+    before = _max_pk(User)
+    step('users', User, (User(username=USERNAME.format(n), password=password, is_staff=n == 0)
+                         for n in range(volumes['users'])))
+    user_ids = _ids_after(User, before)
+
+    lessons_of = lambda index: volumes['lessons'] // volumes['courses'] + (index < volumes['lessons'] % volumes['courses'])
+    before = _max_pk(Course)
+    step('courses', Course, (Course(title=f'Course {n} {_text(rng, 3)}', description=_text(rng, 30), instructor_name=f'Instructor {n % 97}',
+                                    lesson_count=lessons_of(n)) for n in range(volumes['courses'])))
+    course_ids = _ids_after(Course, before)
+    if not course_ids:
+        return created
+
+    step('lessons', Lesson, (Lesson(course_id=course_id, title=f'Lesson {order} {_text(rng, 3)}', content_text=_text(rng, 120), order=order)
+                             for index, course_id in enumerate(course_ids) for order in range(1, lessons_of(index) + 1)))
+    lesson_ids = _ids_after(Lesson, 0, course_id__gte=course_ids[0])
+
+    before = _max_pk(Project)
+    step('projects', Project, (Project(course_id=course_ids[n % len(course_ids)], title=f'Project {n}', instructions=_text(rng, 40))
+                               for n in range(volumes['projects'])))
+    project_ids = _ids_after(Project, before)
+
+    before = _max_pk(Quiz)
+    step('quizzes', Quiz, (Quiz(course_id=course_ids[n % len(course_ids)], title=f'Quiz {n}', description=_text(rng, 10))
+                           for n in range(volumes['quizzes'])))
+    quiz_ids = _ids_after(Quiz, before)
+    before = _max_pk(Question)
+    step('questions', Question, (Question(quiz_id=quiz_id, text=f'{_text(rng, 8)}?')
+                                 for quiz_id in quiz_ids for _ in range(QUESTIONS_PER_QUIZ)))
+    step('choices', Choice, (Choice(question_id=question_id, text=_text(rng, 3), is_correct=n == 0)
+                             for question_id in _ids_after(Question, before) for n in range(CHOICES_PER_QUESTION)))
+
+    if user_ids:
+        # Enrollment k pairs user k % U with a course offset per user, so (student, course) never repeats
+        offsets = [rng.randrange(len(course_ids)) for _ in user_ids]
+        total = min(volumes['enrollments'], len(user_ids) * len(course_ids))
+        step('enrollments', Enrollment, (
+            Enrollment(student_id=user_ids[k % len(user_ids)],
+                       course_id=course_ids[(k // len(user_ids) + offsets[k % len(user_ids)]) % len(course_ids)])
+            for k in range(total)))
+        step('notifications', Notification, (
+            Notification(user_id=user_ids[k % len(user_ids)], title=_text(rng, 4)[:100], message=_text(rng, 20), is_read=rng.random() < 0.7)
+            for k in range(volumes['notifications'])))
+        step('comments', Comment, (Comment(user_id=rng.choice(user_ids), lesson_id=rng.choice(lesson_ids) if lesson_ids else None,
+                                           text=_text(rng, 25)) for _ in range(volumes['comments'])))
+        if project_ids:
+            step('submissions', Submission, (
+                Submission(project_id=project_ids[k % len(project_ids)], student_id=user_ids[k % len(user_ids)],
+                           student_name=USERNAME.format(k % len(user_ids)), github_link=f'https://github.com/bench/{k}',
+                           grade=rng.randrange(101) if rng.random() < 0.5 else None)
+                for k in range(volumes['submissions'])))
+    step('announcements', Announcement, (Announcement(course_id=course_ids[n % len(course_ids)], title=_text(rng, 5), content=_text(rng, 60))
+                                         for n in range(volumes['announcements'])))
+
+    if index_search:
+        started = time.monotonic()
+        counts = search.rebuild()
+        log(f'search documents: {sum(counts.values())} in {time.monotonic() - started:.1f}s')
+    cache.bump_all()
+    return created
+
+
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    # Nearest-rank: the smallest sample with at least `percent`% of samples at or below it
+    rank = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def get_routes(patterns=None):
+    """(name, pattern) for every named GET route in api.urls, without format-suffix duplicates."""
+    if patterns is None:
+        from .urls import urlpatterns as patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from get_routes(pattern.url_patterns)
+            continue
+        if not pattern.name or 'format' in pattern.pattern.regex.groupindex:
+            continue
+        callback = pattern.callback
+        actions = getattr(callback, 'actions', None)
+        view_class = getattr(callback, 'view_class', getattr(callback, 'cls', None))
+        if actions is not None:
+            gettable = 'get' in actions
+        elif view_class is not None:
+            gettable = hasattr(view_class, 'get')
+        else:
+            gettable = True
+        if gettable:
+            yield pattern.name, pattern
+
+
+# Routes that need more than a pk, or cannot be timed as a request/response
+ROUTE_QUERY = {'search': 'q=lesson'}
+SKIP_ROUTES = {
+    'events': 'server-sent event stream never completes',
+    'media': 'needs stored files',
+    'media-link': 'needs stored files',
+}
+
+
+def _read(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def _sample_pk(client, list_name):
+    try:
+        url = reverse(list_name)
+    except Exception:
+        return None
+    response = client.get(url, {'paginate': 'cursor', 'page_size': 1})
+    data = getattr(response, 'data', None)
+    rows = data.get('results') if isinstance(data, dict) else data
+    if response.status_code != 200 or not rows or 'id' not in rows[0]:
+        return None
+    return rows[0]['id']
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(user, iterations=20, warmup=2, only=None, paginate=False, log=lambda message: None):
+    client = APIClient()
+    client.force_authenticate(user)
+    report = {
+        'meta': {'revision': _git_revision(), 'timestamp': timezone.now().isoformat(), 'vendor': connection.vendor,
+                 'user': user.username, 'iterations': iterations, 'warmup': warmup, 'paginate': paginate,
+                 'response_cache': cache.is_enabled()},
+        'routes': {},
+        'skipped': {},
+    }
+    # The test client always sends Host: testserver
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for name, pattern in get_routes():
+            if only and name not in only:
+                continue
+            if name in SKIP_ROUTES:
+                report['skipped'][name] = SKIP_ROUTES[name]
+                continue
+            kwargs = {}
+            if 'pk' in pattern.pattern.regex.groupindex:
+                kwargs['pk'] = _sample_pk(client, name.rsplit('-', 1)[0] + '-list')
+                if kwargs['pk'] is None:
+                    report['skipped'][name] = 'no visible row to request'
+                    continue
+            if set(pattern.pattern.regex.groupindex) - {'pk'}:
+                report['skipped'][name] = 'needs URL arguments other than pk'
+                continue
+            query = ROUTE_QUERY.get(name, '')
+            if paginate and name.endswith('-list'):
+                query = '&'.join(filter(None, [query, 'paginate=cursor']))
+            url = reverse(name, kwargs=kwargs) + (f'?{query}' if query else '')
+            report['routes'][name] = _measure(client, url, iterations, warmup)
+            log(f"{name}: p50 {report['routes'][name]['p50_ms']}ms, {report['routes'][name]['queries']} queries")
+    return report
+
+
+def _measure(client, url, iterations, warmup):
+    timings, queries = [], []
+    for run in range(warmup + iterations):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = client.get(url)
+            body = _read(response)
+            elapsed = (time.perf_counter() - started) * 1000
+        if run >= warmup:
+            timings.append(elapsed)
+            queries.append(counter.count)
+    return {
+        'url': url,
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'queries': max(queries),
+        'bytes': len(body),
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """Routes whose p95 grew by more than `threshold`, or whose query count, status or size changed."""
+    changes = {}
+    for name, now in current['routes'].items():
+        before = baseline.get('routes', {}).get(name)
+        if before is None:
+            continue
+        notes = []
+        if now['queries'] > before['queries']:
+            notes.append(f"queries {before['queries']} -> {now['queries']}")
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            notes.append(f"p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if now['status'] != before['status']:
+            notes.append(f"status {before['status']} -> {now['status']}")
+        if now['bytes'] != before['bytes']:
+            notes.append(f"bytes {before['bytes']} -> {now['bytes']}")
+        if notes:
+            changes[name] = notes
+    return changes
+
+
+def dumps(report):
+    return json.dumps(report, indent=2, sort_keys=True)
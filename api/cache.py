@@ -0,0 +1,162 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+
+from .models import Course, Quiz
+
+# --- VERSIONED RESPONSE CACHE ---
+# Every course has a version stamp in the cache, bumped (see api.signals) whenever
+# the course or anything in its tree is saved or deleted. Serialized payloads are
+# stored under a key that embeds the current version, so a bump makes old entries
+# unreachable without having to find and delete them; they simply expire.
+#
+# Only get/set/add/incr are used, so any shared Django backend works (file, db,
+# redis). Stamps are bumped by web workers, runworker and management commands
+# alike, so a per-process backend (locmem) would serve stale payloads with no
+# time limit: is_enabled() is False on one.
+#
+# Versions are microsecond timestamps, so they double as modification times.
+# They live under STAMPS_ALIAS, a cache that never culls, apart from the
+# payloads: culling a stamp orphans every payload cached under it. Ids come
+# from URLs, so a missing stamp is only seeded for a row that exists.
+
+VERSION_KEY = 'api:course:{}:version'
+CATALOG_KEY = 'api:catalog:version'
+QUIZ_VERSION_KEY = 'api:quiz:{}:version'
+GENERATION_KEY = 'api:generation'
+PAYLOAD_KEY = 'api:course:{}:{}:{}:{}'
+HITS_KEY = 'api:cache:hits'
+MISSES_KEY = 'api:cache:misses'
+
+
+def _config():
+    return getattr(settings, 'API_RESPONSE_CACHE', {})
+
+
+def get_cache():
+    return caches[_config().get('ALIAS', 'default')]
+
+
+def get_stamps():
+    return caches[_config().get('STAMPS_ALIAS', 'stamps')]
+
+
+def is_shared(alias=None):
+    """True if every process sees the same entries under this cache alias (default: payloads and stamps)."""
+    aliases = [alias] if alias else [_config().get('ALIAS', 'default'), _config().get('STAMPS_ALIAS', 'stamps')]
+    return not any(isinstance(caches[name], (LocMemCache, DummyCache)) for name in aliases)
+
+
+def is_enabled():
+    return _config().get('ENABLED', True) and is_shared()
+
+
+def _now_version():
+    return time.time_ns() // 1000
+
+
+def _bump(key):
+    cache = get_stamps()
+    cache.set(key, max(_now_version(), (cache.get(key) or 0) + 1), timeout=None)
+
+
+def bump_course(course_id):
+    _bump(VERSION_KEY.format(course_id))
+    _bump(CATALOG_KEY)
+
+
+def bump_quiz(quiz_id):
+    _bump(QUIZ_VERSION_KEY.format(quiz_id))
+
+
+def quiz_version(quiz_id):
+    """Return (generation, version) for a quiz, seeding missing stamps; None for an unknown quiz."""
+    return _stamps(GENERATION_KEY, QUIZ_VERSION_KEY.format(quiz_id), exists=lambda: _exists(Quiz, quiz_id))
+
+
+def bump_all():
+    # For writes that bypass signals (queryset.update(), bulk loads, counter rebuilds)
+    _bump(GENERATION_KEY)
+
+
+def _incr(key):
+    cache = get_stamps()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def _exists(model, pk):
+    try:
+        return model.objects.filter(pk=pk).exists()
+    except (TypeError, ValueError, ValidationError):
+        return False
+
+
+def _stamps(*keys, exists=None):
+    cache = get_stamps()
+    found = cache.get_many(keys)
+    stamps = []
+    for key in keys:
+        if key not in found:
+            if exists is not None and not exists():
+                return None
+            cache.add(key, _now_version(), timeout=None)
+            found[key] = cache.get(key)
+        stamps.append(found[key])
+    return tuple(stamps)
+
+
+def course_versions(course_id):
+    """Return (generation, version) for a course, seeding missing stamps; None for an unknown course."""
+    return _stamps(GENERATION_KEY, VERSION_KEY.format(course_id), exists=lambda: _exists(Course, course_id))
+
+
+def catalog_versions():
+    """Return (generation, version) covering every course tree."""
+    return _stamps(GENERATION_KEY, CATALOG_KEY)
+
+
+def version_datetime(*versions):
+    return datetime.fromtimestamp(max(versions) / 1_000_000, tz=timezone.utc)
+
+
+def payload_key(course_id, variant):
+    """The cache key of a course payload, or None for an unknown course."""
+    versions = course_versions(course_id)
+    if versions is None:
+        return None
+    generation, version = versions
+    digest = hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()
+    return PAYLOAD_KEY.format(course_id, generation, version, digest)
+
+
+def request_variant(request):
+    # File fields render absolute URLs, so the host is part of the representation; staff also see the answer key
+    params = '&'.join(f'{name}={request.query_params.get(name, "")}' for name in ('fields', 'expand'))
+    return f'{request.scheme}://{request.get_host()}?{params}&staff={int(request.user.is_staff)}'
+
+
+def get_payload(key):
+    data = get_cache().get(key)
+    _incr(MISSES_KEY if data is None else HITS_KEY)
+    return data
+
+
+def set_payload(key, data):
+    get_cache().set(key, data, timeout=_config().get('TIMEOUT', 3600))
+
+
+def stats():
+    values = get_stamps().get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = values.get(HITS_KEY, 0), values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
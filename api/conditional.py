@@ -0,0 +1,91 @@
+import hashlib
+from contextlib import nullcontext
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import cache, replica
+
+
+# --- CONDITIONAL GET ---
+# Viewsets describe their current state with cheap validators (cache version
+# stamps or one aggregate query) instead of serializing the body. A matching
+# If-None-Match / If-Modified-Since is answered with 304 before any row is
+# loaded; otherwise the normal response gets ETag and Last-Modified headers.
+
+# Request headers that change a list body without changing its URL
+LIST_VARY_HEADERS = ('X-Pagination',)
+
+class ConditionalGetMixin:
+    conditional_actions = ('list', 'retrieve')
+
+    def get_validators(self):
+        """Return (state, last_modified datetime or None), or None to skip."""
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        validators = self.get_validators() if self.action in self.conditional_actions else None
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        state, last_modified = validators
+        vary = LIST_VARY_HEADERS if self.action == 'list' else ()
+        # Same state can render differently per user, URL (filters, cursor, fields), format and pagination header
+        variant = (state, request.user.pk, request.get_full_path(), request.accepted_media_type,
+                   *(request.headers.get(name, '') for name in vary))
+        etag = quote_etag(hashlib.sha1(repr(variant).encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            patch_vary_headers(not_modified, vary)
+            return not_modified
+        # Right after a change a replica may still serve the old body; don't label it with the new ETag
+        with replica.use_primary() if replica.recently_changed(last_modified) else nullcontext():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        patch_vary_headers(response, vary)
+        return response
+
+
+class CatalogValidatorsMixin(ConditionalGetMixin):
+    # Course trees: validators come from the version stamps in api.cache, so a
+    # 304 costs no database query at all (one cache read on the db backend).
+    def get_validators(self):
+        if not cache.is_shared():
+            # Per-process stamps miss bumps made by other workers and runworker: a 304 could be stale
+            return None
+        if self.action == 'retrieve':
+            versions = cache.course_versions(self.kwargs[self.lookup_field])
+            if versions is None:
+                return None  # Unknown course: get_object() answers 404
+        else:
+            versions = cache.catalog_versions()
+        return versions, cache.version_datetime(*versions)
+
+
+class AggregateValidatorsMixin(ConditionalGetMixin):
+    # Row collections: one COUNT/MAX(updated_at) over the filtered queryset. The
+    # count catches deletions, the max timestamp catches inserts and edits.
+    updated_field = 'updated_at'
+
+    def get_validators(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            try:
+                queryset = queryset.filter(**{self.lookup_field: self.kwargs[self.lookup_field]})
+            except (TypeError, ValueError, ValidationError):
+                # As get_object_or_404() does for a malformed pk
+                raise Http404
+        state = queryset.order_by().aggregate(rows=Count('pk'), last=Max(self.updated_field))
+        return (state['rows'], state['last']), state['last']
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+from .models import Announcement, Notification
+
+logger = logging.getLogger(__name__)
+
+# --- LIVE EVENTS (SSE) ---
+# Each ASGI worker has one Broadcaster. It holds an asyncio.Queue per open
+# /api/events/ stream and routes events to them: user events by user id,
+# course events by the subscriber's enrolled courses. An idle stream is just a
+# queue waiting in the event loop, so thousands of them cost no threads.
+#
+# A backend moves events between processes. API_EVENTS['BACKEND'] is one of:
+#   PostgresBackend - publish() runs pg_notify() in the writing transaction and
+#                     every worker LISTENs on one dedicated connection
+#   PollingBackend  - publish() does nothing; every worker polls the
+#                     notification and announcement tables for new ids
+#   LocalBackend    - publish() feeds this process only (single worker, dev).
+#                     Fan-out runs in `runworker` with the 'database' task
+#                     backend, so the stream refuses to start with that pair.
+# Events are small ({'type', 'id', 'user'|'course', 'title'}); clients fetch
+# details through the REST endpoints and use /api/sync/ to catch up.
+
+CHANNEL = 'api_events'
+QUEUE_SIZE = 100
+
+
+def _config():
+    return getattr(settings, 'API_EVENTS', {})
+
+
+def backend_path():
+    return _config().get('BACKEND', 'api.events.PollingBackend')
+
+
+def configuration_error():
+    """Why the stream cannot work with these settings, or None."""
+    tasks = getattr(settings, 'API_TASKS', {}).get('BACKEND', 'database')
+    if import_string(backend_path()) is LocalBackend and tasks == 'database':
+        return 'LocalBackend cannot carry events published by runworker; use PostgresBackend or PollingBackend'
+    return None
+
+
+def notification_event(notification):
+    return {'type': 'notification', 'id': notification.pk, 'user': notification.user_id, 'title': notification.title}
+
+
+def announcement_event(announcement):
+    return {'type': 'announcement', 'id': announcement.pk, 'course': announcement.course_id, 'title': announcement.title}
+
+
+class Subscription:
+    def __init__(self, user_id, course_ids):
+        self.user_id = user_id
+        self.course_ids = set(course_ids)
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def wants(self, event):
+        if 'user' in event:
+            return event['user'] == self.user_id
+        return event.get('course') in self.course_ids
+
+
+class Broadcaster:
+    def __init__(self):
+        self.subscriptions = set()
+        self.loop = None
+        self.backend = None
+
+    async def subscribe(self, user_id, course_ids):
+        if self.backend is None or self.loop is not asyncio.get_running_loop():
+            self.loop = asyncio.get_running_loop()
+            self.backend = import_string(backend_path())(self)
+            await self.backend.start()
+        subscription = Subscription(user_id, course_ids)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+
+    def dispatch(self, event):
+        """Deliver to matching subscribers; must run on the broadcaster's loop."""
+        for subscription in list(self.subscriptions):
+            if subscription.wants(event):
+                try:
+                    subscription.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # A stalled client loses live events, not the server's memory; it resyncs on reconnect
+                    logger.warning('Dropping event for slow subscriber (user %s)', subscription.user_id)
+
+    def dispatch_threadsafe(self, event):
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.dispatch, event)
+
+
+broadcaster = Broadcaster()
+
+
+class LocalBackend:
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+
+    async def start(self):
+        pass
+
+    @staticmethod
+    def publish(events):
+        def deliver():
+            for event in events:
+                broadcaster.dispatch_threadsafe(event)
+        transaction.on_commit(deliver)
+
+
+class PostgresBackend:
+    # Needs psycopg2 (the driver in requirements.txt): LISTEN on a dedicated autocommit
+    # connection whose socket is watched by the event loop.
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self.connection = None
+
+    async def start(self):
+        wrapper = connections['default']
+        self.connection = await sync_to_async(wrapper.get_new_connection)(wrapper.get_connection_params())
+        self.connection.autocommit = True
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        self.broadcaster.loop.add_reader(self.connection.fileno(), self._readable)
+
+    def _readable(self):
+        try:
+            self.connection.poll()
+        except Exception:
+            logger.exception('LISTEN connection lost; reconnecting')
+            self.broadcaster.loop.remove_reader(self.connection.fileno())
+            self.broadcaster.loop.create_task(self._restart())
+            return
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            self.broadcaster.dispatch(json.loads(notify.payload))
+
+    async def _restart(self):
+        await asyncio.sleep(_config().get('RECONNECT_SECONDS', 2))
+        try:
+            await self.start()
+        except Exception:
+            logger.exception('LISTEN reconnect failed')
+            self.broadcaster.loop.create_task(self._restart())
+
+    @staticmethod
+    def publish(events):
+        # NOTIFY is transactional: listeners hear it only if the surrounding transaction commits.
+        # One statement per batch, however many events.
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload',
+                           [CHANNEL, [json.dumps(event) for event in events]])
+
+
+class PollingBackend:
+    # One query pair per worker every POLL_SECONDS, however many clients are connected
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self.last_ids = None
+
+    async def start(self):
+        self.last_ids = await sync_to_async(self._current_ids)()
+        self.broadcaster.loop.create_task(self._run())
+
+    @staticmethod
+    def _current_ids():
+        return (Notification.objects.aggregate(m=Max('id'))['m'] or 0, Announcement.objects.aggregate(m=Max('id'))['m'] or 0)
+
+    def _new_events(self):
+        if self.last_ids is None:
+            # Idle since the last subscriber left: start from now instead of replaying the gap
+            self.last_ids = self._current_ids()
+            return []
+        last_notification, last_announcement = self.last_ids
+        events = []
+        for row in Notification.objects.filter(id__gt=last_notification).order_by('id').only('id', 'user_id', 'title')[:1000]:
+            events.append(notification_event(row))
+            last_notification = row.pk
+        for row in Announcement.objects.filter(id__gt=last_announcement).order_by('id').only('id', 'course_id', 'title')[:1000]:
+            events.append(announcement_event(row))
+            last_announcement = row.pk
+        self.last_ids = (last_notification, last_announcement)
+        return events
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(_config().get('POLL_SECONDS', 2))
+            if not self.broadcaster.subscriptions:
+                self.last_ids = None
+                continue
+            try:
+                events = await sync_to_async(self._new_events)()
+            except Exception:
+                logger.exception('Event poll failed')
+                continue
+            for event in events:
+                self.broadcaster.dispatch(event)
+
+    @staticmethod
+    def publish(events):
+        pass
+
+
+def publish(*events):
+    """Called from synchronous code (signals, jobs) inside the writing transaction."""
+    if events:
+        import_string(backend_path()).publish(list(events))
+
+
+def format_event(event):
+    return f"id: {event['type']}:{event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,86 @@
+from collections import Counter
+
+from django.db import transaction
+
+from .models import Announcement, Device, Enrollment, Notification
+from . import events, push, tasks
+from .progress import adjust_unread
+
+# --- ANNOUNCEMENT FAN-OUT ---
+# Runs as a background task (api.tasks), so posting an announcement costs the
+# teacher one INSERT whatever the class size. Enrolled students get a
+# Notification row, written with bulk_create in batches, and a push message on
+# every registered device; tokens the provider rejects are deleted.
+#
+# Jobs are retried after a failure, so announce() is idempotent: each batch
+# commits on its own, skips students who already have the announcement's
+# notification (a unique (announcement, user) constraint backs this up), and
+# push delivery is a separate job whose retries never re-create notifications.
+# That job splits the devices into provider-sized batches, one job each: a
+# failed request fails only its own job, and the retry re-sends that batch
+# alone, never the batches already delivered.
+
+BATCH_SIZE = 1000
+
+
+def _create_notifications(announcement, title, student_ids):
+    # bulk_create skips post_save, so counters and live events are handled here, one call per batch
+    with transaction.atomic():
+        done = set(Notification.objects.filter(announcement=announcement, user_id__in=student_ids).values_list('user_id', flat=True))
+        created = Notification.objects.bulk_create([
+            Notification(announcement=announcement, user_id=student_id, title=title, message=announcement.content)
+            for student_id in student_ids if student_id not in done
+        ])
+        per_user = Counter(n.user_id for n in created)
+        for times in set(per_user.values()):
+            adjust_unread([user_id for user_id, n in per_user.items() if n == times], times)
+        events.publish(*[events.notification_event(n) for n in created if n.pk])
+
+
+def announce(announcement_id):
+    announcement = Announcement.objects.filter(pk=announcement_id).first()
+    if announcement is None:
+        return
+    student_ids = Enrollment.objects.filter(course_id=announcement.course_id).order_by('student_id').values_list('student_id', flat=True)
+    title = announcement.title[:100]
+    batch = []
+    for student_id in student_ids.iterator(chunk_size=BATCH_SIZE):
+        batch.append(student_id)
+        if len(batch) >= BATCH_SIZE:
+            _create_notifications(announcement, title, batch)
+            batch = []
+    if batch:
+        _create_notifications(announcement, title, batch)
+    tasks.enqueue(push_announcement, announcement_id=announcement.pk)
+
+
+def push_announcement(announcement_id):
+    course_id = Announcement.objects.filter(pk=announcement_id).values_list('course_id', flat=True).first()
+    if course_id is None:
+        return
+    transport = push.get_transport()
+    tokens = (Device.objects.filter(user__enrollments__course_id=course_id, device_type=transport.device_type)
+              .order_by('token').values_list('token', flat=True).distinct())
+    # All batch jobs or none, so a retry of this job never queues a batch twice
+    with transaction.atomic():
+        batch = []
+        for token in tokens.iterator(chunk_size=BATCH_SIZE):
+            batch.append(token)
+            if len(batch) >= transport.batch_size:
+                tasks.enqueue(push_batch, announcement_id=announcement_id, tokens=batch)
+                batch = []
+        if batch:
+            tasks.enqueue(push_batch, announcement_id=announcement_id, tokens=batch)
+
+
+def push_batch(announcement_id, tokens):
+    announcement = Announcement.objects.select_related('course').filter(pk=announcement_id).first()
+    if announcement is None:
+        return
+    title = announcement.title[:100]
+    data = {'type': 'announcement', 'course': announcement.course_id, 'announcement': announcement.pk}
+    messages = [{'to': token, 'title': f'{announcement.course.title}: {title}', 'body': announcement.content[:200], 'data': data}
+                for token in tokens]
+    invalid = push.get_transport().send(messages)
+    if invalid:
+        Device.objects.filter(token__in=invalid).delete()
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder gives the same bytes, only slower
+    orjson = None
+
+# --- FAST JSON LISTS ---
+# Opt-in (API_FAST_JSON['ENABLED']) read path for flat list payloads. The
+# viewset's own (already pruned) serializer is compiled once per request into
+# (output name, .values() key, converter) triples; rows come straight from
+# .values() and are encoded by orjson. The bytes equal what the serializer and
+# DRF's JSONRenderer produce:
+#   * converters are the serializer fields' own to_representation(), used only
+#     for types that need one (dates, datetimes); str/int/bool/pk values pass
+#     through exactly as DRF would emit them,
+#   * orjson writes compact separators and raw UTF-8 like DRF's defaults
+#     (COMPACT_JSON, UNICODE_JSON), and U+2028/U+2029 get DRF's escapes.
+# Serializers with nested, method or dotted-source fields return None from
+# compile_fields() and take the normal path, as do non-JSON renderers.
+
+IDENTITY_FIELDS = (
+    serializers.CharField, serializers.URLField, serializers.EmailField, serializers.SlugField,
+    serializers.IntegerField, serializers.BooleanField, serializers.PrimaryKeyRelatedField,
+)
+CONVERTED_FIELDS = (serializers.DateTimeField, serializers.DateField)
+
+
+def is_enabled():
+    return getattr(settings, 'API_FAST_JSON', {}).get('ENABLED', False)
+
+
+def renders(request):
+    """True when the response would be DRF's plain (non-indented) JSON."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return type(renderer) is JSONRenderer and 'indent' not in (request.accepted_media_type or '')
+
+
+def _selectable(queryset, source):
+    if source in queryset.query.annotations:
+        return True
+    try:
+        field = queryset.model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return False
+    return field.concrete and not field.many_to_many
+
+
+def compile_fields(serializer, queryset):
+    """[(name, source, converter or None)] for the serializer's fields, or None if .values() can't feed it."""
+    mapping = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if type(field) in CONVERTED_FIELDS:
+            convert = field.to_representation
+        elif type(field) in IDENTITY_FIELDS:
+            convert = None
+        else:
+            return None
+        if len(field.source_attrs) != 1 or not _selectable(queryset, field.source):
+            return None
+        mapping.append((name, field.source, convert))
+    return mapping
+
+
+def values(queryset, mapping, extra=()):
+    # Prefetches planned for the serializer path are useless (and unsupported) on value rows
+    return queryset.prefetch_related(None).values(*dict.fromkeys([source for _, source, _ in mapping] + list(extra)))
+
+
+def build_rows(rows, mapping):
+    result = []
+    for row in rows:
+        item = {}
+        for name, source, convert in mapping:
+            value = row[source]
+            item[name] = value if convert is None or value is None else convert(value)
+        result.append(item)
+    return result
+
+
+def dumps(data):
+    renderer = JSONRenderer()
+    if orjson is not None and renderer.compact and not renderer.ensure_ascii:
+        try:
+            content = orjson.dumps(data)
+        except TypeError:
+            # orjson.JSONEncodeError (ints beyond 64 bits, lone surrogates): let the stdlib decide
+            pass
+        else:
+            return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return renderer.render(data)
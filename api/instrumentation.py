@@ -0,0 +1,114 @@
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# --- REQUEST INSTRUMENTATION ---
+# Opt-in (API_INSTRUMENTATION['ENABLED']). For every request the middleware
+# wraps each database connection with execute_wrapper() and splits the time
+# into:
+#   db     - time spent executing SQL
+#   app    - view time outside SQL (authentication, permissions, mostly serialization)
+#   render - DRF renderer output (JSON encoding), measured via a post-render callback
+# and flags statements executed REPEAT_THRESHOLD or more times with identical
+# SQL - the signature of an N+1 loop. Results go out as a Server-Timing header;
+# requests slower than SLOW_MS or with repeats are logged as one JSON line,
+# sampled at LOG_SAMPLE_RATE. Per query the cost is two perf_counter() calls
+# and a Counter increment. Streaming bodies are produced after the middleware
+# returns and are not covered.
+
+
+def _config():
+    return getattr(settings, 'API_INSTRUMENTATION', {})
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+        self.started = time.perf_counter()
+        self.view_done = None
+        self.view_db_seconds = None
+        self.rendered = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+    def repeated(self, threshold):
+        return [(sql, n) for sql, n in self.statements.most_common(5) if n >= threshold]
+
+    def timings(self, finished):
+        """Milliseconds per phase; render is absent for responses that are not rendered."""
+        view_done = self.view_done or finished
+        view_db = self.db_seconds if self.view_db_seconds is None else self.view_db_seconds
+        result = {'total': finished - self.started, 'db': self.db_seconds, 'app': view_done - self.started - view_db}
+        if self.rendered is not None:
+            result['render'] = self.rendered - view_done - (self.db_seconds - view_db)
+        return {name: round(seconds * 1000, 2) for name, seconds in result.items()}
+
+
+def server_timing(timings, queries, repeated):
+    metrics = [f'db;dur={timings["db"]};desc="{queries} queries"', f'app;dur={timings["app"]}']
+    if 'render' in timings:
+        metrics.append(f'render;dur={timings["render"]}')
+    metrics.append(f'total;dur={timings["total"]}')
+    if repeated:
+        metrics.append(f'repeat;desc="{repeated[0][1]}x identical query"')
+    return ', '.join(metrics)
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not _config().get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request._instrumentation = RequestStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        config = _config()
+        timings = stats.timings(time.perf_counter())
+        repeated = stats.repeated(config.get('REPEAT_THRESHOLD', 5))
+        if config.get('SERVER_TIMING', True):
+            response['Server-Timing'] = server_timing(timings, stats.queries, repeated)
+        slow = timings['total'] >= config.get('SLOW_MS', 500)
+        if (slow or repeated) and random.random() < config.get('LOG_SAMPLE_RATE', 1.0):
+            match = request.resolver_match
+            record = {
+                'method': request.method, 'path': request.path, 'view': match.view_name if match else None,
+                'status': response.status_code, 'user': getattr(getattr(request, 'user', None), 'pk', None),
+                'queries': stats.queries, **{f'{name}_ms': value for name, value in timings.items()},
+                'repeated': [{'sql': sql[:500], 'count': n} for sql, n in repeated],
+            }
+            logger.warning('%s request %s', 'Slow' if slow else 'Repeated-query', json.dumps(record), extra={'instrumentation': record})
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render after this hook; the callback marks the end of rendering
+        stats = getattr(request, '_instrumentation', None)
+        if stats is not None:
+            stats.view_done = time.perf_counter()
+            stats.view_db_seconds = stats.db_seconds
+
+            def rendered(response):
+                stats.rendered = time.perf_counter()
+            response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,140 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# --- JOB QUEUE ---
+# Jobs live in api_job. A worker claims a few queued rows at a time with
+# SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never block on or
+# double-run the same job. SQLite has no row locks; there a claim is a
+# conditional UPDATE per row (status still 'queued'), which its single writer
+# serializes. Failures are retried with exponential backoff up to
+# max_attempts. While a job runs, a heartbeat thread refreshes its locked_at
+# every HEARTBEAT_SECONDS, so only jobs of a crashed worker get a lock older
+# than LOCK_TIMEOUT; those are re-queued. A worker records the outcome only
+# while it still holds the lock, so it never overwrites a re-queued job.
+# Finished jobs are purged by the retention policies (api.retention).
+
+
+def _config():
+    return getattr(settings, 'API_JOBS', {})
+
+
+def backoff(attempts):
+    base = _config().get('RETRY_BASE_SECONDS', 10)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), _config().get('RETRY_MAX_SECONDS', 3600)))
+
+
+def push_job(task, kwargs, priority=0, delay=None, max_attempts=None):
+    job = Job(task=task, kwargs=kwargs, priority=priority)
+    if delay:
+        job.run_at = timezone.now() + delay
+    if max_attempts:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+def requeue_stale(now=None):
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=_config().get('LOCK_TIMEOUT', 600))
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_by='', locked_at=None, updated_at=now)
+
+
+def claim(worker_id, limit=1):
+    now = timezone.now()
+    ready = Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at', 'id')
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(status='running', locked_by=worker_id, locked_at=now, updated_at=now)
+    else:
+        ids = []
+        for job_id in ready.values_list('id', flat=True)[:limit]:
+            if Job.objects.filter(id=job_id, status='queued').update(
+                    status='running', locked_by=worker_id, locked_at=now, updated_at=now):
+                ids.append(job_id)
+    return list(Job.objects.filter(id__in=ids).order_by('-priority', 'run_at', 'id'))
+
+
+def _beat(job, stop):
+    try:
+        while not stop.wait(_config().get('HEARTBEAT_SECONDS', 60)):
+            Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).update(locked_at=timezone.now())
+    finally:
+        connections.close_all()  # This thread's own connection
+
+
+@contextmanager
+def heartbeat(job):
+    stop = threading.Event()
+    thread = threading.Thread(target=_beat, args=(job, stop), daemon=True, name=f'api-job-{job.pk}-heartbeat')
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def execute(job):
+    """Run one claimed job and record the outcome; returns True on success."""
+    attempts = job.attempts + 1
+    owned = Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by)
+    try:
+        with heartbeat(job):
+            import_string(job.task)(**job.kwargs)
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.task, attempts)
+        now = timezone.now()
+        fields = {'attempts': attempts, 'locked_by': '', 'locked_at': None, 'last_error': traceback.format_exc()[-4000:], 'updated_at': now}
+        if attempts < job.max_attempts:
+            fields.update(status='queued', run_at=now + backoff(attempts))
+        else:
+            fields.update(status='failed')
+        owned.update(**fields)
+        return False
+    owned.update(status='done', attempts=attempts, locked_by='', locked_at=None, updated_at=timezone.now())
+    return True
+
+
+def work(worker_id, once=False, batch=None, poll_interval=None, stop=None):
+    """Claim-and-run loop; with once=True it returns when nothing is ready. Returns jobs processed."""
+    batch = batch or _config().get('BATCH_SIZE', 5)
+    poll_interval = poll_interval if poll_interval is not None else _config().get('POLL_INTERVAL', 1.0)
+    stop = stop or threading.Event()
+    processed = 0
+    last_sweep = 0
+    while not stop.is_set():
+        close_old_connections()
+        if time.monotonic() - last_sweep > 60:
+            requeue_stale()
+            last_sweep = time.monotonic()
+        jobs = claim(worker_id, batch)
+        for job in jobs:
+            execute(job)
+            processed += 1
+        if not jobs:
+            if once:
+                break
+            stop.wait(poll_interval)
+    close_old_connections()
+    return processed
+
+
+def worker_name(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
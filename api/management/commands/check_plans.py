@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.plans import HOT_QUERIES, check_plans
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot lookups (api/plans.py) and fail if any needs a sequential scan or a sort step.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help='Query names to check; all if omitted.')
+        parser.add_argument('--force-index', action='store_true', help='Postgres: disable seq scans, for small datasets.')
+        parser.add_argument('--show-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        unknown = set(options['queries']) - set(HOT_QUERIES)
+        if unknown:
+            raise CommandError(f"Unknown query: {', '.join(sorted(unknown))}")
+        failed = 0
+        for name, result in check_plans(options['queries'], force_index=options['force_index']).items():
+            if result.get('skipped'):
+                self.stdout.write(self.style.WARNING(f'{name}: skipped, no sample row'))
+                continue
+            if result['problems']:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"{name}: {'; '.join(result['problems'])}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: ok'))
+            if options['show_plans'] or result['problems']:
+                self.stdout.write(result['plan'])
+        if failed:
+            raise CommandError(f'{failed} query plan(s) fall back to a scan or sort.')
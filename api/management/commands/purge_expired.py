@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.retention import apply_policy, policies
+
+
+class Command(BaseCommand):
+    help = 'Archive or delete rows past their retention period (API_RETENTION) in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('policies', nargs='*', help='Policy names to run; all if omitted.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-seconds', type=float, default=None, help='Stop each policy after this long; the next run resumes.')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired rows.')
+
+    def handle(self, *args, **options):
+        configured = policies()
+        unknown = set(options['policies']) - set(configured)
+        if unknown:
+            raise CommandError(f"Unknown policy: {', '.join(sorted(unknown))}")
+        for name in options['policies'] or configured:
+            report = apply_policy(configured[name], batch_size=options['batch_size'], dry_run=options['dry_run'],
+                                  max_seconds=options['max_seconds'], pause=options['pause'])
+            verb = 'expired' if options['dry_run'] else configured[name].get('action', 'delete') + 'd'
+            note = '' if report['complete'] else ' (time budget reached, more remain)'
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {report['rows']} row(s) {verb} in {report['batches']} batch(es), {report['seconds']}s{note}"))
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.uploads import purge_abandoned
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable upload sessions that went idle, together with their part files.'
+
+    def add_arguments(self, parser):
+        default = getattr(settings, 'CHUNKED_UPLOADS', {}).get('MAX_AGE_HOURS', 24)
+        parser.add_argument('--older-than-hours', type=float, default=default)
+
+    def handle(self, *args, **options):
+        sessions, orphans = purge_abandoned(timedelta(hours=options['older_than_hours']))
+        self.stdout.write(self.style.SUCCESS(f'Removed {sessions} stale session(s) and {orphans} orphaned part file(s).'))
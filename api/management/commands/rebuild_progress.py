@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.progress import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute Course.lesson_count, Enrollment.completed_count and UnreadCounter.unread in batches. Use --verify to only report drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--verify', action='store_true', help='Report drifted rows without writing; exit non-zero if any.')
+
+    def handle(self, *args, **options):
+        report = rebuild(batch_size=options['batch_size'], dry_run=options['verify'])
+        for counter, drifted in report.items():
+            style = self.style.WARNING if drifted else self.style.SUCCESS
+            self.stdout.write(style(f'{counter}: {drifted} drifted row(s)'))
+        if options['verify'] and any(report.values()):
+            raise CommandError('Progress counters are out of date; run without --verify to rebuild.')
+        if not options['verify']:
+            self.stdout.write(self.style.SUCCESS('Progress counters rebuilt.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import SearchDocument
+from api.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Re-create the full-text search documents from courses, lessons, announcements and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*', help='Kinds to rebuild (course, lesson, announcement, comment); all if omitted.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        unknown = set(options['kinds']) - {kind for kind, _ in SearchDocument.KINDS}
+        if unknown:
+            raise CommandError(f"Unknown kind(s): {', '.join(sorted(unknown))}")
+        for kind, count in rebuild(options['kinds'], batch_size=options['batch_size']).items():
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {kind} document(s).'))
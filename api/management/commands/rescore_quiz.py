@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Quiz
+from api.scoring import rescore
+
+
+class Command(BaseCommand):
+    help = 'Re-grade stored quiz attempts against the current answer key (e.g. after a correct choice changed).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int, help='Quizzes to re-grade; all quizzes if omitted.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        quiz_ids = options['quiz_ids'] or Quiz.objects.filter(attempts__isnull=False).distinct().values_list('id', flat=True)
+        for quiz_id in quiz_ids:
+            seen, changed = rescore(quiz_id, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Quiz {quiz_id}: {seen} attempt(s) checked, {changed} re-graded.'))
@@ -0,0 +1,47 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import USERNAME, compare, dumps, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Time every GET route of the API with the test client; report p50/p95/p99, SQL queries and bytes as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=USERNAME.format(0), help='Username to request as (default: the seeded staff user).')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--route', action='append', dest='routes', help='Only this route name (repeatable), e.g. course-list.')
+        parser.add_argument('--paginate', action='store_true', help='Request list routes with ?paginate=cursor.')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+        parser.add_argument('--compare', help='Baseline JSON report to diff against.')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative p95 growth before a route is flagged.')
+        parser.add_argument('--fail', action='store_true', help='Exit non-zero if --compare finds changes.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1.')
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"User {options['user']!r} not found; run seed_bench or pass --user.")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+        report = run_benchmark(user, iterations=options['iterations'], warmup=options['warmup'], only=options['routes'],
+                               paginate=options['paginate'], log=self.stderr.write)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(dumps(report) + '\n')
+        else:
+            self.stdout.write(dumps(report))
+        if baseline is not None:
+            changes = compare(baseline, report, threshold=options['threshold'])
+            for name, notes in sorted(changes.items()):
+                self.stderr.write(self.style.WARNING(f"{name}: {'; '.join(notes)}"))
+            if not changes:
+                self.stderr.write(self.style.SUCCESS('No changes against the baseline.'))
+            elif options['fail']:
+                raise CommandError(f'{len(changes)} route(s) changed against the baseline.')
@@ -0,0 +1,59 @@
+import multiprocessing
+import signal
+import threading
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.jobs import work, worker_name
+
+
+def _process_main(index, once):
+    # No-op after fork; configures Django when the start method is spawn/forkserver
+    django.setup()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    work(worker_name(index), once=once, stop=stop)
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the api_job queue until interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of worker threads or processes.')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is ready (cron / tests).')
+
+    def handle(self, *args, **options):
+        concurrency, once = max(1, options['concurrency']), options['once']
+        self.stdout.write(f"Worker started: {concurrency} {options['mode']}(s).")
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        if options['mode'] == 'process':
+            # Children must not inherit the parent's open database connections
+            connections.close_all()
+            children = [multiprocessing.Process(target=_process_main, args=(n, once)) for n in range(concurrency)]
+            for child in children:
+                child.start()
+            try:
+                for child in children:
+                    child.join()
+            except KeyboardInterrupt:
+                for child in children:
+                    child.terminate()
+            self.stdout.write(self.style.SUCCESS('Worker stopped.'))
+            return
+        threads = [threading.Thread(target=work, args=(worker_name(n),), kwargs={'once': once, 'stop': stop}, daemon=True)
+                   for n in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS('Worker stopped.'))
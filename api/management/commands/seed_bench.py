@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import VOLUMES, bench_data_exists, seed
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load synthetic courses, users, enrollments, notifications etc. for benchmarking. Use a throwaway database.'
+
+    def add_arguments(self, parser):
+        for name, default in VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every volume, e.g. 0.01 for a quick local run.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed produces the same data.')
+        parser.add_argument('--skip-search', action='store_true', help='Do not rebuild search documents afterwards.')
+
+    def handle(self, *args, **options):
+        if bench_data_exists():
+            raise CommandError('Bench data is already present; seed a fresh database.')
+        volumes = {name: max(0, int(options[name] * options['scale'])) for name in VOLUMES}
+        created = seed(volumes, batch_size=options['batch_size'], random_seed=options['seed'],
+                       index_search=not options['skip_search'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Seeded {sum(created.values())} row(s).'))
@@ -0,0 +1,148 @@
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+from . import streaming
+
+# --- MEDIA DELIVERY ---
+# Lesson attachments and submitted files are served by an authorizing view
+# instead of static(). Whole files go out through FileResponse (the WSGI server
+# can use sendfile, ASGI gets blocks via api.streaming), single byte ranges are
+# answered with 206 so players and PDF viewers can seek, and ETag/Last-Modified
+# come from the file's stat().
+# With SENDFILE set, Python only authorizes and a front proxy sends the bytes:
+#   x-accel-redirect (nginx): location <ACCEL_PREFIX> { internal; alias <MEDIA_ROOT>/; }
+#   x-sendfile (Apache mod_xsendfile / lighttpd): XSendFilePath <MEDIA_ROOT>
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+LINK_SALT = 'api.media.link'
+
+
+def _config():
+    return getattr(settings, 'API_MEDIA', {})
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive, None for "send the whole file", or 'invalid' for 416."""
+    match = RANGE_RE.match((header or '').replace(' ', ''))
+    if not match:
+        # Absent, malformed or multi-range: a plain 200 is a valid answer to all of them
+        return None
+    first, last = match.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return 'invalid'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return 'invalid'
+    return start, end
+
+
+class RangeFile:
+    # Reads at most `length` bytes from `start`. It has no fileno() on purpose, so
+    # WSGI file wrappers iterate it instead of sendfile()-ing to the end of the file.
+    def __init__(self, path, start, length):
+        self.file = open(path, 'rb')
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _if_range_matches(request, etag, mtime):
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    since = parse_http_date_safe(value)
+    return since is not None and since >= mtime
+
+
+def serve(request, fieldfile, as_attachment=False):
+    try:
+        path = fieldfile.path
+    except NotImplementedError:
+        # Remote storage: the backend's own (usually signed) URL already supports ranges
+        return HttpResponseRedirect(fieldfile.url)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return HttpResponse(status=404)
+    size, mtime = stat.st_size, int(stat.st_mtime)
+    etag = quote_etag(hashlib.sha1(f'{fieldfile.name}:{size}:{stat.st_mtime_ns}'.encode()).hexdigest())
+    not_modified = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if not_modified is not None:
+        return not_modified
+
+    content_type = mimetypes.guess_type(fieldfile.name)[0] or 'application/octet-stream'
+    filename = os.path.basename(fieldfile.name)
+    mode = _config().get('SENDFILE', '')
+    if mode in ('x-accel-redirect', 'x-sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = _config().get('ACCEL_PREFIX', '/protected-media/') + quote(fieldfile.name)
+        else:
+            response['X-Sendfile'] = path
+    else:
+        byte_range = parse_range(request.headers.get('Range'), size)
+        if byte_range == 'invalid':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is not None and _if_range_matches(request, etag, mtime):
+            start, end = byte_range
+            response = FileResponse(RangeFile(path, start, end - start + 1), status=206, content_type=content_type)
+            response.block_size = BLOCK_SIZE
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+            response.block_size = BLOCK_SIZE
+        response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return streaming.for_server(request, response)
+
+
+# Signed links let clients that cannot send an Authorization header (browsers,
+# native video players opened via Linking) fetch one file for a short while.
+def sign_link(kind, pk, user):
+    return signing.TimestampSigner(salt=LINK_SALT).sign(f'{kind}:{pk}:{user.pk}')
+
+
+def link_user_id(kind, pk, token):
+    max_age = _config().get('LINK_MAX_AGE', 3600)
+    try:
+        value = signing.TimestampSigner(salt=LINK_SALT).unsign(token, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    signed_kind, signed_pk, user_id = value.split(':')
+    if (signed_kind, signed_pk) != (kind, str(pk)):
+        return None
+    return int(user_id)
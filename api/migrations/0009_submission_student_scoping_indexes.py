@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def link_submissions_to_users(apps, schema_editor):
+    # Older submissions only carry the free-text student_name; attach them to the matching account
+    Submission = apps.get_model('api', 'Submission')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    users = dict(User.objects.values_list('username', 'id'))
+    for sub in Submission.objects.filter(student__isnull=True).only('id', 'student_name').iterator():
+        if sub.student_name in users:
+            Submission.objects.filter(pk=sub.pk).update(student_id=users[sub.student_name])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_lessonattachment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='student',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submissions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(link_submissions_to_users, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read'], name='api_notif_user_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['student', 'project'], name='api_sub_student_project_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Course = apps.get_model('api', 'Course')
+    Lesson = apps.get_model('api', 'Lesson')
+    Enrollment = apps.get_model('api', 'Enrollment')
+    CompletedLesson = Enrollment.completed_lessons.through
+    lessons = Lesson.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(n=Count('pk')).values('n')
+    Course.objects.update(lesson_count=Coalesce(Subquery(lessons), 0))
+    done = (CompletedLesson.objects.filter(enrollment=OuterRef('pk'), lesson__course=OuterRef('course'))
+            .order_by().values('enrollment').annotate(n=Count('pk')).values('n'))
+    Enrollment.objects.update(completed_count=Coalesce(Subquery(done), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The full-text index lives outside the Django model so each vendor gets its native structure.
+POSTGRES_FORWARD = [
+    """ALTER TABLE api_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+           setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+           setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED""",
+    'CREATE INDEX api_search_vector_gin ON api_searchdocument USING GIN (search_vector)',
+]
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS api_search_vector_gin',
+    'ALTER TABLE api_searchdocument DROP COLUMN IF EXISTS search_vector',
+]
+# External-content FTS5 table kept in step with api_searchdocument by triggers. A later migration
+# that makes SQLite rebuild api_searchdocument drops the triggers; re-create them after it.
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE api_search_fts USING fts5(
+           title, body, content='api_searchdocument', content_rowid='id', tokenize='porter unicode61')""",
+    """CREATE TRIGGER api_search_fts_ai AFTER INSERT ON api_searchdocument BEGIN
+           INSERT INTO api_search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+       END""",
+    """CREATE TRIGGER api_search_fts_ad AFTER DELETE ON api_searchdocument BEGIN
+           INSERT INTO api_search_fts(api_search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+       END""",
+    """CREATE TRIGGER api_search_fts_au AFTER UPDATE ON api_searchdocument BEGIN
+           INSERT INTO api_search_fts(api_search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+           INSERT INTO api_search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+       END""",
+]
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS api_search_fts_au',
+    'DROP TRIGGER IF EXISTS api_search_fts_ad',
+    'DROP TRIGGER IF EXISTS api_search_fts_ai',
+    'DROP TABLE IF EXISTS api_search_fts',
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_fulltext_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD})
+
+
+def drop_fulltext_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE})
+
+
+BATCH_SIZE = 1000
+
+
+def index_existing_rows(apps, schema_editor):
+    SearchDocument = apps.get_model('api', 'SearchDocument')
+    sources = [
+        ('course', apps.get_model('api', 'Course').objects.values_list('id', 'id', 'title', 'description')),
+        ('lesson', apps.get_model('api', 'Lesson').objects.values_list('id', 'course_id', 'title', 'content_text')),
+        ('announcement', apps.get_model('api', 'Announcement').objects.values_list('id', 'course_id', 'title', 'content')),
+        ('comment', apps.get_model('api', 'Comment').objects.values_list('id', 'lesson__course_id', 'text', 'text')),
+    ]
+    for kind, rows in sources:
+        # Flushed every BATCH_SIZE rows, as search.rebuild() does, so a large table is never held in memory
+        batch = []
+        for pk, course_id, title, body in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(SearchDocument(kind=kind, object_id=pk, course_id=course_id, title='' if kind == 'comment' else (title or '')[:200], body=body or ''))
+            if len(batch) >= BATCH_SIZE:
+                SearchDocument.objects.bulk_create(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('course', 'Course'), ('lesson', 'Lesson'), ('announcement', 'Announcement'), ('comment', 'Comment')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.course')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='api_search_doc_unique')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(index_existing_rows, migrations.RunPython.noop),
+    ]
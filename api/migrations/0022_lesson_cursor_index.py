@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_notification_announcement'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lesson',
+            name='api_lesson_order_idx',
+        ),
+    ]
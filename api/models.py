@@ -1,4 +1,8 @@
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 # 1. COURSE
@@ -7,6 +11,14 @@ class Course(models.Model):
     description = models.TextField(blank=True, null=True) # Now Optional
     instructor_name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    lesson_count = models.PositiveIntegerField(default=0, editable=False) # Kept current by api.signals
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='api_course_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='api_course_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -18,6 +30,13 @@ class Lesson(models.Model):
     content_text = models.TextField(blank=True, null=True) # Now Optional
     video_url = models.URLField(blank=True, null=True)
     order = models.IntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='api_lesson_updated_idx'),
+            models.Index(fields=['course', 'order', 'id'], name='api_lesson_course_order_idx'), # A course's lessons, already sorted; also the lesson cursor order
+        ]
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -30,12 +49,20 @@ class Project(models.Model):
     deadline = models.DateField(blank=True, null=True)     # Now Optional
     points = models.IntegerField(default=100)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'deadline', 'id'], name='api_project_course_due_idx'), # Gradebook column order
+            # Due-date range scans; projects without a deadline never match one
+            models.Index(fields=['deadline'], condition=models.Q(deadline__isnull=False), name='api_project_deadline_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 # 4. SUBMISSION
 class Submission(models.Model):
     project = models.ForeignKey(Project, related_name='submissions', on_delete=models.CASCADE)
+    student = models.ForeignKey(User, related_name='submissions', on_delete=models.SET_NULL, null=True, blank=True)
     student_name = models.CharField(max_length=100)
     github_link = models.URLField(blank=True, null=True)
     submitted_file = models.FileField(upload_to='submissions/', blank=True, null=True)
@@ -44,6 +71,15 @@ class Submission(models.Model):
     grade = models.IntegerField(null=True, blank=True)
     feedback = models.TextField(blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'project'], name='api_sub_student_project_idx'),
+            models.Index(fields=['submitted_at', 'id'], name='api_sub_submitted_idx'),
+            models.Index(fields=['student', 'updated_at', 'id'], name='api_sub_student_updated_idx'),
+            models.Index(fields=['project', 'student_name'], name='api_sub_project_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student_name} - {self.project.title}"
@@ -79,17 +115,19 @@ class Enrollment(models.Model):
     student = models.ForeignKey(User, related_name='enrollments', on_delete=models.CASCADE)
     course = models.ForeignKey(Course, related_name='enrollments', on_delete=models.CASCADE)
     completed_lessons = models.ManyToManyField(Lesson, blank=True)
+    completed_count = models.PositiveIntegerField(default=0, editable=False) # Completed lessons of this course, kept by api.signals
     enrolled_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True) # Also bumped by the progress counter updates
 
     class Meta:
         unique_together = ('student', 'course')
+        indexes = [models.Index(fields=['student', 'updated_at', 'id'], name='api_enroll_student_upd_idx')]
 
     @property
     def progress_percent(self):
-        total = self.course.lessons.count()
+        total = self.course.lesson_count
         if total == 0: return 0
-        completed = self.completed_lessons.count()
-        return int((completed / total) * 100)
+        return int((min(self.completed_count, total) / total) * 100)
 
 # 9. NOTIFICATION
 class Notification(models.Model):
@@ -98,6 +136,20 @@ class Notification(models.Model):
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True) # Set explicitly by queryset.update() callers
+    # Set by the announcement fan-out; one notification per (announcement, user) even if the job is retried
+    announcement = models.ForeignKey('Announcement', related_name='notifications', null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'created_at'], name='api_notif_inbox_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='api_notif_user_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='api_notif_user_updated_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['announcement', 'user'], condition=models.Q(announcement__isnull=False),
+                                    name='api_notif_announcement_user_uniq'),
+        ]
 
 # 10. ANNOUNCEMENT
 class Announcement(models.Model):
@@ -105,6 +157,13 @@ class Announcement(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     posted_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['posted_at', 'id'], name='api_announce_posted_idx'),
+            models.Index(fields=['updated_at', 'id'], name='api_announce_updated_idx'),
+        ]
 
 # 11. COMMENT
 class Comment(models.Model):
@@ -113,6 +172,12 @@ class Comment(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='api_comment_created_idx'),
+            models.Index(fields=['lesson', 'created_at', 'id'], name='api_comment_lesson_idx'),
+        ]
+
 # 12. DEVICE (for push notifications)
 class Device(models.Model):
     DEVICE_TYPES = (
@@ -136,4 +201,130 @@ class LessonAttachment(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.display_name or self.file.name
\ No newline at end of file
+        return self.display_name or self.file.name
+
+# 14. TOMBSTONE - deletions of synced rows, read by /api/sync/
+class Tombstone(models.Model):
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    owner_id = models.BigIntegerField(null=True, blank=True) # Owning user for per-user rows; null = visible to everyone
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['deleted_at', 'id'], name='api_tombstone_deleted_idx')]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id}"
+
+# 15. QUIZ ATTEMPT - answers are stored as the list of chosen Choice ids
+class QuizAttempt(models.Model):
+    quiz = models.ForeignKey(Quiz, related_name='attempts', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='quiz_attempts', on_delete=models.CASCADE)
+    answers = models.JSONField(default=list)
+    score = models.PositiveIntegerField(default=0)
+    max_score = models.PositiveIntegerField(default=0)
+    submitted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['quiz', 'id'], name='api_attempt_quiz_idx'),
+            models.Index(fields=['user', 'submitted_at'], name='api_attempt_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.quiz} ({self.score}/{self.max_score})"
+
+# 16. UPLOAD SESSION - resumable chunked upload, committed into a LessonAttachment or Submission
+class UploadSession(models.Model):
+    TARGETS = (
+        ('lesson_attachment', 'Lesson attachment'),
+        ('submission', 'Submission'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, related_name='upload_sessions', on_delete=models.CASCADE)
+    target = models.CharField(max_length=30, choices=TARGETS)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['updated_at'], name='api_upload_updated_idx')]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.total_size})"
+
+# 17. JOB - background work queue drained by `manage.py runworker` (see api/jobs.py)
+class Job(models.Model):
+    STATUSES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    task = models.CharField(max_length=200) # Dotted path of a module-level function
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.IntegerField(default=0) # Higher runs first
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at', 'id'], name='api_job_claim_idx'),
+            models.Index(fields=['status', 'locked_at'], name='api_job_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status}, attempt {self.attempts})"
+
+# 18. SEARCH DOCUMENT - denormalized text of searchable rows; the full-text index over it is
+# created per database vendor by migration 0017 (Postgres tsvector + GIN, SQLite FTS5)
+class SearchDocument(models.Model):
+    KINDS = (
+        ('course', 'Course'),
+        ('lesson', 'Lesson'),
+        ('announcement', 'Announcement'),
+        ('comment', 'Comment'),
+    )
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.BigIntegerField()
+    course = models.ForeignKey(Course, related_name='+', on_delete=models.CASCADE, null=True, blank=True)
+    title = models.CharField(max_length=200, blank=True)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['kind', 'object_id'], name='api_search_doc_unique')]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}: {self.title}"
+
+# 19. UNREAD COUNTER - per-user count of unread notifications, kept by api.signals and the bulk read actions
+class UnreadCounter(models.Model):
+    user = models.OneToOneField(User, primary_key=True, related_name='unread_counter', on_delete=models.CASCADE)
+    unread = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+# 20. ARCHIVED ROW - JSON snapshot of a row moved out of a live table by `manage.py purge_expired`
+class ArchivedRow(models.Model):
+    model = models.CharField(max_length=100) # e.g. "api.notification"
+    object_id = models.BigIntegerField()
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['model', 'object_id'], name='api_archive_object_idx')]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id}"
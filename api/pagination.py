@@ -0,0 +1,118 @@
+import json
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+# --- KEYSET PAGINATION ---
+# Cursor pages are ordered on indexed columns declared per viewset as
+# `cursor_ordering` (always ending in the primary key so the order is total).
+# The cursor carries the last row's value for every ordering column and the
+# next page is `WHERE (a, b, id) > (...)`, written out as OR-ed comparisons so
+# mixed directions work. DRF's CursorPagination positions on the first column
+# only and steps through repeated values (Lesson.order, bulk-created
+# timestamps) with an OFFSET; here every position is unique and the offset is
+# always 0. Rows inserted while a client is paging never shift or duplicate a
+# page.
+#
+# During the mobile migration pagination is opt-in per request, either with
+# `?paginate=cursor` (or simply sending a `cursor`) or an `X-Pagination: cursor`
+# header. Endpoints listed in API_CURSOR_PAGINATION['REQUIRED'] always paginate.
+
+def _config():
+    return getattr(settings, 'API_CURSOR_PAGINATION', {})
+
+
+class OptInCursorPagination(CursorPagination):
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def __init__(self):
+        config = _config()
+        self.page_size = config.get('PAGE_SIZE', settings.REST_FRAMEWORK.get('PAGE_SIZE') or 50)
+        self.max_page_size = config.get('MAX_PAGE_SIZE', 200)
+
+    def is_enabled(self, request, view):
+        if getattr(view, 'basename', None) in _config().get('REQUIRED', ()):
+            return True
+        if self.cursor_query_param in request.query_params:
+            return True
+        return (request.query_params.get('paginate') == 'cursor'
+                or request.headers.get('X-Pagination', '').lower() == 'cursor')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', self.ordering)
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+    def _get_position_from_instance(self, instance, ordering):
+        names = [field.lstrip('-') for field in ordering]
+        values = [instance[name] if isinstance(instance, dict) else getattr(instance, name) for name in names]
+        return json.dumps([str(value) for value in values])
+
+    def _keyset(self, position, reverse):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            # Test for: (cursor reversed) XOR (field descending)
+            lookup = '__lt' if reverse != field.startswith('-') else '__gt'
+            equal = {f.lstrip('-'): value for f, value in zip(self.ordering[:index], values)}
+            conditions.append(Q(**equal, **{field.lstrip('-') + lookup: values[index]}))
+        return reduce(operator.or_, conditions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset() with the whole ordering tuple in the WHERE clause
+        if not self.is_enabled(request, view):
+            return None
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reversed(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self._keyset(current_position, reverse))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+        following_position = self._get_position_from_instance(results[-1], self.ordering) if has_following_position else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+def _reversed(ordering):
+    return tuple(field[1:] if field.startswith('-') else '-' + field for field in ordering)
@@ -0,0 +1,86 @@
+import re
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Comment, Enrollment, Lesson, Notification, Project, Submission
+
+# --- QUERY PLANS ---
+# The hot lookups below must be answered from an index: no sequential scan of
+# the table and no separate sort step for their ORDER BY. check_plans() runs
+# EXPLAIN for each one against a row that exists in the database, so it is
+# meaningful on a `manage.py seed_bench` dataset (`manage.py check_plans`) and
+# in the test suite. On Postgres, force_index=True disables sequential scans
+# for the check: a small table is scanned whenever that is cheaper, but the
+# planner still picks a seq scan when no usable index exists at all.
+
+HOT_QUERIES = {
+    # name: (sample row query, query built from the sample row)
+    'enrollment-mark-complete': (
+        Enrollment.objects.values('student_id', 'course_id'),
+        lambda row: Enrollment.objects.filter(student_id=row['student_id'], course_id=row['course_id']),
+    ),
+    'course-lessons': (
+        Lesson.objects.values('course_id'),
+        lambda row: Lesson.objects.filter(course_id=row['course_id']).order_by('order', 'id'),
+    ),
+    'unread-notifications': (
+        Notification.objects.values('user_id'),
+        lambda row: Notification.objects.filter(user_id=row['user_id'], is_read=False).order_by('-created_at'),
+    ),
+    'lesson-comments': (
+        Comment.objects.filter(lesson__isnull=False).values('lesson_id'),
+        lambda row: Comment.objects.filter(lesson_id=row['lesson_id']).order_by('created_at', 'id'),
+    ),
+    'project-submissions-by-name': (
+        Submission.objects.values('project_id', 'student_name'),
+        lambda row: Submission.objects.filter(project_id=row['project_id'], student_name=row['student_name']),
+    ),
+    'gradebook-projects': (
+        Project.objects.values('course_id'),
+        lambda row: Project.objects.filter(course_id=row['course_id']).order_by('deadline', 'id'),
+    ),
+    'projects-due-soon': (
+        Project.objects.values('id'),
+        lambda row: Project.objects.filter(deadline__range=(timezone.localdate(), timezone.localdate() + timedelta(days=7))),
+    ),
+}
+
+SQLITE_PROBLEMS = (
+    (re.compile(r'\bSCAN (\w+)'), 'sequential scan on {}'),
+    (re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)'), 'sort step for {}'),
+)
+POSTGRES_PROBLEMS = (
+    (re.compile(r'Seq Scan on (\w+)'), 'sequential scan on {}'),
+    (re.compile(r'->\s+(?:Incremental )?Sort\s+\(|^(?:Incremental )?Sort\s+\(', re.M), 'sort step'),
+)
+
+
+def problems(plan, vendor=None):
+    vendor = vendor or connection.vendor
+    patterns = {'sqlite': SQLITE_PROBLEMS, 'postgresql': POSTGRES_PROBLEMS}.get(vendor, ())
+    return [message.format(*match.groups()) for pattern, message in patterns for match in pattern.finditer(plan)]
+
+
+def explain(queryset, force_index=False):
+    with transaction.atomic():
+        if force_index and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def check_plans(names=None, force_index=False):
+    """{name: {'plan', 'problems'}} for every hot query with a sample row; {'skipped': True} otherwise."""
+    report = {}
+    for name, (sample, build) in HOT_QUERIES.items():
+        if names and name not in names:
+            continue
+        row = sample.order_by().first()
+        if row is None:
+            report[name] = {'skipped': True}
+            continue
+        plan = explain(build(row), force_index=force_index)
+        report[name] = {'plan': plan, 'problems': problems(plan)}
+    return report
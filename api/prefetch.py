@@ -0,0 +1,75 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+# --- QUERY PLANS ---
+# A plan is derived from the (already pruned) field tree of a serializer:
+#   * nested `many=True` serializers become Prefetch() lookups whose queryset is
+#     itself planned from the child serializer,
+#   * dotted sources on forward relations ('user.username', 'course.title')
+#     become select_related() lookups,
+#   * serializers can declare extra lookups for properties the walker cannot
+#     see through (e.g. Enrollment.progress_percent) with
+#     `Meta.select_related` / `Meta.prefetch_related`,
+#   * `Meta.annotations` maps field names to expression factories; only the
+#     fields still present after sparse-fieldset pruning are annotated.
+
+def _relation_path(model, attrs):
+    """Return the longest forward-relation prefix of `attrs` on `model`."""
+    path = []
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not (field.is_relation and (field.many_to_one or field.one_to_one)):
+            break
+        path.append(attr)
+        model = field.related_model
+    return path
+
+
+def build_plan(serializer):
+    """Return (select_related, prefetch_related, annotations) for a serializer."""
+    model = serializer.Meta.model
+    meta = serializer.Meta
+    select = list(getattr(meta, 'select_related', ()))
+    prefetch = list(getattr(meta, 'prefetch_related', ()))
+    annotations = {
+        name: factory() for name, factory in getattr(meta, 'annotations', {}).items()
+        if name in serializer.fields
+    }
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        if isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+            lookup = '__'.join(field.source_attrs)
+            child_qs = apply_plan(field.child.Meta.model._default_manager.all(), field.child)
+            prefetch.append(Prefetch(lookup, queryset=child_qs))
+        elif isinstance(field, serializers.ModelSerializer):
+            path = _relation_path(model, field.source_attrs)
+            if path:
+                select.append('__'.join(path))
+                child_select, child_prefetch, _ = build_plan(field)
+                prefix = '__'.join(path) + '__'
+                select += [prefix + lookup for lookup in child_select]
+                prefetch += [prefix + lookup for lookup in child_prefetch if isinstance(lookup, str)]
+        elif len(field.source_attrs) > 1:
+            path = _relation_path(model, field.source_attrs[:-1])
+            if path:
+                select.append('__'.join(path))
+
+    return list(dict.fromkeys(select)), prefetch, annotations
+
+
+def apply_plan(queryset, serializer):
+    select, prefetch, annotations = build_plan(serializer)
+    if annotations:
+        queryset = queryset.annotate(**annotations)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import cache
+from .models import Course, Enrollment, Lesson, Notification, UnreadCounter
+
+# --- MATERIALIZED PROGRESS ---
+# Course.lesson_count and Enrollment.completed_count are denormalized so that
+# Enrollment.progress_percent needs no queries. api.signals keeps them current
+# incrementally; the helpers below recompute them from scratch (bulk loads,
+# repairs, `manage.py rebuild_progress`). UnreadCounter works the same way for
+# the notification badge; a user without a counter row gets one on first read.
+
+CompletedLesson = Enrollment.completed_lessons.through
+
+
+def actual_lesson_count():
+    lessons = Lesson.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(lessons), 0)
+
+
+def actual_completed_count():
+    # Only lessons of the enrollment's own course count towards its progress
+    done = (CompletedLesson.objects
+            .filter(enrollment=OuterRef('pk'), lesson__course=OuterRef('course'))
+            .order_by().values('enrollment').annotate(n=Count('pk')).values('n'))
+    return Coalesce(Subquery(done), 0)
+
+
+# updated_at is bumped with the counters so /api/sync/ clients see the new progress
+def recount_courses(queryset):
+    return queryset.update(lesson_count=actual_lesson_count(), updated_at=timezone.now())
+
+
+def recount_enrollments(queryset):
+    return queryset.update(completed_count=actual_completed_count(), updated_at=timezone.now())
+
+
+def touch_enrollments(*course_ids):
+    # progress_percent divides by Course.lesson_count: a new total changes every
+    # enrollment of the course as delta sync sees it
+    return Enrollment.objects.filter(course_id__in=course_ids).update(updated_at=timezone.now())
+
+
+def actual_unread_count():
+    unread = (Notification.objects.filter(user=OuterRef('user'), is_read=False)
+              .order_by().values('user').annotate(n=Count('pk')).values('n'))
+    return Coalesce(Subquery(unread), 0)
+
+
+def recount_unread(queryset):
+    return queryset.update(unread=actual_unread_count())
+
+
+def _pk_batches(queryset, batch_size):
+    bounds = queryset.aggregate(lo=Min('pk'), hi=Max('pk'))
+    if bounds['lo'] is None:
+        return
+    for start in range(bounds['lo'], bounds['hi'] + 1, batch_size):
+        yield queryset.filter(pk__gte=start, pk__lt=start + batch_size)
+
+
+def find_drift(model, field, expression, queryset=None):
+    queryset = model.objects.all() if queryset is None else queryset
+    return queryset.annotate(actual=expression).exclude(**{field: F('actual')})
+
+
+def rebuild(batch_size=5000, dry_run=False):
+    """Recompute every counter in pk-range batches; returns drift found per counter."""
+    report = {}
+    for model, field, expression, recount in (
+        (Course, 'lesson_count', actual_lesson_count, recount_courses),
+        (Enrollment, 'completed_count', actual_completed_count, recount_enrollments),
+        (UnreadCounter, 'unread', actual_unread_count, recount_unread),
+    ):
+        drifted = 0
+        for batch in _pk_batches(model.objects.all(), batch_size):
+            stale = list(find_drift(model, field, expression(), batch).values_list('pk', flat=True))
+            drifted += len(stale)
+            if stale and not dry_run:
+                with transaction.atomic():
+                    recount(model.objects.filter(pk__in=stale))
+        report[f'{model._meta.model_name}.{field}'] = drifted
+    if not dry_run:
+        # lesson_count is part of the cached course payloads and update() sends no signals
+        cache.bump_all()
+    return report
+
+
+# --- UNREAD COUNTERS ---
+def adjust_unread(user_ids, delta):
+    # Users without a counter row are skipped; their count is computed when first read
+    if user_ids and delta:
+        UnreadCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + delta)
+
+
+def unread_count(user_id):
+    counter = UnreadCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+    if counter is None:
+        counter = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        UnreadCounter.objects.get_or_create(user_id=user_id, defaults={'unread': counter})
+    return counter
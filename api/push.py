@@ -0,0 +1,79 @@
+import json
+import logging
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# --- PUSH TRANSPORTS ---
+# A transport takes a list of messages ({'to', 'title', 'body', 'data'}) and
+# returns the tokens the provider reported as no longer registered, so callers
+# can prune them. A request that fails as a whole (network, HTTP error) raises,
+# so the job sending it is retried. API_PUSH['TRANSPORT'] picks the class;
+# LocMemTransport keeps everything in memory for tests and local development.
+
+EXPO_URL = 'https://exp.host/--/api/v2/push/send'
+EXPO_BATCH_SIZE = 100  # Expo's limit of messages per request
+
+
+class ExpoTransport:
+    device_type = 'expo'
+    batch_size = EXPO_BATCH_SIZE
+
+    def __init__(self, url=EXPO_URL, access_token=None, timeout=10):
+        self.url = url
+        self.access_token = access_token
+        self.timeout = timeout
+
+    def send(self, messages):
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if self.access_token:
+            headers['Authorization'] = f'Bearer {self.access_token}'
+        request = urllib.request.Request(self.url, data=json.dumps(messages).encode(), headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            tickets = json.load(response).get('data', [])
+        # Tickets come back in message order
+        invalid = []
+        for message, ticket in zip(messages, tickets):
+            if ticket.get('status') == 'error':
+                error = (ticket.get('details') or {}).get('error')
+                if error == 'DeviceNotRegistered':
+                    invalid.append(message['to'])
+                else:
+                    logger.warning('Push to %s failed: %s', message['to'], ticket.get('message'))
+        return invalid
+
+
+class LocMemTransport:
+    device_type = 'expo'
+    batch_size = EXPO_BATCH_SIZE
+    outbox = []
+    # Tokens that the fake provider reports as DeviceNotRegistered
+    unregistered = set()
+    batches = 0
+    # Number of upcoming send() calls that fail as if the provider were unreachable
+    failures = 0
+
+    def __init__(self, **options):
+        pass
+
+    def send(self, messages):
+        if LocMemTransport.failures:
+            LocMemTransport.failures -= 1
+            raise urllib.error.URLError('provider unreachable')
+        LocMemTransport.batches += 1
+        LocMemTransport.outbox.extend(messages)
+        return [m['to'] for m in messages if m['to'] in self.unregistered]
+
+    @classmethod
+    def reset(cls):
+        cls.outbox, cls.unregistered, cls.batches, cls.failures = [], set(), 0, 0
+
+
+def get_transport():
+    config = dict(getattr(settings, 'API_PUSH', {}))
+    transport = import_string(config.pop('TRANSPORT', 'api.push.ExpoTransport'))
+    return transport(**{key.lower(): value for key, value in config.items()})
@@ -0,0 +1,115 @@
+import contextvars
+import hashlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from rest_framework.permissions import SAFE_METHODS
+
+# --- READ REPLICA ---
+# With REPLICA_DATABASE_URL set (see backend/settings.py) ReplicaMiddleware
+# marks safe-method DRF views as replica reads and ReplicaRouter sends their
+# queries to API_REPLICA['ALIAS']. Everything else goes to the primary:
+#   * writes, and reads outside such views (jobs, commands, admin),
+#   * auth/token/session lookups, so a token issued a moment ago works at once,
+#   * the database cache table (version stamps, pins) when CACHE_BACKEND=db,
+#   * views with `replica_reads = False` (delta sync must never miss a row),
+#   * get_or_create()/select_for_update() (Django reads those from the write db),
+#   * streamed bodies (exports), which are produced after the view has returned,
+#   * every read of a client that wrote within STICKY_SECONDS. A successful
+#     unsafe request pins its credential (Authorization header or session
+#     cookie) in the shared cache, so the client reads its own writes.
+# Use a shared cache backend (file/db) with several workers, as for api.cache.
+# Locally, a copy of db.sqlite3 as the replica behaves like one that lags forever.
+
+PRIMARY_APPS = {'auth', 'authtoken', 'sessions', 'django_cache'}
+PIN_KEY = 'api:replica:pin:{}'
+
+_replica_reads = contextvars.ContextVar('api_replica_reads', default=False)
+
+
+def _config():
+    return getattr(settings, 'API_REPLICA', {})
+
+
+def replica_alias():
+    return _config().get('ALIAS', 'replica')
+
+
+def is_configured():
+    return _config().get('ENABLED', True) and replica_alias() in settings.DATABASES
+
+
+def sticky_seconds():
+    return _config().get('STICKY_SECONDS', 15)
+
+
+@contextmanager
+def use_primary():
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def recently_changed(last_modified):
+    """True if a replica may not have caught up with a change made at `last_modified` yet."""
+    return last_modified is not None and (timezone.now() - last_modified).total_seconds() < sticky_seconds()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and model._meta.app_label not in PRIMARY_APPS:
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or Django would write an instance back to the alias it was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, replica_alias()}:
+            return True
+        return None
+
+
+def _pin_key(request):
+    credential = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return PIN_KEY.format(hashlib.sha256(credential.encode()).hexdigest())
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        if not is_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            # Not reset(): under ASGI process_view may have run in another (copied) context
+            if getattr(request, '_replica_reads', False):
+                _replica_reads.set(False)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            key = _pin_key(request)
+            if key:
+                caches[_config().get('CACHE_ALIAS', 'default')].set(key, True, timeout=sticky_seconds())
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)  # DRF views and viewsets only
+        if request.method not in SAFE_METHODS or view_class is None or not getattr(view_class, 'replica_reads', True):
+            return None
+        key = _pin_key(request)
+        if key and caches[_config().get('CACHE_ALIAS', 'default')].get(key):
+            return None
+        _replica_reads.set(True)
+        request._replica_reads = True
+        return None
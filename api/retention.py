@@ -0,0 +1,103 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache, sync
+from .models import ArchivedRow, Comment, Lesson, Notification, SearchDocument, Tombstone
+from .progress import adjust_unread
+
+# --- RETENTION ---
+# API_RETENTION['POLICIES'] names a model, an optional filter, an age field and
+# a number of days; expired rows are archived (JSON snapshot in ArchivedRow)
+# or deleted. Rows go in primary-key batches, each in its own short
+# transaction, so live traffic never waits on a long lock.
+#
+# Deletes are plain DELETE statements without per-row signals; what those
+# signals would have kept in step (unread counters, search documents, course
+# cache versions) is updated by the per-model hook below, once per batch.
+# Rows of a delta-synced model (sync.SOURCES) leave a tombstone, archived or
+# deleted alike, so devices drop their copy on the next sync.
+
+
+def policies():
+    return getattr(settings, 'API_RETENTION', {}).get('POLICIES', {})
+
+
+def _after_notifications(rows):
+    unread = Counter(row['user_id'] for row in rows if not row['is_read'])
+    for times in set(unread.values()):
+        adjust_unread([user_id for user_id, n in unread.items() if n == times], -times)
+
+
+def _after_comments(rows):
+    SearchDocument.objects.filter(kind='comment', object_id__in=[row['id'] for row in rows]).delete()
+    lesson_ids = {row['lesson_id'] for row in rows if row['lesson_id']}
+    for course_id in set(Lesson.objects.filter(pk__in=lesson_ids).values_list('course_id', flat=True)):
+        cache.bump_course(course_id)
+
+
+AFTER_PURGE = {Notification: _after_notifications, Comment: _after_comments}
+
+
+def _record_tombstones(model, rows):
+    # signals.record_tombstone() for a batch; rows are .values() dicts, so the owner is its *_id column
+    name = sync.SOURCE_OF_MODEL[model]
+    owner = sync.SOURCES[name][2]
+    Tombstone.objects.bulk_create([
+        Tombstone(model=name, object_id=row['id'], owner_id=row[f'{owner}_id'] if owner else None) for row in rows])
+
+
+def expired(policy, now=None):
+    model = apps.get_model(policy['model'])
+    cutoff = (now or timezone.now()) - timedelta(days=policy['days'])
+    return model, model.objects.filter(**policy.get('filter', {}), **{f"{policy.get('age_field', 'created_at')}__lt": cutoff})
+
+
+def _delete(model, ids):
+    table, pk = connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {pk} IN ({", ".join(["%s"] * len(ids))})', ids)
+
+
+def apply_policy(policy, batch_size=1000, dry_run=False, max_seconds=None, pause=0.0):
+    """Archive or delete one policy's expired rows; returns {'rows', 'batches', 'seconds', 'complete'}."""
+    started = time.monotonic()
+    model, queryset = expired(policy)
+    report = {'rows': 0, 'batches': 0, 'seconds': 0.0, 'complete': True}
+    if dry_run:
+        report['rows'] = queryset.count()
+    else:
+        label = model._meta.label_lower
+        last_pk = 0
+        while True:
+            if max_seconds is not None and time.monotonic() - started >= max_seconds:
+                report['complete'] = False
+                break
+            with transaction.atomic():
+                batch = queryset.filter(pk__gt=last_pk).order_by('pk')
+                if connection.features.has_select_for_update_skip_locked:
+                    # Rows being edited right now are left for the next run instead of waited for
+                    batch = batch.select_for_update(skip_locked=True)
+                rows = list(batch.values()[:batch_size])
+                if not rows:
+                    break
+                ids = [row['id'] for row in rows]
+                if policy.get('action', 'delete') == 'archive':
+                    ArchivedRow.objects.bulk_create([ArchivedRow(model=label, object_id=row['id'], data=row) for row in rows])
+                _delete(model, ids)
+                if model in sync.SOURCE_OF_MODEL:
+                    _record_tombstones(model, rows)
+                if model in AFTER_PURGE:
+                    AFTER_PURGE[model](rows)
+            last_pk = ids[-1]
+            report['rows'] += len(rows)
+            report['batches'] += 1
+            if pause:
+                time.sleep(pause)
+    report['seconds'] = round(time.monotonic() - started, 3)
+    return report
@@ -0,0 +1,100 @@
+from django.http import Http404
+
+from . import cache
+from .models import Question, Quiz, QuizAttempt
+
+# --- QUIZ SCORING ---
+# The answer key of a quiz is one query, cached under the quiz version stamp
+# (bumped by api.signals and by bulk quiz authoring), so submitting an attempt
+# normally costs no read at all. On a per-process cache (locmem) the key is
+# read from the database on every submission instead. A question earns its point when the set of
+# choices picked for it equals its set of correct choices.
+
+ANSWER_KEY = 'api:quiz:{}:answer-key:{}:{}'
+
+
+class InvalidAnswers(ValueError):
+    pass
+
+
+class AnswerKey:
+    def __init__(self, rows):
+        self.question_of = {}
+        self.correct = {}
+        for question_id, choice_id, is_correct in rows:
+            self.correct.setdefault(question_id, set())
+            if choice_id is None:
+                continue
+            self.question_of[choice_id] = question_id
+            if is_correct:
+                self.correct[question_id].add(choice_id)
+
+    @property
+    def max_score(self):
+        return len(self.correct)
+
+    def score(self, answers):
+        picked = {}
+        for choice_id in answers:
+            question_id = self.question_of.get(choice_id)
+            if question_id is None:
+                raise InvalidAnswers(f'Choice {choice_id} is not part of this quiz.')
+            picked.setdefault(question_id, set()).add(choice_id)
+        return sum(1 for question_id, choices in picked.items() if choices == self.correct[question_id])
+
+
+def load_answer_key(quiz_id):
+    rows = list(Question.objects.filter(quiz_id=quiz_id).values_list('id', 'choices__id', 'choices__is_correct'))
+    if not rows and not Quiz.objects.filter(pk=quiz_id).exists():
+        raise Http404('Quiz not found')
+    return AnswerKey(rows)
+
+
+def answer_key(quiz_id):
+    if not cache.is_shared():
+        # A bump made in another worker never reaches a per-process cache: grade from the database
+        return load_answer_key(quiz_id)
+    versions = cache.quiz_version(quiz_id)
+    if versions is None:
+        raise Http404('Quiz not found')
+    key = ANSWER_KEY.format(quiz_id, *versions)
+    store = cache.get_cache()
+    found = store.get(key)
+    if found is None:
+        found = load_answer_key(quiz_id)
+        store.set(key, found, timeout=None)
+    return found
+
+
+def submit_attempt(quiz_id, user, answers):
+    key = answer_key(quiz_id)
+    return QuizAttempt.objects.create(
+        quiz_id=quiz_id, user=user, answers=list(answers),
+        score=key.score(answers), max_score=key.max_score,
+    )
+
+
+def rescore(quiz_id, batch_size=2000):
+    """Re-grade every attempt of a quiz against a freshly loaded key; returns (seen, changed)."""
+    key = load_answer_key(quiz_id)
+    seen = changed = 0
+    batch = []
+    attempts = QuizAttempt.objects.filter(quiz_id=quiz_id).only('id', 'answers', 'score', 'max_score')
+    for attempt in attempts.iterator(chunk_size=batch_size):
+        seen += 1
+        try:
+            score = key.score(attempt.answers)
+        except InvalidAnswers:
+            # Choices deleted since the attempt no longer count
+            score = key.score([c for c in attempt.answers if c in key.question_of])
+        if (score, key.max_score) != (attempt.score, attempt.max_score):
+            attempt.score, attempt.max_score = score, key.max_score
+            batch.append(attempt)
+        if len(batch) >= batch_size:
+            QuizAttempt.objects.bulk_update(batch, ['score', 'max_score'])
+            changed += len(batch)
+            batch = []
+    if batch:
+        QuizAttempt.objects.bulk_update(batch, ['score', 'max_score'])
+        changed += len(batch)
+    return seen, changed
@@ -0,0 +1,144 @@
+import re
+
+from django.db import connection
+
+from .models import Announcement, Comment, Course, Lesson, SearchDocument
+
+# --- FULL-TEXT SEARCH ---
+# Searchable rows are copied into api_searchdocument (one row per object,
+# updated by api.signals on save/delete). Migration 0017 indexes that table
+# natively: a weighted tsvector column with a GIN index on Postgres, an
+# external-content FTS5 table kept current by triggers on SQLite. Titles weigh
+# more than bodies in both. Other vendors fall back to a LIKE scan.
+
+SNIPPET_START, SNIPPET_STOP = '<mark>', '</mark>'
+MAX_TITLE = 200
+BATCH_SIZE = 1000
+
+
+def _course_of_comment(comment):
+    return Lesson.objects.filter(pk=comment.lesson_id).values_list('course_id', flat=True).first() if comment.lesson_id else None
+
+
+SOURCES = {
+    # model: (kind, course_id, title, body)
+    Course: ('course', lambda o: o.pk, lambda o: o.title, lambda o: o.description),
+    Lesson: ('lesson', lambda o: o.course_id, lambda o: o.title, lambda o: o.content_text),
+    Announcement: ('announcement', lambda o: o.course_id, lambda o: o.title, lambda o: o.content),
+    Comment: ('comment', _course_of_comment, lambda o: '', lambda o: o.text),
+}
+BULK_SOURCES = {
+    'course': Course.objects.values_list('id', 'id', 'title', 'description'),
+    'lesson': Lesson.objects.values_list('id', 'course_id', 'title', 'content_text'),
+    'announcement': Announcement.objects.values_list('id', 'course_id', 'title', 'content'),
+    'comment': Comment.objects.values_list('id', 'lesson__course_id', 'text', 'text'),
+}
+
+
+def index_object(instance):
+    kind, course_of, title_of, body_of = SOURCES[type(instance)]
+    SearchDocument.objects.update_or_create(kind=kind, object_id=instance.pk, defaults={
+        'course_id': course_of(instance), 'title': (title_of(instance) or '')[:MAX_TITLE], 'body': body_of(instance) or '',
+    })
+
+
+def remove_object(instance):
+    SearchDocument.objects.filter(kind=SOURCES[type(instance)][0], object_id=instance.pk).delete()
+
+
+def rebuild(kinds=None, batch_size=BATCH_SIZE):
+    """Re-create the documents of the given kinds (all by default); returns {kind: count}."""
+    counts = {}
+    for kind, rows in BULK_SOURCES.items():
+        if kinds and kind not in kinds:
+            continue
+        SearchDocument.objects.filter(kind=kind).delete()
+        counts[kind] = 0
+        batch = []
+        for pk, course_id, title, body in rows.iterator(chunk_size=batch_size):
+            title = '' if kind == 'comment' else (title or '')[:MAX_TITLE]
+            batch.append(SearchDocument(kind=kind, object_id=pk, course_id=course_id, title=title, body=body or ''))
+            if len(batch) >= batch_size:
+                SearchDocument.objects.bulk_create(batch)
+                counts[kind] += len(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+        counts[kind] += len(batch)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO api_search_fts(api_search_fts) VALUES ('optimize')")
+    return counts
+
+
+def _terms(query):
+    return re.findall(r'\w+', query)[:16]
+
+
+def _filters(kinds, course_id):
+    clauses, params = [], []
+    if kinds:
+        clauses.append('d.kind IN (%s)' % ', '.join(['%s'] * len(kinds)))
+        params.extend(kinds)
+    if course_id is not None:
+        clauses.append('d.course_id = %s')
+        params.append(course_id)
+    return ''.join(' AND ' + clause for clause in clauses), params
+
+
+def _postgres(terms, where, params, limit):
+    # Every term must match; the last one is a prefix so results appear while typing
+    tsquery = ' & '.join(f"{term}:*" if n == len(terms) - 1 else term for n, term in enumerate(terms))
+    sql = f"""
+        SELECT d.kind, d.object_id, d.course_id, d.title,
+               ts_headline('english', d.body, q, %s) AS snippet,
+               ts_rank(d.search_vector, q) AS rank
+        FROM api_searchdocument d, to_tsquery('english', %s) q
+        WHERE d.search_vector @@ q{where}
+        ORDER BY rank DESC, d.id
+        LIMIT %s"""
+    options = f'StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, MaxWords=24, MinWords=8, MaxFragments=1'
+    return sql, [options, tsquery, *params, limit]
+
+
+def _sqlite(terms, where, params, limit):
+    match = ' '.join(f'"{term}"*' if n == len(terms) - 1 else f'"{term}"' for n, term in enumerate(terms))
+    # bm25() is lower-is-better; negate so both vendors return "higher ranks first"
+    sql = f"""
+        SELECT d.kind, d.object_id, d.course_id, d.title,
+               snippet(api_search_fts, 1, %s, %s, '…', 16) AS snippet,
+               -bm25(api_search_fts, 5.0, 1.0) AS rank
+        FROM api_search_fts JOIN api_searchdocument d ON d.id = api_search_fts.rowid
+        WHERE api_search_fts MATCH %s{where}
+        ORDER BY rank DESC, d.id
+        LIMIT %s"""
+    return sql, [SNIPPET_START, SNIPPET_STOP, match, *params, limit]
+
+
+def _fallback(terms, kinds, course_id, limit):
+    documents = SearchDocument.objects.all()
+    for term in terms:
+        documents = documents.filter(body__icontains=term) | documents.filter(title__icontains=term)
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+    if course_id is not None:
+        documents = documents.filter(course_id=course_id)
+    return [(d.kind, d.object_id, d.course_id, d.title, d.body[:160], 0.0) for d in documents.order_by('-updated_at')[:limit]]
+
+
+def search(query, kinds=None, course_id=None, limit=20):
+    terms = _terms(query)
+    if not terms:
+        return []
+    if connection.vendor in ('postgresql', 'sqlite'):
+        where, params = _filters(kinds, course_id)
+        build = _postgres if connection.vendor == 'postgresql' else _sqlite
+        sql, params = build(terms, where, params, limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+    else:
+        rows = _fallback(terms, kinds, course_id, limit)
+    return [
+        {'type': kind, 'id': object_id, 'course': course, 'title': title, 'snippet': snippet, 'rank': round(rank, 4)}
+        for kind, object_id, course, title, snippet, rank in rows
+    ]
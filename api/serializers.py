@@ -1,7 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from .models import Course, Lesson, Project, Submission, Quiz, Question, Choice, Enrollment, Announcement, Notification, Comment
-from .models import Device, LessonAttachment
+from .models import Device, LessonAttachment, QuizAttempt, UploadSession
+from .cache import bump_course, bump_quiz
+from . import uploads
 
 # --- AUTH ---
 class RegisterSerializer(serializers.ModelSerializer):
@@ -25,6 +30,33 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'is_staff']
 
+# --- SPARSE FIELDSETS ---
+def _param_list(request, name):
+    if request is None:
+        return []
+    return [f.strip() for f in request.query_params.get(name, '').split(',') if f.strip()]
+
+def related_count(model, fk):
+    # Correlated COUNT(*) so several counts on one row don't multiply through joins
+    counts = model.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts), 0)
+
+class DynamicFieldsMixin:
+    # ?fields=a,b keeps only the named fields; fields listed in Meta.deferred_fields are left out
+    # unless named in ?expand=. Pruned fields are never serialized and never prefetched.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        wanted = set(_param_list(request, 'fields'))
+        expand = set(_param_list(request, 'expand'))
+        for name in getattr(self.Meta, 'deferred_fields', ()):
+            if name not in expand:
+                self.fields.pop(name, None)
+        if wanted:
+            for name in list(self.fields):
+                if name not in wanted | expand:
+                    self.fields.pop(name)
+
 # --- FEATURES ---
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -54,6 +86,18 @@ class EnrollmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Enrollment
         fields = ['id', 'student', 'course', 'course_title', 'progress', 'enrolled_at']
+        read_only_fields = ['student'] # Set by EnrollmentViewSet
+
+    def validate(self, attrs):
+        # student is read-only, so ModelSerializer no longer checks unique_together itself
+        student = self.instance.student_id if self.instance else self.context.get('student_id')
+        course = attrs.get('course', getattr(self.instance, 'course', None))
+        duplicates = Enrollment.objects.filter(student_id=student, course=course)
+        if self.instance:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if student and course and duplicates.exists():
+            raise serializers.ValidationError('Already enrolled in this course.')
+        return attrs
 
 # --- CONTENT ---
 class CommentSerializer(serializers.ModelSerializer):
@@ -63,32 +107,188 @@ class CommentSerializer(serializers.ModelSerializer):
 class ChoiceSerializer(serializers.ModelSerializer):
     class Meta: model = Choice; fields = ['id', 'text', 'is_correct']
 
+    def get_fields(self):
+        # The answer key is for staff; students are graded by POST /quizzes/<id>/submit/
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or not request.user.is_staff:
+            fields.pop('is_correct')
+        return fields
+
 class QuestionSerializer(serializers.ModelSerializer):
     choices = ChoiceSerializer(many=True, read_only=True)
     class Meta: model = Question; fields = ['id', 'text', 'choices']
 
-class QuizSerializer(serializers.ModelSerializer):
+class QuizSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
     class Meta: model = Quiz; fields = ['id', 'title', 'description', 'questions']
 
+class QuizSummarySerializer(QuizSerializer):
+    class Meta(QuizSerializer.Meta):
+        deferred_fields = ['questions']
+
+# --- QUIZ AUTHORING ---
+# A whole quiz as one document: {title, ..., questions: [{id?, text, choices: [{id?, text, is_correct}]}]}.
+# Items with an id update that row, items without one are created, rows left out of a full (PUT)
+# document are deleted. Everything is written with bulk_create/bulk_update in one transaction.
+class ChoiceDocumentSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    class Meta: model = Choice; fields = ['id', 'text', 'is_correct']
+
+class QuestionDocumentSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    choices = ChoiceDocumentSerializer(many=True, required=False)
+    class Meta: model = Question; fields = ['id', 'text', 'choices']
+
+def _diff_children(model, parent_field, parent_id, existing, items, fields, partial):
+    """Split document items into (to_create, to_update, ids_to_delete) against existing rows."""
+    to_create, to_update, kept = [], [], set()
+    for item in items:
+        values = {f: item[f] for f in fields if f in item}
+        if item.get('id') is None:
+            to_create.append(model(**{parent_field: parent_id}, **values))
+            continue
+        row = existing[item['id']]
+        kept.add(row.pk)
+        if any(getattr(row, f) != v for f, v in values.items()):
+            for f, v in values.items():
+                setattr(row, f, v)
+            to_update.append(row)
+    stale = [] if partial else [pk for pk in existing if pk not in kept]
+    return to_create, to_update, stale
+
+class QuizDocumentSerializer(serializers.ModelSerializer):
+    questions = QuestionDocumentSerializer(many=True, required=False)
+
+    class Meta:
+        model = Quiz
+        fields = ['id', 'course', 'title', 'description', 'questions']
+
+    def validate(self, attrs):
+        # Per-item errors are reported at the item's position, like DRF's own nested validation
+        quiz = self.instance
+        known = {}
+        if quiz is not None:
+            for choice in Choice.objects.filter(question__quiz=quiz).only('id', 'question_id'):
+                known.setdefault(choice.question_id, set()).add(choice.id)
+            for question_id in quiz.questions.values_list('id', flat=True):
+                known.setdefault(question_id, set())
+        errors, failed = [], False
+        for question in attrs.get('questions', []):
+            error = {}
+            qid = question.get('id')
+            if qid is not None and qid not in known:
+                error['id'] = [f'Question {qid} does not belong to this quiz.']
+            if qid is None and not question.get('text'):
+                error['text'] = ['This field is required.']
+            choice_errors = []
+            for choice in question.get('choices', []):
+                cid = choice.get('id')
+                if cid is not None and cid not in known.get(qid, ()):
+                    choice_errors.append({'id': [f'Choice {cid} does not belong to this question.']})
+                elif cid is None and not choice.get('text'):
+                    choice_errors.append({'text': ['This field is required.']})
+                else:
+                    choice_errors.append({})
+            if any(choice_errors):
+                error['choices'] = choice_errors
+            errors.append(error)
+            failed = failed or bool(error)
+        if failed:
+            raise serializers.ValidationError({'questions': errors})
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        questions = validated_data.pop('questions', [])
+        quiz = Quiz.objects.create(**validated_data)
+        self._write_questions(quiz, questions, partial=False)
+        return quiz
+
+    @transaction.atomic
+    def update(self, quiz, validated_data):
+        questions = validated_data.pop('questions', None)
+        old_course_id = quiz.course_id
+        super().update(quiz, validated_data)
+        if old_course_id != quiz.course_id:
+            # Moved: the old course's tree lists the quiz until it is bumped after commit as well
+            transaction.on_commit(lambda: bump_course(old_course_id))
+        if questions is not None:
+            self._write_questions(quiz, questions, partial=self.partial)
+        return quiz
+
+    def _write_questions(self, quiz, questions, partial):
+        existing = {q.pk: q for q in quiz.questions.all()} if quiz.pk and questions else {}
+        new, changed, stale = _diff_children(Question, 'quiz_id', quiz.pk, existing, questions, ['text'], partial)
+        Question.objects.bulk_create(new)
+        Question.objects.bulk_update(changed, ['text'])
+        if stale:
+            Question.objects.filter(pk__in=stale).delete()
+
+        created = iter(new)
+        existing_choices = {}
+        for choice in Choice.objects.filter(question_id__in=[q['id'] for q in questions if q.get('id')]):
+            existing_choices.setdefault(choice.question_id, {})[choice.pk] = choice
+        new_choices, changed_choices, stale_choices = [], [], []
+        for question in questions:
+            question_id = question['id'] if question.get('id') is not None else next(created).pk
+            if 'choices' not in question:
+                continue
+            c_new, c_changed, c_stale = _diff_children(
+                Choice, 'question_id', question_id, existing_choices.get(question_id, {}),
+                question['choices'], ['text', 'is_correct'], partial)
+            new_choices += c_new
+            changed_choices += c_changed
+            stale_choices += c_stale
+        Choice.objects.bulk_create(new_choices)
+        Choice.objects.bulk_update(changed_choices, ['text', 'is_correct'])
+        if stale_choices:
+            Choice.objects.filter(pk__in=stale_choices).delete()
+        # Bulk writes send no model signals, so invalidate the course tree and answer key explicitly
+        transaction.on_commit(lambda: (bump_course(quiz.course_id), bump_quiz(quiz.pk)))
+
+class QuizAttemptSerializer(serializers.ModelSerializer):
+    answers = serializers.ListField(child=serializers.IntegerField(), max_length=1000)
+
+    class Meta:
+        model = QuizAttempt
+        fields = ['id', 'quiz', 'user', 'answers', 'score', 'max_score', 'submitted_at']
+        read_only_fields = ['quiz', 'user', 'score', 'max_score']
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'target', 'filename', 'total_size', 'received', 'created_at', 'updated_at']
+        read_only_fields = ['received']
+
+    def validate_total_size(self, value):
+        if value <= 0 or value > uploads.max_size():
+            raise serializers.ValidationError(f'total_size must be between 1 and {uploads.max_size()} bytes.')
+        return value
+
 class SubmissionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Submission
         fields = '__all__'
+        read_only_fields = ['student'] # Set by SubmissionViewSet
 
 class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = '__all__'
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     comments = CommentSerializer(many=True, read_only=True)
     attachments = LessonAttachmentSerializer(many=True, read_only=True)
     class Meta:
         model = Lesson
         fields = '__all__'
 
-class CourseSerializer(serializers.ModelSerializer):
+class LessonSummarySerializer(LessonSerializer):
+    class Meta(LessonSerializer.Meta):
+        deferred_fields = ['content_text', 'comments', 'attachments']
+
+class CourseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     lessons = LessonSerializer(many=True, read_only=True)
     projects = ProjectSerializer(many=True, read_only=True)
     quizzes = QuizSerializer(many=True, read_only=True)
@@ -96,4 +296,24 @@ class CourseSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Course
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+# List payload for the home screen; nested trees are opt-in via ?expand=lessons,projects,...
+class CourseSummarySerializer(CourseSerializer):
+    project_count = serializers.IntegerField(read_only=True)
+
+    class Meta(CourseSerializer.Meta):
+        fields = ['id', 'title', 'description', 'instructor_name', 'created_at', 'lesson_count', 'project_count',
+                  'lessons', 'projects', 'quizzes', 'announcements']
+        deferred_fields = ['lessons', 'projects', 'quizzes', 'announcements']
+        annotations = {
+            'project_count': lambda: related_count(Project, 'course'),
+        }
+
+# --- SYNC ---
+# Flat rows for /api/sync/; nested children arrive as their own change sets
+class CourseSyncSerializer(serializers.ModelSerializer):
+    class Meta: model = Course; fields = '__all__'
+
+class LessonSyncSerializer(serializers.ModelSerializer):
+    class Meta: model = Lesson; fields = '__all__'
@@ -0,0 +1,246 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+
+from . import authentication, cache, events, fanout, search, sync, tasks
+from .models import (
+    Announcement, Choice, Comment, Course, Enrollment, Lesson, LessonAttachment, Notification, Project, Question, Quiz,
+    SearchDocument,
+    Tombstone,
+)
+from .progress import CompletedLesson, adjust_unread, recount_enrollments, touch_enrollments
+
+
+# --- AUTH CACHE INVALIDATION ---
+# Fields carried by cached users and signed tokens. Other saves (last_login on
+# every login, profile edits) must not revoke the caller's signed tokens.
+AUTH_FIELDS = ('username', 'password', 'is_active', 'is_staff', 'is_superuser')
+
+
+@receiver(post_init, sender=User)
+def remember_auth_state(sender, instance, **kwargs):
+    instance._loaded_auth = {name: instance.__dict__.get(name) for name in AUTH_FIELDS}
+
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user(sender, instance, created, update_fields=None, **kwargs):
+    # Deactivation, staff changes, renames and password changes must not outlive the cached copy
+    fields = AUTH_FIELDS if update_fields is None else [name for name in AUTH_FIELDS if name in update_fields]
+    if not created and any(instance._loaded_auth[name] != instance.__dict__.get(name) for name in fields):
+        authentication.invalidate_user(instance.pk)
+    instance._loaded_auth = {name: instance.__dict__.get(name) for name in AUTH_FIELDS}
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    authentication.invalidate_token(instance.key)
+
+
+# --- ANNOUNCEMENT FAN-OUT ---
+@receiver(post_save, sender=Announcement)
+def fan_out_announcement(sender, instance, created, **kwargs):
+    if created:
+        events.publish(events.announcement_event(instance))
+        tasks.enqueue(fanout.announce, announcement_id=instance.pk)
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, created, **kwargs):
+    if created:
+        events.publish(events.notification_event(instance))
+
+
+# --- UNREAD COUNTERS ---
+@receiver(post_init, sender=Notification)
+def remember_read_state(sender, instance, **kwargs):
+    instance._loaded_is_read = instance.__dict__.get('is_read')
+
+
+@receiver(post_save, sender=Notification)
+def count_saved_notification(sender, instance, created, **kwargs):
+    was_read = True if created else instance._loaded_is_read
+    if was_read is not None and was_read != instance.is_read:
+        adjust_unread([instance.user_id], -1 if instance.is_read else 1)
+    instance._loaded_is_read = instance.is_read
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread([instance.user_id], -1)
+
+
+# --- PROGRESS COUNTERS ---
+# Rows that belong to a course directly remember the course they were loaded with, so the
+# handlers below can follow a move; reset_loaded_course() at the bottom resets it after save.
+MOVABLE = (Lesson, Project, Quiz, Announcement)
+
+
+def remember_course(sender, instance, **kwargs):
+    # Read through __dict__ so deferred loads (.only()) don't trigger a query per row
+    instance._loaded_course_id = instance.__dict__.get('course_id')
+
+
+for model in MOVABLE:
+    post_init.connect(remember_course, sender=model, dispatch_uid=f'loaded-course-{model.__name__}')
+
+
+@receiver(post_save, sender=Lesson)
+def count_saved_lesson(sender, instance, created, **kwargs):
+    old_course_id = getattr(instance, '_loaded_course_id', None)
+    if created:
+        Course.objects.filter(pk=instance.course_id).update(lesson_count=F('lesson_count') + 1, updated_at=timezone.now())
+        touch_enrollments(instance.course_id)
+    elif old_course_id is not None and old_course_id != instance.course_id:
+        # Lesson moved between courses: both totals change, and so does the progress of
+        # every enrollment that had completed it.
+        Course.objects.filter(pk=old_course_id).update(lesson_count=F('lesson_count') - 1, updated_at=timezone.now())
+        Course.objects.filter(pk=instance.course_id).update(lesson_count=F('lesson_count') + 1, updated_at=timezone.now())
+        touch_enrollments(old_course_id, instance.course_id)
+        recount_enrollments(Enrollment.objects.filter(completed_lessons=instance))
+
+
+@receiver(pre_delete, sender=Lesson)
+def uncount_deleted_completion(sender, instance, **kwargs):
+    # The through rows are removed by the cascade without m2m_changed, so adjust here
+    Enrollment.objects.filter(completed_lessons=instance, course_id=instance.course_id).update(
+        completed_count=F('completed_count') - 1, updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Lesson)
+def uncount_deleted_lesson(sender, instance, **kwargs):
+    Course.objects.filter(pk=instance.course_id).update(lesson_count=F('lesson_count') - 1, updated_at=timezone.now())
+    touch_enrollments(instance.course_id)
+
+
+@receiver(m2m_changed, sender=CompletedLesson)
+def count_completed_lessons(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add' and pk_set:
+        if not reverse:
+            # pk_set only holds lessons that were not already completed
+            added = Lesson.objects.filter(pk__in=pk_set, course_id=instance.course_id).count()
+            if added:
+                Enrollment.objects.filter(pk=instance.pk).update(
+                    completed_count=F('completed_count') + added, updated_at=timezone.now())
+                instance.completed_count += added
+        else:
+            Enrollment.objects.filter(pk__in=pk_set, course_id=instance.course_id).update(
+                completed_count=F('completed_count') + 1, updated_at=timezone.now())
+    elif action in ('post_remove', 'post_clear'):
+        if not reverse:
+            recount_enrollments(Enrollment.objects.filter(pk=instance.pk))
+            instance.refresh_from_db(fields=['completed_count'])
+        elif action == 'post_remove':
+            recount_enrollments(Enrollment.objects.filter(pk__in=pk_set or ()))
+        else:
+            recount_enrollments(Enrollment.objects.filter(pk__in=getattr(instance, '_cleared_enrollments', ())))
+    elif action == 'pre_clear' and reverse:
+        instance._cleared_enrollments = list(instance.enrollment_set.values_list('pk', flat=True))
+
+
+# --- COURSE CACHE INVALIDATION ---
+# How to find the owning course of each object in the serialized course tree
+COURSE_OF = {
+    Course: lambda obj: obj.pk,
+    Lesson: lambda obj: obj.course_id,
+    Project: lambda obj: obj.course_id,
+    Quiz: lambda obj: obj.course_id,
+    Announcement: lambda obj: obj.course_id,
+    Question: lambda obj: Quiz.objects.filter(pk=obj.quiz_id).values_list('course_id', flat=True).first(),
+    Choice: lambda obj: Question.objects.filter(pk=obj.question_id).values_list('quiz__course_id', flat=True).first(),
+    LessonAttachment: lambda obj: Lesson.objects.filter(pk=obj.lesson_id).values_list('course_id', flat=True).first(),
+    Comment: lambda obj: Lesson.objects.filter(pk=obj.lesson_id).values_list('course_id', flat=True).first(),
+}
+
+
+def bump_course_of(sender, instance, **kwargs):
+    # A row moved to another course leaves the old course's payload too
+    course_ids = {COURSE_OF[sender](instance), getattr(instance, '_loaded_course_id', None)}
+    for course_id in course_ids - {None}:
+        cache.bump_course(course_id)
+
+
+for model in COURSE_OF:
+    post_save.connect(bump_course_of, sender=model, dispatch_uid=f'course-cache-save-{model.__name__}')
+    post_delete.connect(bump_course_of, sender=model, dispatch_uid=f'course-cache-delete-{model.__name__}')
+
+
+# Course payloads embed each comment's user.username
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._loaded_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def bump_courses_of_renamed_user(sender, instance, created, **kwargs):
+    old_username = getattr(instance, '_loaded_username', None)
+    if not created and old_username is not None and old_username != instance.username:
+        course_ids = Comment.objects.filter(user=instance, lesson__isnull=False).values_list('lesson__course_id', flat=True)
+        for course_id in set(course_ids):
+            cache.bump_course(course_id)
+    instance._loaded_username = instance.username
+
+
+# --- QUIZ ANSWER KEYS ---
+QUIZ_OF = {
+    Quiz: lambda obj: obj.pk,
+    Question: lambda obj: obj.quiz_id,
+    Choice: lambda obj: Question.objects.filter(pk=obj.question_id).values_list('quiz_id', flat=True).first(),
+}
+
+
+def bump_quiz_of(sender, instance, **kwargs):
+    quiz_id = QUIZ_OF[sender](instance)
+    if quiz_id is not None:
+        cache.bump_quiz(quiz_id)
+
+
+for model in QUIZ_OF:
+    post_save.connect(bump_quiz_of, sender=model, dispatch_uid=f'quiz-key-save-{model.__name__}')
+    post_delete.connect(bump_quiz_of, sender=model, dispatch_uid=f'quiz-key-delete-{model.__name__}')
+
+
+# --- SYNC TOMBSTONES ---
+def record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(model=sync.SOURCE_OF_MODEL[sender], object_id=instance.pk, owner_id=sync.owner_of(instance))
+
+
+for model in sync.SOURCE_OF_MODEL:
+    post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'sync-tombstone-{model.__name__}')
+
+
+# --- SEARCH INDEX ---
+def index_for_search(sender, instance, **kwargs):
+    search.index_object(instance)
+
+
+def unindex_for_search(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+
+for model in search.SOURCES:
+    post_save.connect(index_for_search, sender=model, dispatch_uid=f'search-save-{model.__name__}')
+    post_delete.connect(unindex_for_search, sender=model, dispatch_uid=f'search-delete-{model.__name__}')
+
+
+@receiver(post_save, sender=Lesson)
+def move_comment_documents(sender, instance, created, **kwargs):
+    # Comments are filtered by course through their lesson; follow a lesson that changed course
+    old_course_id = getattr(instance, '_loaded_course_id', None)
+    if not created and old_course_id is not None and old_course_id != instance.course_id:
+        SearchDocument.objects.filter(
+            kind='comment', object_id__in=Comment.objects.filter(lesson=instance).values('id'),
+        ).update(course_id=instance.course_id)
+
+
+def reset_loaded_course(sender, instance, **kwargs):
+    # Connected last so every handler above still sees the pre-save course
+    instance._loaded_course_id = instance.course_id
+
+
+for model in MOVABLE:
+    post_save.connect(reset_loaded_course, sender=model, dispatch_uid=f'reset-loaded-course-{model.__name__}')
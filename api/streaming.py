@@ -0,0 +1,25 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+# --- STREAMED BODIES UNDER ASGI ---
+# Django's ASGI handler drains a synchronous streaming_content with
+# sync_to_async(list) before sending a byte, so a CSV export or a large media
+# file would be held in memory whole. for_server() hands such responses an
+# async iterator instead: each chunk is pulled in the request's sync thread
+# (thread-sensitive, so querysets keep their connection) and sent before the
+# next one is read. Under WSGI the response is returned untouched and
+# FileResponse keeps wsgi.file_wrapper/sendfile.
+
+
+async def _pull(iterator):
+    pull = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (chunk := await pull(iterator, done)) is not done:
+        yield chunk
+
+
+def for_server(request, response):
+    request = getattr(request, '_request', request)  # DRF Request wraps the HttpRequest
+    if isinstance(request, ASGIRequest) and response.streaming and not response.is_async:
+        response.streaming_content = _pull(iter(response.streaming_content))
+    return response
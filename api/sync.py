@@ -0,0 +1,129 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Announcement, Course, Enrollment, Lesson, Notification, Submission, Tombstone
+from .prefetch import apply_plan
+from .serializers import (
+    AnnouncementSerializer, CourseSyncSerializer, EnrollmentSerializer, LessonSyncSerializer,
+    NotificationSerializer, SubmissionSerializer,
+)
+
+# --- DELTA SYNC ---
+# Each synced collection is read as a keyset over (updated_at, id), tombstones
+# over (deleted_at, id). The cursor handed to the client is the last position
+# reached in every collection, so a device only ever downloads rows changed
+# since its previous sync.
+#
+# Rows touched in the last SETTLE_SECONDS are held back until the next sync:
+# updated_at is stamped before commit, so a slow transaction could otherwise
+# commit a row *behind* a position the client has already passed.
+#
+# Tombstones are purged after TOMBSTONE_DAYS. A cursor whose newest position
+# is older than that may have missed deletes, so it is refused as expired and
+# the device starts over without `since`.
+
+# name -> (model, serializer, owner field or None for catalog rows)
+SOURCES = {
+    'courses': (Course, CourseSyncSerializer, None),
+    'lessons': (Lesson, LessonSyncSerializer, None),
+    'announcements': (Announcement, AnnouncementSerializer, None),
+    'notifications': (Notification, NotificationSerializer, 'user'),
+    'enrollments': (Enrollment, EnrollmentSerializer, 'student'),
+    'submissions': (Submission, SubmissionSerializer, 'student'),
+}
+SOURCE_OF_MODEL = {model: name for name, (model, _, _) in SOURCES.items()}
+TOMBSTONES = 'deleted'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class ExpiredCursor(InvalidCursor):
+    pass
+
+
+def _config():
+    return getattr(settings, 'API_SYNC', {})
+
+
+def encode_cursor(positions):
+    raw = json.dumps(positions, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        positions = json.loads(raw)
+        return {name: (int(pos[0]), int(pos[1])) for name, pos in positions.items()}
+    except (binascii.Error, ValueError, TypeError, AttributeError, IndexError, KeyError) as exc:
+        raise InvalidCursor('Malformed sync cursor') from exc
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _micros(value):
+    # Integer arithmetic: float timestamps can be off by a microsecond and skip a row
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _after(queryset, field, position, horizon):
+    queryset = queryset.filter(**{f'{field}__lte': horizon})
+    if position is not None:
+        stamp, pk = _from_micros(position[0]), position[1]
+        queryset = queryset.filter(Q(**{f'{field}__gt': stamp}) | Q(**{field: stamp, 'pk__gt': pk}))
+    return queryset.order_by(field, 'pk')
+
+
+def owner_of(instance):
+    for model, _, owner in SOURCES.values():
+        if isinstance(instance, model) and owner:
+            return getattr(instance, f'{owner}_id')
+    return None
+
+
+def collect_changes(user, cursor, limit, context):
+    positions = decode_cursor(cursor)
+    now = timezone.now()
+    if positions and _from_micros(max(stamp for stamp, _ in positions.values())) < now - timedelta(days=_config().get('TOMBSTONE_DAYS', 180)):
+        raise ExpiredCursor('Sync cursor expired; sync again without since')
+    horizon = now - timedelta(seconds=_config().get('SETTLE_SECONDS', 2))
+    changes, has_more = {}, False
+
+    for name, (model, serializer_class, owner) in SOURCES.items():
+        queryset = model.objects.all()
+        if owner:
+            queryset = queryset.filter(**{owner: user})
+        planned = apply_plan(_after(queryset, 'updated_at', positions.get(name), horizon), serializer_class(context=context))
+        rows = list(planned[:limit + 1])
+        if len(rows) > limit:
+            rows, has_more = rows[:limit], True
+        if rows:
+            positions[name] = (_micros(rows[-1].updated_at), rows[-1].pk)
+        changes[name] = {'updated': serializer_class(rows, many=True, context=context).data, 'deleted': []}
+
+    tombstones = Tombstone.objects.filter(Q(owner_id__isnull=True) | Q(owner_id=user.pk))
+    deleted = list(_after(tombstones, 'deleted_at', positions.get(TOMBSTONES), horizon)[:limit + 1])
+    if len(deleted) > limit:
+        deleted, has_more = deleted[:limit], True
+    if deleted:
+        positions[TOMBSTONES] = (_micros(deleted[-1].deleted_at), deleted[-1].pk)
+    for tombstone in deleted:
+        if tombstone.model in changes:
+            changes[tombstone.model]['deleted'].append(tombstone.object_id)
+
+    return {'cursor': encode_cursor(positions), 'has_more': has_more, 'changes': changes}
@@ -0,0 +1,66 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from .jobs import push_job
+
+logger = logging.getLogger(__name__)
+
+# --- BACKGROUND TASKS ---
+# enqueue(func, priority=0, **kwargs) schedules a module-level function; a job
+# never sees rows that were rolled back. Jobs are addressed by dotted path with
+# JSON-able kwargs. API_TASKS['BACKEND']:
+#   'database'  - insert an api.Job row in the current transaction; `manage.py
+#                 runworker` picks it up after commit (default, see api/jobs.py)
+#   'thread'    - run on a small in-process pool after commit (no worker process)
+#   'immediate' - run inline after commit (tests, management commands)
+
+_executor = None
+
+
+def _config():
+    return getattr(settings, 'API_TASKS', {})
+
+
+def task_path(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def run_task(path, kwargs):
+    try:
+        import_string(path)(**kwargs)
+    except Exception:
+        logger.exception('Task %s failed', path)
+        raise
+
+
+def _run_in_thread(path, kwargs):
+    # Pool threads hold their own connections; drop stale ones around each job
+    close_old_connections()
+    try:
+        run_task(path, kwargs)
+    except Exception:
+        pass
+    finally:
+        close_old_connections()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_config().get('THREADS', 2), thread_name_prefix='api-task')
+    return _executor
+
+
+def enqueue(func, priority=0, **kwargs):
+    path = task_path(func)
+    backend = _config().get('BACKEND', 'database')
+    if backend == 'database':
+        push_job(path, kwargs, priority=priority)
+    elif backend == 'immediate':
+        transaction.on_commit(lambda: run_task(path, kwargs))
+    else:
+        transaction.on_commit(lambda: _pool().submit(_run_in_thread, path, kwargs))
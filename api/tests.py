@@ -1,3 +1,1167 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User, update_last_login
+from django.db import connection, connections
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .models import Course, Lesson, Project, Quiz, Question, Choice, Enrollment, Announcement, Comment, Notification, QuizAttempt, Submission
+from .models import ArchivedRow, Device, Job, LessonAttachment, SearchDocument, Tombstone, UnreadCounter, UploadSession
+from .serializers import LessonSummarySerializer
+from . import authentication, cache, events, fanout, fastjson, jobs, progress, search, sync, tasks
+from .bench import USERNAME, compare, run_benchmark, seed
+from .instrumentation import RequestStats, server_timing
+from .plans import HOT_QUERIES, check_plans, problems
+from .progress import unread_count
+from .push import LocMemTransport
+from .replica import ReplicaRouter, _replica_reads, use_primary
+from .retention import apply_policy, policies
+from .scoring import rescore
+
+
+def make_course(user, index=0, lessons=2):
+    course = Course.objects.create(title=f'Course {index}', instructor_name='Teacher')
+    for n in range(lessons):
+        lesson = Lesson.objects.create(course=course, title=f'Lesson {n}', order=n)
+        Comment.objects.create(user=user, lesson=lesson, text='Nice')
+        Comment.objects.create(user=user, lesson=lesson, text='Thanks')
+    Project.objects.create(course=course, title='Project')
+    quiz = Quiz.objects.create(course=course, title='Quiz')
+    for n in range(2):
+        question = Question.objects.create(quiz=quiz, text=f'Q{n}')
+        Choice.objects.create(question=question, text='A', is_correct=True)
+        Choice.objects.create(question=question, text='B')
+    Announcement.objects.create(course=course, title='Welcome', content='Hi')
+    return course
+
+
+# --- QUERY BUDGETS ---
+# Maximum queries per endpoint; list budgets must hold no matter how many rows are returned.
+# For tests that count SQL: a per-process cache keeps cache round trips out of the count
+# (and switches the response cache off, see api.cache.is_shared)
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'stamps': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-stamps'},
+}
+
+
+def clear_caches():
+    for alias in ('default', 'stamps'):
+        caches[alias].clear()
+
+QUERY_BUDGETS = {
+    '/api/courses/': 1,
+    '/api/courses/?expand=lessons,projects,quizzes,announcements': 9,
+    '/api/courses/{course}/': 9,
+    '/api/courses/{course}/?fields=id,title,projects': 2,
+    '/api/lessons/': 1,
+    '/api/lessons/?expand=comments,attachments': 3,
+    '/api/quizzes/': 1,
+    '/api/quizzes/{quiz}/': 3,
+    '/api/enrollments/': 1,
+    '/api/comments/': 1,
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('student', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def seed(self, courses):
+        for _ in range(courses):
+            index = Course.objects.count()
+            course = make_course(self.user, index)
+            Enrollment.objects.create(student=self.user, course=course)
+        return course
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_endpoints_run_constant_queries(self):
+        course = self.seed(1)
+        ids = {'course': course.id, 'quiz': course.quizzes.get().id}
+        small = {url: self.count_queries(url.format(**ids)) for url in QUERY_BUDGETS}
+        self.seed(5)
+        for url, budget in QUERY_BUDGETS.items():
+            with self.subTest(url=url):
+                large = self.count_queries(url.format(**ids))
+                self.assertEqual(large, small[url])
+                self.assertLessEqual(large, budget)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.course = make_course(User.objects.create_user('student'))
+
+    def test_course_list_is_summary(self):
+        row = self.client.get('/api/courses/').data[0]
+        self.assertEqual(row['lesson_count'], 2)
+        self.assertEqual(row['project_count'], 1)
+        self.assertNotIn('lessons', row)
+
+    def test_expand_and_fields(self):
+        row = self.client.get('/api/courses/?expand=projects').data[0]
+        self.assertEqual(len(row['projects']), 1)
+        detail = self.client.get(f'/api/courses/{self.course.id}/?fields=id,title').data
+        self.assertEqual(set(detail), {'id', 'title'})
+        lesson = self.client.get('/api/lessons/?fields=id&expand=comments').data[0]
+        self.assertEqual(set(lesson), {'id', 'comments'})
+
+
+class UserScopingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.teacher = User.objects.create_user('teacher', is_staff=True)
+        course = Course.objects.create(title='Course', instructor_name='Teacher')
+        other = Course.objects.create(title='Other', instructor_name='Teacher')
+        Enrollment.objects.create(student=self.alice, course=course)
+        Enrollment.objects.create(student=self.bob, course=course)
+        Enrollment.objects.create(student=self.bob, course=other)
+        Notification.objects.create(user=self.alice, title='Hi', message='...')
+        Notification.objects.create(user=self.alice, title='Read', message='...', is_read=True)
+        Notification.objects.create(user=self.bob, title='Hi', message='...')
+        self.course = course
+
+    def test_students_only_see_their_rows(self):
+        self.client.force_authenticate(self.bob)
+        self.assertEqual(len(self.client.get('/api/enrollments/').data), 2)
+        self.assertEqual(len(self.client.get(f'/api/enrollments/?course={self.course.id}').data), 1)
+        self.assertEqual(len(self.client.get('/api/enrollments/?scope=all').data), 2)
+        self.client.force_authenticate(self.alice)
+        self.assertEqual(len(self.client.get('/api/notifications/?is_read=false').data), 1)
+
+    def test_staff_global_view(self):
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(len(self.client.get('/api/enrollments/').data), 0)
+        self.assertEqual(len(self.client.get('/api/enrollments/?scope=all').data), 3)
+
+    def test_owner_is_set_by_the_server(self):
+        other = Course.objects.create(title='Third', instructor_name='Teacher')
+        self.client.force_authenticate(self.alice)
+        response = self.client.post('/api/enrollments/', {'course': other.id, 'student': self.bob.id})
+        self.assertEqual((response.status_code, response.data['student']), (201, self.alice.id))
+        self.assertEqual(self.client.post('/api/enrollments/', {'course': other.id}).status_code, 400)
+        submission = Submission.objects.create(project=Project.objects.create(course=other, title='P'), student=self.alice, student_name='Alice')
+        self.assertEqual(self.client.patch(f'/api/submissions/{submission.id}/', {'student': self.bob.id}).status_code, 200)
+        self.assertEqual(Submission.objects.get(pk=submission.pk).student, self.alice)
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(self.client.post('/api/enrollments/', {'course': other.id, 'student': self.bob.id}).status_code, 201)
+        self.assertEqual(self.client.post('/api/enrollments/', {'course': other.id, 'student': 'nobody'}).status_code, 400)
+
+    def test_anonymous_is_rejected(self):
+        self.assertIn(self.client.get('/api/notifications/').status_code, (401, 403))
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('reader')
+        self.client.force_authenticate(self.user)
+        for n in range(5):
+            Notification.objects.create(user=self.user, title=f'N{n}', message='...')
+
+    def test_unpaginated_by_default(self):
+        self.assertEqual(len(self.client.get('/api/notifications/').data), 5)
+
+    def test_pages_are_stable_under_inserts(self):
+        page = self.client.get('/api/notifications/?paginate=cursor&page_size=2').data
+        seen = [row['title'] for row in page['results']]
+        Notification.objects.create(user=self.user, title='Newest', message='...')
+        while page['next']:
+            page = self.client.get(page['next']).data
+            seen += [row['title'] for row in page['results']]
+        self.assertEqual(seen, ['N4', 'N3', 'N2', 'N1', 'N0'])
+
+    def test_keyset_covers_the_whole_ordering(self):
+        for index in range(3):
+            make_course(self.user, index, lessons=3)  # Lesson.order repeats in every course
+        expected = list(Lesson.objects.order_by('course_id', 'order', 'id').values_list('id', flat=True))
+        pages = [self.client.get('/api/lessons/?paginate=cursor&page_size=2').data]
+        while pages[-1]['next']:
+            with CaptureQueriesContext(connection) as ctx:
+                pages.append(self.client.get(pages[-1]['next']).data)
+            self.assertFalse([q for q in ctx.captured_queries if 'OFFSET' in q['sql']])
+        self.assertEqual([row['id'] for page in pages for row in page['results']], expected)
+        self.assertEqual(self.client.get(pages[2]['previous']).data['results'], pages[1]['results'])
+        self.assertEqual(self.client.get('/api/lessons/?cursor=bogus').status_code, 404)
+
+    def test_required_endpoints_always_paginate(self):
+        with self.settings(API_CURSOR_PAGINATION={'PAGE_SIZE': 3, 'REQUIRED': ['notification']}):
+            data = self.client.get('/api/notifications/').data
+        self.assertEqual(len(data['results']), 3)
+
+
+class ProgressCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('learner')
+        self.course = make_course(self.user, lessons=4)
+        self.enrollment = Enrollment.objects.create(student=self.user, course=self.course)
+        self.lessons = list(self.course.lessons.order_by('order'))
+
+    def progress(self):
+        self.enrollment.refresh_from_db()
+        self.course.refresh_from_db()
+        return self.enrollment.progress_percent
+
+    def test_counters_follow_completions_and_lesson_changes(self):
+        self.enrollment.completed_lessons.add(self.lessons[0], self.lessons[1])
+        self.enrollment.completed_lessons.add(self.lessons[0])
+        self.assertEqual(self.progress(), 50)
+        Lesson.objects.create(course=self.course, title='Extra', order=9)
+        self.assertEqual(self.progress(), 40)
+        self.lessons[0].delete()
+        self.assertEqual(self.progress(), 25)
+        self.enrollment.completed_lessons.remove(self.lessons[1])
+        self.assertEqual(self.progress(), 0)
+
+    def test_mark_complete_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/enrollments/mark_complete/', {'course': self.course.id, 'lesson': self.lessons[0].id})
+        self.assertEqual(response.data['progress'], 25)
+
+    def test_rebuild_repairs_drift(self):
+        Enrollment.objects.update(completed_count=3)
+        self.assertEqual(progress.rebuild(dry_run=True)['enrollment.completed_count'], 1)
+        progress.rebuild()
+        self.assertEqual(self.progress(), 0)
+
+
+class CourseCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.course = make_course(User.objects.create_user('student'))
+        self.url = f'/api/courses/{self.course.id}/'
+
+    def test_hits_and_invalidation(self):
+        first = self.client.get(self.url).data
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(self.url).data, first)
+        self.assertFalse([q for q in ctx.captured_queries if '"api_course"' in q['sql']])
+        choice = Choice.objects.filter(question__quiz__course=self.course).first()
+        choice.text = 'Changed'
+        choice.save()
+        quiz = self.client.get(self.url).data['quizzes'][0]
+        self.assertIn('Changed', [c['text'] for q in quiz['questions'] for c in q['choices']])
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_unknown_courses_seed_no_stamps(self):
+        for pk in ('999999', 'abc'):
+            self.assertEqual(self.client.get(f'/api/courses/{pk}/').status_code, 404)
+            self.assertIsNone(caches['stamps'].get(cache.VERSION_KEY.format(pk)))
+
+    def test_moves_leave_the_old_course(self):
+        other = Course.objects.create(title='Other', instructor_name='Teacher')
+        self.client.get(self.url)
+        for model in (Project, Announcement):
+            row = model.objects.get(course=self.course)
+            row.course = other
+            row.save()
+        data = self.client.get(self.url).data
+        self.assertEqual((data['projects'], data['announcements']), ([], []))
+        staff = APIClient()
+        staff.force_authenticate(User.objects.create_user('teacher', is_staff=True))
+        quiz = self.course.quizzes.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = staff.patch(f'/api/quizzes/{quiz.id}/document/', {'course': other.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url).data['quizzes'], [])
+
+    def test_user_rename_reaches_cached_comments(self):
+        self.client.get(self.url)
+        user = User.objects.get(username='student')
+        user.username = 'renamed'
+        user.save()
+        comments = [c for lesson in self.client.get(self.url).data['lessons'] for c in lesson['comments']]
+        self.assertEqual({c['username'] for c in comments}, {'renamed'})
+
+    def test_variants_are_cached_separately(self):
+        self.client.get(self.url)
+        self.assertEqual(set(self.client.get(self.url + '?fields=id').data), {'id'})
+
+    def test_stamps_survive_payload_culling(self):
+        self.client.get(self.url)
+        stamps = cache.course_versions(self.course.id)
+        culled = {**settings.CACHES['default'], 'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}}
+        with self.settings(CACHES={**settings.CACHES, 'default': culled}):
+            for n in range(50):
+                caches['default'].set(f'filler:{n}', n)
+            self.assertLessEqual(len(caches['default'].get_many([f'filler:{n}' for n in range(50)])), 11)
+            self.assertEqual(cache.course_versions(self.course.id), stamps)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_disabled_on_a_per_process_backend(self):
+        # Bumps from other workers and runworker would never reach this process's stamps
+        self.assertFalse(cache.is_enabled())
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertTrue([q for q in ctx.captured_queries if '"api_course"' in q['sql']])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.user = User.objects.create_user('reader')
+        self.client.force_authenticate(self.user)
+        self.course = make_course(self.user)
+
+    def assert_revalidates(self, url, change):
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertLessEqual(len(ctx.captured_queries), 1)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_course_endpoints(self):
+        lesson = self.course.lessons.first()
+        def edit_lesson():
+            lesson.title = 'Edited'
+            lesson.save()
+        self.assert_revalidates(f'/api/courses/{self.course.id}/', edit_lesson)
+        self.assert_revalidates('/api/courses/', lambda: Project.objects.create(course=self.course, title='P2'))
+
+    def test_pagination_header_is_part_of_the_variant(self):
+        response = self.client.get('/api/courses/')
+        self.assertIn('X-Pagination', response['Vary'])
+        paged = self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=response['ETag'], HTTP_X_PAGINATION='cursor')
+        self.assertEqual(paged.status_code, 200)
+        self.assertIn('results', paged.data)
+        self.assertNotIn('X-Pagination', self.client.get(f'/api/courses/{self.course.id}/').get('Vary', ''))
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_no_course_validators_without_a_shared_cache(self):
+        self.assertFalse(self.client.get('/api/courses/').has_header('ETag'))
+
+    def test_notifications(self):
+        note = Notification.objects.create(user=self.user, title='Hi', message='...')
+        self.assertIn('Last-Modified', self.client.get('/api/notifications/'))
+        self.assert_revalidates('/api/notifications/', note.delete)
+
+    def test_malformed_pk_is_not_found(self):
+        for url in ('/api/notifications/abc/', '/api/submissions/abc/'):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(API_SYNC={'SETTLE_SECONDS': 0})
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('device')
+        self.client.force_authenticate(self.user)
+        self.course = make_course(self.user)
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params['since'] = cursor
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_only_changes_since_cursor(self):
+        first = self.sync()
+        self.assertEqual(len(first['changes']['lessons']['updated']), 2)
+        self.assertEqual(self.sync(first['cursor'])['changes']['lessons'], {'updated': [], 'deleted': []})
+
+        lesson = self.course.lessons.first()
+        lesson.title = 'Renamed'
+        lesson.save()
+        Notification.objects.create(user=User.objects.create_user('other'), title='Private', message='...')
+        gone = self.course.announcements.get()
+        gone_id = gone.id
+        gone.delete()
+        delta = self.sync(first['cursor'])['changes']
+        self.assertEqual([row['title'] for row in delta['lessons']['updated']], ['Renamed'])
+        self.assertEqual(delta['announcements']['deleted'], [gone_id])
+        self.assertEqual(delta['notifications']['updated'], [])
+
+    def test_pages_through_limit(self):
+        seen, cursor, more = 0, None, True
+        while more:
+            page = self.sync(cursor, limit=1)
+            seen += len(page['changes']['lessons']['updated'])
+            cursor, more = page['cursor'], page['has_more']
+        self.assertEqual(seen, 2)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get('/api/sync/?since=nope').status_code, 400)
+
+    def test_lesson_count_changes_resync_progress(self):
+        Enrollment.objects.create(student=self.user, course=self.course)
+        first = self.sync()
+        self.assertEqual(first['changes']['enrollments']['updated'][0]['progress'], 0)
+        Lesson.objects.create(course=self.course, title='Extra', order=9)
+        self.assertEqual(len(self.sync(first['cursor'])['changes']['enrollments']['updated']), 1)
+        second = self.sync(first['cursor'])
+        self.course.lessons.get(title='Extra').delete()
+        self.assertEqual(len(self.sync(second['cursor'])['changes']['enrollments']['updated']), 1)
+
+    def test_cursor_older_than_tombstones_expires(self):
+        old = timezone.now() - timedelta(days=181)
+        cursor = sync.encode_cursor({'lessons': [sync._micros(old), 1]})
+        response = self.client.get('/api/sync/', {'since': cursor})
+        self.assertEqual(response.status_code, 410)
+        Tombstone.objects.create(model='lessons', object_id=1)
+        Tombstone.objects.filter(model='lessons').update(deleted_at=old)
+        apply_policy(policies()['tombstones'])
+        self.assertFalse(Tombstone.objects.filter(model='lessons').exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QuizAuthoringTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('teacher', is_staff=True))
+        self.course = Course.objects.create(title='Course', instructor_name='Teacher')
+
+    def document(self, questions=50):
+        return {
+            'course': self.course.id, 'title': 'Big quiz',
+            'questions': [
+                {'text': f'Q{n}', 'choices': [{'text': 'A', 'is_correct': True}, {'text': 'B'}, {'text': 'C'}]}
+                for n in range(questions)
+            ],
+        }
+
+    def test_create_whole_quiz_with_constant_inserts(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/quizzes/bulk/', self.document(), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Choice.objects.filter(question__quiz_id=response.data['id']).count(), 150)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_diff_update(self):
+        doc = self.client.post('/api/quizzes/bulk/', self.document(3), format='json').data
+        first, second = doc['questions'][0], doc['questions'][1]
+        first['text'] = 'Edited'
+        first['choices'] = first['choices'][:1] + [{'text': 'New'}]
+        doc['questions'] = [first, second, {'text': 'Added', 'choices': []}]
+        updated = self.client.put(f"/api/quizzes/{doc['id']}/document/", doc, format='json').data
+        self.assertEqual([q['text'] for q in updated['questions']], ['Edited', 'Q1', 'Added'])
+        self.assertEqual([c['text'] for c in updated['questions'][0]['choices']], ['A', 'New'])
+
+    def test_per_item_errors(self):
+        doc = self.document(2)
+        doc['questions'][0]['text'] = ''
+        response = self.client.post('/api/quizzes/bulk/', [self.document(1), doc], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('text', response.data[1]['questions'][0])
+
+        doc = self.document(2)
+        doc['questions'][1]['choices'][2] = {'id': 999, 'text': 'X'}
+        errors = self.client.post('/api/quizzes/bulk/', doc, format='json').data['questions']
+        self.assertEqual(errors[0], {})
+        self.assertIn('id', errors[1]['choices'][2])
+        self.assertFalse(Quiz.objects.exists())
+
+
+class QuizAttemptTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.user = User.objects.create_user('taker')
+        self.client.force_authenticate(self.user)
+        self.quiz = make_course(self.user).quizzes.get()
+        self.correct = list(Choice.objects.filter(question__quiz=self.quiz, is_correct=True).order_by('id'))
+        self.wrong = list(Choice.objects.filter(question__quiz=self.quiz, is_correct=False).order_by('id'))
+
+    def submit(self, answers):
+        return self.client.post(f'/api/quizzes/{self.quiz.id}/submit/', {'answers': answers}, format='json')
+
+    def test_submit_scores_with_cached_key(self):
+        self.submit([self.correct[0].id])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.submit([self.correct[0].id, self.wrong[1].id])
+        self.assertEqual((response.data['score'], response.data['max_score']), (1, 2))
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'api_question' in q['sql']])
+        self.assertEqual(self.submit([999]).status_code, 400)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_key_is_read_from_the_database_on_a_per_process_cache(self):
+        self.assertEqual(self.submit([self.correct[0].id]).data['score'], 1)
+        # Another worker changed the key: its bump never reaches this process's cache
+        Choice.objects.filter(pk=self.correct[0].id).update(is_correct=False)
+        Choice.objects.filter(pk=self.wrong[0].id).update(is_correct=True)
+        self.assertEqual(self.submit([self.wrong[0].id]).data['score'], 1)
+
+    def test_answer_key_is_staff_only(self):
+        def choices(client, url):
+            data = client.get(url).data
+            quiz = data['quizzes'][0] if 'quizzes' in data else data
+            return [choice for question in quiz['questions'] for choice in question['choices']]
+        course_url = f'/api/courses/{self.quiz.course_id}/'
+        for url in (f'/api/quizzes/{self.quiz.id}/', course_url):
+            self.assertFalse([c for c in choices(self.client, url) if 'is_correct' in c])
+        self.assertEqual(self.client.get(f'/api/quizzes/{self.quiz.id}/document/').status_code, 403)
+        staff = APIClient()
+        staff.force_authenticate(User.objects.create_user('teacher', is_staff=True))
+        # The cached course payload has a separate staff variant
+        self.assertEqual(sum(c['is_correct'] for c in choices(staff, course_url)), 2)
+
+    def test_rescore_after_key_change(self):
+        attempt_id = self.submit([self.wrong[0].id]).data['id']
+        Choice.objects.filter(pk=self.wrong[0].id).update(is_correct=True)
+        Choice.objects.filter(pk=self.correct[0].id).update(is_correct=False)
+        self.assertEqual(rescore(self.quiz.id), (1, 1))
+        self.assertEqual(QuizAttempt.objects.get(pk=attempt_id).score, 1)
+        self.assertEqual(len(self.client.get('/api/quiz-attempts/').data), 1)
+
+
+class GradebookTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('teacher', is_staff=True))
+        self.course = Course.objects.create(title='Course', instructor_name='Teacher')
+        self.p1 = Project.objects.create(course=self.course, title='P1', points=10)
+        self.p2 = Project.objects.create(course=self.course, title='P2', points=20)
+        alice = User.objects.create_user('alice')
+        Enrollment.objects.create(student=alice, course=self.course)
+        Enrollment.objects.create(student=User.objects.create_user('bob'), course=self.course)
+        Submission.objects.create(project=self.p1, student=alice, student_name='alice', grade=7)
+        Submission.objects.create(project=self.p1, student=alice, student_name='alice', grade=9)
+        Submission.objects.create(project=self.p2, student=alice, student_name='alice')
+
+    def test_matrix(self):
+        with self.assertNumQueries(4):
+            data = self.client.get(f'/api/courses/{self.course.id}/gradebook/').data
+        rows = {row['student_name']: row for row in data['students']}
+        self.assertEqual(rows['alice']['grades'], [9, None])
+        self.assertEqual((rows['alice']['submitted'], rows['alice']['total']), (2, 9))
+        self.assertEqual(rows['bob']['grades'], [None, None])
+
+    def test_streaming_export(self):
+        response = self.client.get(f'/api/submissions/export/?course={self.course.id}')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('id,course,project'))
+        response = self.client.get('/api/submissions/export/?output=ndjson&project=%d' % self.p2.id)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+        response = self.client.get('/api/submissions/export/?course=abc')
+        self.assertEqual((response.status_code, response.data), (400, {'error': 'course must be an integer'}))
+
+    async def test_export_streams_under_asgi(self):
+        # A sync iterator would be drained into memory by the ASGI handler before sending
+        token = await Token.objects.acreate(user=await User.objects.aget(username='teacher'))
+        response = await self.async_client.get('/api/submissions/export/', headers={'authorization': f'Token {token.key}'})
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        override = override_settings(MEDIA_ROOT=self.media, CHUNKED_UPLOADS={'MAX_SIZE': 1024})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('student'))
+        self.lesson = Lesson.objects.create(course=Course.objects.create(title='Course', instructor_name='T'), title='L1', order=1)
+        self.payload = b'0123456789' * 30
+
+    def put_chunk(self, upload_id, offset, chunk, digest=None):
+        return self.client.put(
+            f'/api/uploads/{upload_id}/chunk/', chunk, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), HTTP_UPLOAD_CHECKSUM='sha256 ' + (digest or hashlib.sha256(chunk).hexdigest()),
+        )
+
+    def test_resume_and_commit(self):
+        data = {'target': 'lesson_attachment', 'filename': 'notes.txt', 'total_size': len(self.payload)}
+        upload_id = self.client.post('/api/uploads/', data, format='json').data['id']
+        self.assertEqual(self.put_chunk(upload_id, 0, self.payload[:128]).data['received'], 128)
+        # Corrupted chunk is rejected and cut off; a stale offset gets the resume point back
+        self.assertEqual(self.put_chunk(upload_id, 128, self.payload[128:256], digest='00').status_code, 400)
+        response = self.put_chunk(upload_id, 0, self.payload[:128])
+        self.assertEqual((response.status_code, response.data['received']), (409, 128))
+        self.put_chunk(upload_id, 128, self.payload[128:])
+        response = self.client.post(f'/api/uploads/{upload_id}/commit/', {'lesson': self.lesson.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        with LessonAttachment.objects.get().file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.payload)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media, 'uploads_tmp')), [])
+
+    def test_incomplete_and_oversized(self):
+        data = {'target': 'submission', 'filename': 'a.zip', 'total_size': 4096}
+        self.assertEqual(self.client.post('/api/uploads/', data, format='json').status_code, 400)
+        data['total_size'] = 100
+        upload_id = self.client.post('/api/uploads/', data, format='json').data['id']
+        self.put_chunk(upload_id, 0, self.payload[:50])
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/commit/', {}, format='json').status_code, 409)
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(other.get(f'/api/uploads/{upload_id}/').status_code, 404)
+
+
+class MediaDeliveryTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.student = User.objects.create_user('student')
+        course = Course.objects.create(title='Course', instructor_name='T')
+        Enrollment.objects.create(student=self.student, course=course)
+        lesson = Lesson.objects.create(course=course, title='L1', order=1)
+        self.payload = bytes(range(256)) * 4
+        self.attachment = LessonAttachment.objects.create(lesson=lesson, file=ContentFile(self.payload, name='clip.mp4'))
+        self.url = f'/api/media/lesson-attachments/{self.attachment.id}/'
+        self.token = Token.objects.create(user=self.student).key
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_ranges_and_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual((response.status_code, response['Accept-Ranges']), (200, 'bytes'))
+        self.assertEqual(b''.join(response.streaming_content), self.payload)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 100-199/1024'))
+        self.assertEqual(b''.join(response.streaming_content), self.payload[100:200])
+        self.assertEqual(b''.join(self.client.get(self.url, HTTP_RANGE='bytes=-24').streaming_content), self.payload[-24:])
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=5000-').status_code, 416)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        # A stale If-Range validator gets the whole file instead of a mismatched slice
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+
+    def test_authorization_and_signed_links(self):
+        outsider = APIClient()
+        outsider.force_authenticate(User.objects.create_user('outsider'))
+        self.assertEqual(outsider.get(self.url).status_code, 404)
+        self.assertEqual(APIClient().get(self.url).status_code, 401)
+        link = self.client.get(self.url + 'link/').data['url']
+        self.assertEqual(APIClient().get(link, HTTP_RANGE='bytes=0-0').status_code, 206)
+        self.assertEqual(APIClient().get(link.replace('sig=', 'sig=x')).status_code, 401)
+
+    async def test_streams_blocks_under_asgi(self):
+        link = (await self.async_client.get(self.url + 'link/', headers={'authorization': f'Token {self.token}'})).json()['url']
+        response = await self.async_client.get(link, headers={'range': 'bytes=100-899'})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), self.payload[100:900])
+
+    @override_settings(API_MEDIA={'SENDFILE': 'x-accel-redirect', 'ACCEL_PREFIX': '/protected-media/'})
+    def test_proxy_offload(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.attachment.file.name)
+        self.assertEqual(response.content, b'')
+
+
+@override_settings(API_TASKS={'BACKEND': 'immediate'}, API_PUSH={'TRANSPORT': 'api.push.LocMemTransport'})
+class AnnouncementFanOutTests(TestCase):
+    def setUp(self):
+        LocMemTransport.reset()
+        self.addCleanup(LocMemTransport.reset)
+        self.outbox = LocMemTransport
+        self.course = Course.objects.create(title='Course', instructor_name='T')
+        for n in range(150):
+            student = User.objects.create_user(f'student{n}')
+            Enrollment.objects.create(student=student, course=self.course)
+            Device.objects.create(user=student, token=f'ExponentPushToken[{n}]')
+        Device.objects.create(user=User.objects.create_user('outsider'), token='ExponentPushToken[x]')
+        LocMemTransport.unregistered = {'ExponentPushToken[3]'}
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('teacher', is_staff=True))
+
+    def test_post_is_constant_and_fan_out_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/announcements/', {'course': self.course.id, 'title': 'Exam', 'content': 'Friday'})
+            self.assertFalse(Notification.objects.exists())
+        self.assertEqual(response.status_code, 201)
+        touched = ' '.join(q['sql'] for q in queries.captured_queries)
+        self.assertNotIn('api_enrollment', touched)
+        self.assertNotIn('api_notification', touched)
+        self.assertEqual(Notification.objects.filter(title='Exam').count(), 150)
+        self.assertEqual((len(self.outbox.outbox), self.outbox.batches), (150, 2))
+        self.assertFalse(Device.objects.filter(token='ExponentPushToken[3]').exists())
+        self.assertEqual(Device.objects.count(), 150)
+
+    def test_retried_fan_out_creates_no_duplicates(self):
+        announcement = Announcement.objects.create(course=self.course, title='Exam', content='Friday')
+        fanout.announce(announcement.pk)
+        # A retry after a partial run only fills the gap, and pushes are a job of their own
+        Notification.objects.filter(announcement=announcement, user__username='student7').delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            fanout.announce(announcement.pk)
+        self.assertEqual(Notification.objects.filter(announcement=announcement).count(), 150)
+        self.assertEqual([unread_count(User.objects.get(username=name).pk) for name in ('student0', 'student7')], [1, 1])
+        self.assertEqual(len(self.outbox.outbox), 150)
+
+    @override_settings(API_TASKS={'BACKEND': 'database'})
+    def test_failed_push_batch_is_retried_alone(self):
+        announcement = Announcement.objects.create(course=self.course, title='Exam', content='Friday')
+        Job.objects.all().delete()
+        fanout.push_announcement(announcement.pk)
+        self.assertEqual(Job.objects.filter(task='api.fanout.push_batch').count(), 2)
+        self.outbox.failures = 1
+        jobs.work('test-worker', once=True)
+        self.assertEqual((len(self.outbox.outbox), self.outbox.batches), (50, 1))
+        failed = Job.objects.get(status='queued')
+        self.assertIn('URLError', failed.last_error)
+        Job.objects.filter(pk=failed.pk).update(run_at=timezone.now())
+        jobs.work('test-worker', once=True)
+        # Every device once: the delivered batch was not sent again
+        self.assertEqual(sorted(m['to'] for m in self.outbox.outbox), sorted(f'ExponentPushToken[{n}]' for n in range(150)))
+        self.assertEqual(Job.objects.filter(status='done').count(), 2)
+
+
+def flaky_job(counter_title):
+    # Fails on the first run, succeeds on the retry
+    if not Notification.objects.filter(title=counter_title).exists():
+        Notification.objects.create(user=User.objects.first(), title=counter_title, message='')
+        raise RuntimeError('first attempt fails')
+
+
+class JobQueueTests(TestCase):
+    def test_priority_claim_and_retry_with_backoff(self):
+        User.objects.create_user('someone')
+        tasks.enqueue(flaky_job, counter_title='retry')
+        tasks.enqueue(flaky_job, priority=5, counter_title='urgent')
+        claimed = jobs.claim('test-worker', limit=1)
+        self.assertEqual(claimed[0].kwargs, {'counter_title': 'urgent'})
+        self.assertEqual(jobs.claim('other-worker', limit=5)[0].kwargs, {'counter_title': 'retry'})
+        self.assertEqual(jobs.claim('third-worker', limit=5), [])
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.assertFalse(jobs.execute(claimed[0]))
+        job = Job.objects.get(pk=claimed[0].pk)
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        # Not due yet; once the backoff has passed a worker finishes it
+        self.assertEqual(jobs.work('test-worker', once=True), 0)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(jobs.work('test-worker', once=True), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'done')
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.push_job('api.tests.flaky_job', {'counter_title': 'x'})
+        Job.objects.filter(pk=job.pk).update(status='running', locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'queued')
+
+    def test_outcome_needs_the_lock_and_finished_jobs_expire(self):
+        User.objects.create_user('someone')
+        job = jobs.push_job('api.tests.flaky_job', {'counter_title': 'owned'})
+        claimed = jobs.claim('slow-worker')[0]
+        # Re-queued and claimed by another worker while this one was still running it
+        Job.objects.filter(pk=job.pk).update(locked_by='other-worker')
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.assertFalse(jobs.execute(claimed))
+        self.assertEqual(Job.objects.get(pk=job.pk).locked_by, 'other-worker')
+        Job.objects.filter(pk=job.pk).update(status='done', updated_at=timezone.now() - timedelta(days=8))
+        jobs.push_job('api.tests.flaky_job', {'counter_title': 'fresh'})
+        self.assertEqual(apply_policy(policies()['done_jobs'])['rows'], 1)
+        self.assertEqual(Job.objects.count(), 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Astronomy', description='Stars and planets', instructor_name='T')
+        self.lesson = Lesson.objects.create(course=self.course, title='Telescopes', content_text='Refracting telescopes bend light with lenses.', order=1)
+        other = Course.objects.create(title='Cooking', instructor_name='T')
+        Lesson.objects.create(course=other, title='Knife skills', content_text='Lenses are not needed here.', order=1)
+        Comment.objects.create(user=User.objects.create_user('student'), lesson=self.lesson, text='Which telescope should I buy?')
+
+    def results(self, query):
+        response = self.client.get('/api/search/', {'q': query} if isinstance(query, str) else query)
+        self.assertEqual(response.status_code, 200)
+        return [(hit['type'], hit['id']) for hit in response.data['results']]
+
+    def test_ranked_incremental_results(self):
+        hits = self.results('telescope')
+        self.assertEqual(hits[0], ('lesson', self.lesson.id))
+        self.assertIn('comment', [kind for kind, _ in hits])
+        self.assertIn('<mark>', self.client.get('/api/search/?q=lenses&course=%d' % self.course.id).data['results'][0]['snippet'])
+        self.assertEqual(self.results({'q': 'lenses', 'course': self.course.id}), [('lesson', self.lesson.id)])
+        self.assertEqual(self.results({'q': 'plan'}), [('course', self.course.id)])
+        self.lesson.title = 'Mirrors'
+        self.lesson.content_text = 'Reflecting instruments'
+        self.lesson.save()
+        self.assertNotIn(('lesson', self.lesson.id), self.results('telescope'))
+        self.lesson.delete()
+        self.assertEqual(self.results('reflecting'), [])
+
+    def test_rebuild_and_validation(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self.results('telescope'), [])
+        self.assertEqual(search.rebuild()['lesson'], 2)
+        self.assertEqual(len(self.results({'q': 'telescope', 'type': 'comment'})), 1)
+        self.assertEqual(self.client.get('/api/search/?q=x&type=quiz').status_code, 400)
+        self.assertEqual(self.results('"); DROP'), [])
+
+
+@override_settings(API_AUTH={'SIGNED_TOKENS': True, 'LOCAL_TTL': 30, 'CACHE_TTL': 300})
+class CachedTokenAuthTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('ada', password='pw-12345')
+        login = APIClient().post('/api/auth/login/', {'username': 'ada', 'password': 'pw-12345'}, format='json').data
+        self.token, self.signed = login['token'], login['signed_token']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def auth_queries(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            status_code = client.get('/api/notifications/').status_code
+        return status_code, sum('authtoken_token' in q['sql'] for q in queries.captured_queries)
+
+    def test_token_lookup_is_cached_and_invalidated(self):
+        self.assertEqual(self.auth_queries(self.client), (200, 1))
+        self.assertEqual(self.auth_queries(self.client), (200, 0))
+        user = User.objects.get(username='ada')
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 401)
+        user.is_active = True
+        user.save()
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 200)
+        Token.objects.filter(key=self.token).get().delete()
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 401)
+
+    def test_signed_tokens(self):
+        signed = APIClient()
+        signed.credentials(HTTP_AUTHORIZATION=f'Signed {self.signed}')
+        self.assertEqual(self.auth_queries(signed), (200, 0))
+        signed.credentials(HTTP_AUTHORIZATION=f'Signed {self.signed}x')
+        self.assertEqual(signed.get('/api/notifications/').status_code, 401)
+        signed.credentials(HTTP_AUTHORIZATION=f'Signed {self.signed}')
+        # A session login (last_login) or a profile edit keeps issued tokens valid
+        user = User.objects.get(username='ada')
+        update_last_login(None, user)
+        user.email = 'ada@example.com'
+        user.save()
+        self.assertEqual(signed.get('/api/notifications/').status_code, 200)
+        user.set_password('pw-67890')
+        user.save()
+        self.assertEqual(signed.get('/api/notifications/').status_code, 401)
+
+    def test_revocation_outlives_cache_churn(self):
+        signed = APIClient()
+        signed.credentials(HTTP_AUTHORIZATION=f'Signed {self.signed}')
+        user = User.objects.get(username='ada')
+        user.set_password('pw-67890')
+        user.save()
+        culled = {**settings.CACHES['default'], 'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}}
+        with self.settings(CACHES={**settings.CACHES, 'default': culled}):
+            for n in range(50):
+                caches['default'].set(f'api:auth:token:{n}', n)
+            self.assertEqual(signed.get('/api/notifications/').status_code, 401)
+
+    def test_token_without_a_readable_stamp_is_rejected(self):
+        signed = APIClient()
+        signed.credentials(HTTP_AUTHORIZATION=f'Signed {self.signed}')
+        self.assertEqual(signed.get('/api/notifications/').status_code, 200)
+        caches['stamps'].clear()
+        self.assertEqual(signed.get('/api/notifications/').status_code, 401)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_per_process_cache_falls_back_to_the_database(self):
+        authentication._local.clear()
+        self.assertEqual(self.auth_queries(self.client), (200, 1))
+        authentication._local.clear()  # as if LOCAL_TTL had passed
+        self.assertEqual(self.auth_queries(self.client), (200, 1))
+        signed = APIClient()
+        signed.credentials(HTTP_AUTHORIZATION=f'Signed {self.signed}')
+        self.assertEqual(signed.get('/api/notifications/').status_code, 401)
+        login = APIClient().post('/api/auth/login/', {'username': 'ada', 'password': 'pw-12345'}, format='json').data
+        self.assertNotIn('signed_token', login)
+
+
+@override_settings(API_EVENTS={'BACKEND': 'api.events.LocalBackend'}, API_TASKS={'BACKEND': 'immediate'})
+class LiveEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('listener')
+        self.token = Token.objects.create(user=self.user).key
+        self.course = Course.objects.create(title='Course', instructor_name='T')
+        Enrollment.objects.create(student=self.user, course=self.course)
+
+    def test_requires_asgi_and_auth(self):
+        self.assertEqual(self.client.get('/api/events/').status_code, 503)
+
+    @override_settings(API_TASKS={'BACKEND': 'database'})
+    async def test_refuses_process_local_backend_with_worker(self):
+        response = await self.async_client.get('/api/events/', query_params={'token': self.token})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('LocalBackend', response.json()['error'])
+
+    async def test_stream_routes_user_and_course_events(self):
+        self.assertEqual((await self.async_client.get('/api/events/')).status_code, 401)
+        response = await self.async_client.get('/api/events/', query_params={'token': self.token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = response.streaming_content
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        events.broadcaster.dispatch({'type': 'notification', 'id': 1, 'user': self.user.pk + 1, 'title': 'not yours'})
+        events.broadcaster.dispatch({'type': 'announcement', 'id': 2, 'course': self.course.pk, 'title': 'Exam'})
+        events.broadcaster.dispatch({'type': 'notification', 'id': 3, 'user': self.user.pk, 'title': 'Graded'})
+        self.assertIn(b'"title": "Exam"', await anext(chunks))
+        self.assertIn(b'id: notification:3', await anext(chunks))
+        events.broadcaster.subscriptions.clear()
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.notes = [Notification.objects.create(user=self.user, title=f'N{n}', message='') for n in range(5)]
+        Notification.objects.create(user=User.objects.create_user('other'), title='Other', message='')
+
+    def unread(self):
+        return self.client.get('/api/notifications/unread_count/').data['unread']
+
+    def test_counter_follows_inserts_and_reads(self):
+        self.assertEqual(self.unread(), 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.unread(), 5)
+        Notification.objects.create(user=self.user, title='New', message='')
+        self.notes[0].is_read = True
+        self.notes[0].save()
+        self.assertEqual(self.unread(), 5)
+        self.client.post(f'/api/notifications/{self.notes[1].id}/mark_read/')
+        ids = [n.id for n in self.notes[1:4]]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/notifications/mark_read/', {'ids': ids}, format='json')
+        self.assertEqual(response.data['marked'], 2)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE "api_notification"') for q in queries.captured_queries), 1)
+        self.assertEqual(self.unread(), 2)
+        self.notes[4].delete()
+        self.assertEqual(self.client.post('/api/notifications/mark_all_read/').data['marked'], 1)
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 1)
+
+    def test_fan_out_and_rebuild(self):
+        self.unread()
+        course = Course.objects.create(title='Course', instructor_name='T')
+        Enrollment.objects.create(student=self.user, course=course)
+        fanout.announce(Announcement.objects.create(course=course, title='Exam', content='Friday').id)
+        self.assertEqual(self.unread(), 6)
+        UnreadCounter.objects.filter(user=self.user).update(unread=99)
+        self.assertEqual(progress.rebuild()['unreadcounter.unread'], 1)
+        self.assertEqual(self.unread(), 6)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader')
+        self.lesson = make_course(self.user, lessons=1).lessons.get()
+        old = timezone.now() - timedelta(days=400)
+        self.old_read = [Notification.objects.create(user=self.user, title=f'R{n}', message='', is_read=True) for n in range(5)]
+        self.old_unread = Notification.objects.create(user=self.user, title='U', message='')
+        self.fresh = Notification.objects.create(user=self.user, title='F', message='', is_read=True)
+        self.comment = Comment.objects.create(user=self.user, lesson=self.lesson, text='ancient remark')
+        Notification.objects.exclude(pk=self.fresh.pk).update(created_at=old)
+        Comment.objects.filter(pk=self.comment.pk).update(created_at=old - timedelta(days=800))
+
+    def test_batched_delete_and_archive(self):
+        unread_count(self.user.pk)
+        report = apply_policy(policies()['read_notifications'], batch_size=2)
+        self.assertEqual((report['rows'], report['batches'], report['complete']), (5, 3, True))
+        self.assertEqual(apply_policy(policies()['unread_notifications'], dry_run=True)['rows'], 1)
+        apply_policy(policies()['unread_notifications'])
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [self.fresh.pk])
+        self.assertEqual(ArchivedRow.objects.get(model='api.notification').data['title'], 'U')
+        self.assertEqual(unread_count(self.user.pk), 0)
+        self.assertEqual(UnreadCounter.objects.get(user=self.user).unread, 0)
+        purged = {note.pk for note in self.old_read} | {self.old_unread.pk}
+        tombstones = Tombstone.objects.filter(model='notifications')
+        self.assertEqual(set(tombstones.values_list('object_id', flat=True)), purged)
+        self.assertEqual(set(tombstones.values_list('owner_id', flat=True)), {self.user.pk})
+        apply_policy(policies()['comments'])
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertFalse(SearchDocument.objects.filter(kind='comment', object_id=self.comment.pk).exists())
+        self.assertEqual(apply_policy(policies()['comments'], max_seconds=0)['complete'], False)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BenchTests(TestCase):
+    def test_seed_keeps_counters_consistent_and_benchmark_reports(self):
+        volumes = {'courses': 3, 'lessons': 10, 'projects': 3, 'quizzes': 2, 'users': 5, 'enrollments': 12,
+                   'notifications': 20, 'announcements': 3, 'comments': 6, 'submissions': 4}
+        created = seed(volumes)
+        self.assertEqual(created['enrollments'], 12)
+        self.assertEqual(Lesson.objects.count(), 10)
+        self.assertEqual(SearchDocument.objects.filter(kind='lesson').count(), 10)
+        self.assertEqual(progress.rebuild(dry_run=True), {'course.lesson_count': 0, 'enrollment.completed_count': 0, 'unreadcounter.unread': 0})
+
+        report = run_benchmark(User.objects.get(username=USERNAME.format(0)), iterations=3, warmup=0,
+                               only=['course-list', 'course-detail', 'search', 'events'])
+        self.assertEqual(set(report['routes']), {'course-list', 'course-detail', 'search'})
+        self.assertIn('events', report['skipped'])
+        route = report['routes']['course-list']
+        self.assertEqual((route['status'], route['queries']), (200, 1))
+        self.assertLessEqual(route['p50_ms'], route['p99_ms'])
+        slower = {'routes': {'course-list': {**route, 'queries': 0}}}
+        self.assertEqual(compare(slower, report)['course-list'], ['queries 0 -> 1'])
+
+
+class InstrumentationTests(TestCase):
+    config = {'ENABLED': True, 'SLOW_MS': 0, 'LOG_SAMPLE_RATE': 1.0, 'REPEAT_THRESHOLD': 3}
+
+    def test_server_timing_and_slow_log(self):
+        user = User.objects.create_user('student')
+        make_course(user)
+        with self.settings(API_INSTRUMENTATION=self.config):
+            client = APIClient()
+            client.force_authenticate(user)
+            with self.assertLogs('api.instrumentation', 'WARNING') as logs:
+                response = client.get('/api/lessons/')
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('desc="1 queries"', header)
+        self.assertIn('render;dur=', header)
+        record = logs.records[0].instrumentation
+        self.assertEqual((record['view'], record['status'], record['queries']), ('lesson-list', 200, 1))
+        self.assertFalse(APIClient().get('/api/courses/').has_header('Server-Timing'))
+
+    def test_repeated_statements_are_flagged(self):
+        stats = RequestStats()
+        with connection.execute_wrapper(stats):
+            for pk in range(4):
+                list(Course.objects.filter(pk=pk))
+            Lesson.objects.count()
+        repeated = stats.repeated(3)
+        self.assertEqual([n for sql, n in repeated], [4])
+        self.assertIn('repeat;desc="4x identical query"', server_timing(stats.timings(stats.started), stats.queries, repeated))
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        user = User.objects.create_user('student')
+        course = make_course(user)
+        Enrollment.objects.create(student=user, course=course)
+        Notification.objects.create(user=user, title='N', message='')
+        project = course.projects.get()
+        Project.objects.filter(pk=project.pk).update(deadline=timezone.localdate())
+        Submission.objects.create(project=project, student=user, student_name='student')
+        # No ANALYZE: with statistics for a handful of rows any planner rightly prefers a scan
+        report = check_plans(force_index=True)
+        self.assertEqual(set(report), set(HOT_QUERIES))
+        for name, result in report.items():
+            with self.subTest(query=name):
+                self.assertEqual(result.get('problems'), [], result.get('plan'))
+
+    def test_problem_detection(self):
+        self.assertEqual(problems('2 0 0 SCAN api_project\n9 0 0 USE TEMP B-TREE FOR ORDER BY', 'sqlite'),
+                         ['sequential scan on api_project', 'sort step for ORDER BY'])
+        plan = 'Sort  (cost=1.1..1.2 rows=1 width=8)\n  Sort Key: deadline\n  ->  Seq Scan on api_project  (cost=0.0..1.0 rows=1 width=8)'
+        self.assertEqual(problems(plan, 'postgresql'), ['sequential scan on api_project', 'sort step'])
+        self.assertEqual(problems('Index Scan using api_project_course_due_idx on api_project', 'postgresql'), [])
+
+
+class FastJSONTests(TestCase):
+    URLS = [
+        '/api/courses/', '/api/courses/?fields=id,title,created_at', '/api/courses/?expand=lessons',
+        '/api/courses/?paginate=cursor&page_size=1', '/api/lessons/', '/api/lessons/?fields=id,title,course',
+        '/api/lessons/?paginate=cursor&page_size=2', '/api/notifications/', '/api/notifications/?is_read=false',
+        '/api/notifications/?paginate=cursor&page_size=1',
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user('student')
+        make_course(self.user)
+        course = Course.objects.create(title='Ünïcode \u2028 line\u2029 "quoted" </script>', instructor_name='T', description=None)
+        Lesson.objects.create(course=course, title='Tab\there', video_url='https://example.com/v', order=3)
+        Notification.objects.create(user=self.user, title='Hello \U0001F600', message='a\nb\x1f')
+        Notification.objects.create(user=self.user, title='Read', message='', is_read=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fetch(self, url, enabled):
+        with self.settings(API_FAST_JSON={'ENABLED': enabled}):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_fast_path_is_byte_identical(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                slow = self.fetch(url, False)
+                fast = self.fetch(url, True)
+                self.assertEqual(fast.content, slow.content)
+                self.assertEqual(fast['Content-Type'], slow['Content-Type'])
+                self.assertEqual(fast.get('ETag'), slow.get('ETag'))
+                with mock.patch.object(fastjson, 'orjson', None):
+                    self.assertEqual(self.fetch(url, True).content, slow.content)
+        self.assertIn(b'\\u2028', self.fetch('/api/courses/', True).content)
+
+    def test_fast_path_skips_the_serializer(self):
+        with mock.patch.object(LessonSummarySerializer, 'to_representation', side_effect=AssertionError):
+            self.fetch('/api/lessons/', True)
+        with self.settings(API_FAST_JSON={'ENABLED': True}):
+            self.assertEqual(self.client.get('/api/lessons/?format=api').status_code, 200)
+
+
+# 'replica' mirrors the test database on a second connection (backend/settings.py). Its reads
+# see only committed rows, hence TransactionTestCase.
+@override_settings(API_REPLICA={'ENABLED': True, 'ALIAS': 'replica', 'STICKY_SECONDS': 30})
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user('student')
+        self.course = make_course(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    def served_by(self, method, url, table):
+        """The aliases whose connection queried `table` while handling the request."""
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(url)
+        self.assertLess(response.status_code, 400)
+        return {alias for alias, captured in (('default', primary), ('replica', replica))
+                if any(f'"{table}"' in query['sql'] for query in captured.captured_queries)}
+
+    def test_reads_use_replica_until_the_client_writes(self):
+        self.assertEqual(self.served_by('get', '/api/lessons/', 'api_lesson'), {'replica'})
+        self.assertEqual(self.served_by('get', '/api/sync/', 'api_course'), {'default'})
+        # The catalog changed moments ago, so its ETagged body comes from the primary
+        self.assertEqual(self.served_by('get', '/api/courses/', 'api_course'), {'default'})
+        notification = Notification.objects.create(user=self.user, title='N', message='')
+        self.assertEqual(self.served_by('post', f'/api/notifications/{notification.pk}/mark_read/', 'api_notification'), {'default'})
+        self.assertEqual(self.served_by('get', '/api/lessons/', 'api_lesson'), {'default'})
+        # Other clients keep reading from the replica
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=User.objects.create_user("other")).key}')
+        self.assertEqual(self.served_by('get', '/api/lessons/', 'api_lesson'), {'replica'})
+
+    def test_router_rules(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Course))
+        _replica_reads.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Course), 'replica')
+            self.assertIsNone(router.db_for_read(Token))
+            with use_primary():
+                self.assertIsNone(router.db_for_read(Course))
+        finally:
+            _replica_reads.set(False)
+        self.assertEqual(router.db_for_write(Course, instance=self.course), 'default')
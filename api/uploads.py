@@ -0,0 +1,118 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import UploadSession
+
+# --- RESUMABLE UPLOADS ---
+# init -> append chunks -> commit. Each chunk is streamed from the request
+# straight into <CHUNKED_UPLOADS['DIR']>/<session>.part in small blocks while its
+# sha256 is computed; a chunk whose checksum does not match is cut off again, so
+# the file only ever holds verified bytes and `received` is the resume offset.
+# On commit the part file is moved (not copied) into the target FileField.
+
+BLOCK_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _config():
+    return getattr(settings, 'CHUNKED_UPLOADS', {})
+
+
+def upload_dir():
+    return _config().get('DIR') or os.path.join(settings.MEDIA_ROOT, 'uploads_tmp')
+
+
+def max_size():
+    return _config().get('MAX_SIZE', 2 * 1024 ** 3)
+
+
+def part_path(session):
+    return os.path.join(upload_dir(), f'{session.pk}.part')
+
+
+def parse_checksum(header):
+    # "Upload-Checksum: sha256 <hex digest>"
+    algorithm, _, digest = (header or '').strip().partition(' ')
+    if algorithm.lower() != 'sha256' or not digest:
+        raise ChunkError('Upload-Checksum header must be "sha256 <hex digest>".')
+    return digest.strip().lower()
+
+
+def append_chunk(session, stream, offset, length, expected_digest):
+    """Write one chunk at `offset`; the caller holds a row lock on the session."""
+    if offset != session.received:
+        raise ChunkError(f'Expected offset {session.received}.', status=409)
+    if length <= 0 or offset + length > session.total_size:
+        raise ChunkError('Chunk exceeds the declared upload size.')
+    os.makedirs(upload_dir(), exist_ok=True)
+    path = part_path(session)
+    digest = hashlib.sha256()
+    written = 0
+    with open(path, 'ab') as part:
+        part.truncate(offset)
+        part.seek(offset)
+        while written < length:
+            block = stream.read(min(BLOCK_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            digest.update(block)
+            written += len(block)
+        if written != length or digest.hexdigest() != expected_digest:
+            part.truncate(offset)
+            raise ChunkError('Chunk was incomplete or its checksum did not match; resend it.')
+    session.received = offset + written
+    session.save(update_fields=['received', 'updated_at'])
+    return session.received
+
+
+class PartFile(File):
+    # Exposes temporary_file_path() so FileSystemStorage moves the file instead of copying it
+    def __init__(self, path, name):
+        super().__init__(open(path, 'rb'), name=name)
+        self._path = path
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def committed_file(session):
+    if session.received != session.total_size:
+        raise ChunkError(f'Upload incomplete: {session.received} of {session.total_size} bytes received.', status=409)
+    return PartFile(part_path(session), session.filename)
+
+
+def discard(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    if session.pk and UploadSession.objects.filter(pk=session.pk).exists():
+        session.delete()
+
+
+def purge_abandoned(max_age):
+    """Delete sessions idle for longer than `max_age` and part files without a session."""
+    cutoff = timezone.now() - max_age
+    removed = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        discard(session)
+        removed += 1
+    orphans = 0
+    if os.path.isdir(upload_dir()):
+        live = {str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)}
+        for name in os.listdir(upload_dir()):
+            path = os.path.join(upload_dir(), name)
+            if name.endswith('.part') and name[:-5] not in live and os.path.getmtime(path) < cutoff.timestamp():
+                os.remove(path)
+                orphans += 1
+    return removed, orphans
@@ -4,8 +4,8 @@ from .views import (
     CourseViewSet, LessonViewSet, ProjectViewSet, SubmissionViewSet,
     QuizViewSet, QuestionViewSet, ChoiceViewSet, EnrollmentViewSet,
     AnnouncementViewSet, NotificationViewSet, CommentViewSet,
-    DeviceViewSet, LessonAttachmentViewSet,
-    RegisterView, LoginView,
+    DeviceViewSet, LessonAttachmentViewSet, QuizAttemptViewSet, UploadViewSet,
+    RegisterView, LoginView, CacheStatsView, SyncView, MediaView, SearchView, event_stream,
 )
 
 router = DefaultRouter()
@@ -22,9 +22,17 @@ router.register(r'notifications', NotificationViewSet)
 router.register(r'comments', CommentViewSet)
 router.register(r'devices', DeviceViewSet)
 router.register(r'lesson-attachments', LessonAttachmentViewSet)
+router.register(r'quiz-attempts', QuizAttemptViewSet)
+router.register(r'uploads', UploadViewSet, basename='upload')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('auth/login/', LoginView.as_view(), name='login'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('events/', event_stream, name='events'),
+    path('media/<str:kind>/<int:pk>/', MediaView.as_view(), name='media'),
+    path('media/<str:kind>/<int:pk>/link/', MediaView.as_view(), {'link': True}, name='media-link'),
 ]
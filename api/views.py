@@ -1,14 +1,103 @@
-from rest_framework import viewsets, generics, status, decorators
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework import viewsets, generics, mixins, status, decorators, exceptions, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
-from .models import Course, Lesson, Project, Submission, Quiz, Question, Choice, Enrollment, Announcement, Notification, Comment, Device, LessonAttachment
+from .models import Course, Lesson, Project, Submission, Quiz, Question, Choice, Enrollment, Announcement, Notification, Comment, Device, LessonAttachment, QuizAttempt, UploadSession, SearchDocument
 from .serializers import *
 from .serializers import DeviceSerializer, LessonAttachmentSerializer
+from .prefetch import apply_plan
+from .progress import adjust_unread, unread_count
+from .authentication import CachedTokenAuthentication, SignedTokenAuthentication, issue_signed_token, signed_tokens_enabled
+from . import cache, events, fastjson, gradebook, media, replica, scoring, search, streaming, sync, uploads
+from .conditional import AggregateValidatorsMixin, CatalogValidatorsMixin
+
+# --- QUERY PLANNING ---
+class PlannedQuerysetMixin:
+    # Builds select_related/prefetch_related from the serializer tree so list and
+    # detail views run a constant number of queries regardless of row count.
+    def get_queryset(self):
+        return apply_plan(super().get_queryset(), self.get_serializer())
+
+# --- PER-USER SCOPING ---
+class UserScopedMixin:
+    # Users only see their own rows. Staff lists are scoped too unless they ask for the
+    # global view with ?scope=all; staff detail actions (grading, edits) reach any row.
+    owner_field = None
+    permission_classes = [permissions.IsAuthenticated]
+
+    def is_global_view(self):
+        if not self.request.user.is_staff:
+            return False
+        return self.action != 'list' or self.request.query_params.get('scope') == 'all'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.is_global_view():
+            return queryset
+        return queryset.filter(**{self.owner_field: self.request.user})
+
+class CachedRetrieveMixin:
+    # Course trees are read far more than written; serve them from the versioned cache
+    def retrieve(self, request, *args, **kwargs):
+        if not cache.is_enabled():
+            return super().retrieve(request, *args, **kwargs)
+        key = cache.payload_key(kwargs[self.lookup_field], cache.request_variant(request))
+        if key is None:
+            return super().retrieve(request, *args, **kwargs)  # 404
+        data = cache.get_payload(key)
+        if data is not None:
+            return Response(data)
+        # Built from the primary: a payload from a lagging replica would be cached under the new version
+        with replica.use_primary():
+            response = super().retrieve(request, *args, **kwargs)
+        cache.set_payload(key, response.data)
+        return response
+
+class FastListMixin:
+    # Opt-in (API_FAST_JSON): flat list payloads skip the serializer and renderer, see api/fastjson.py
+    def list(self, request, *args, **kwargs):
+        if not (fastjson.is_enabled() and fastjson.renders(request)):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        mapping = fastjson.compile_fields(self.get_serializer(), queryset)
+        if mapping is None:
+            return super().list(request, *args, **kwargs)
+        # Cursor pagination reads its position from the row, so the ordering columns must be selected
+        ordering = [f.lstrip('-') for f in getattr(self, 'cursor_ordering', ())]
+        rows = fastjson.values(queryset, mapping, extra=ordering)
+        page = self.paginate_queryset(rows)
+        data = fastjson.build_rows(rows if page is None else page, mapping)
+        if page is not None:
+            data = self.get_paginated_response(data).data
+        return HttpResponse(fastjson.dumps(data), content_type=request.accepted_renderer.media_type)
+
+class SummaryListMixin:
+    # List actions use the lightweight summary serializer; retrieve keeps the full tree.
+    summary_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.summary_serializer_class is not None:
+            return self.summary_serializer_class
+        return super().get_serializer_class()
 
 # --- AUTH ---
+def token_payload(user, token):
+    payload = {"token": token.key}
+    if signed_tokens_enabled():
+        # Stateless alternative for hot paths: send as "Authorization: Signed <signed_token>"
+        payload["signed_token"] = issue_signed_token(user)
+    return payload
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
@@ -17,53 +106,235 @@ class RegisterView(generics.CreateAPIView):
         response = super().create(request, *args, **kwargs)
         user = User.objects.get(username=response.data.get('username'))
         token, _ = Token.objects.get_or_create(user=user)
-        return Response({"message": "Account created", "user": UserSerializer(user).data, "token": token.key})
+        return Response({"message": "Account created", "user": UserSerializer(user).data, **token_payload(user, token)})
 
 class LoginView(APIView):
     def post(self, request):
         user = authenticate(username=request.data.get('username'), password=request.data.get('password'))
         if user:
             token, _ = Token.objects.get_or_create(user=user)
-            return Response({"message": "Login Successful", "user": UserSerializer(user).data, "token": token.key})
+            return Response({"message": "Login Successful", "user": UserSerializer(user).data, **token_payload(user, token)})
         return Response({"error": "Invalid Credentials"}, status=status.HTTP_400_BAD_REQUEST)
 
+class CacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache.stats())
+
+class SyncView(APIView):
+    # Delta sync for the mobile client: GET /api/sync/?since=<cursor>. Apply each collection's
+    # `updated` rows, then its `deleted` ids; keep requesting while `has_more` is true.
+    # 410 means the cursor outlived the tombstones: drop local data and sync without `since`.
+    permission_classes = [permissions.IsAuthenticated]
+    replica_reads = False # A row missing from a lagging replica would be skipped by the cursor for good
+
+    def get(self, request):
+        config = getattr(settings, 'API_SYNC', {})
+        try:
+            limit = int(request.query_params.get('limit', config.get('PAGE_LIMIT', 500)))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, config.get('MAX_LIMIT', 2000)))
+        try:
+            return Response(sync.collect_changes(request.user, request.query_params.get('since'), limit, {'request': request}))
+        except sync.ExpiredCursor as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_410_GONE)
+        except sync.InvalidCursor as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+# --- LIVE EVENTS ---
+def authenticate_stream(request):
+    # EventSource cannot set headers, so ?token=<key> is accepted besides the Authorization header
+    try:
+        for authenticator in (CachedTokenAuthentication(), SignedTokenAuthentication()):
+            found = authenticator.authenticate(request)
+            if found:
+                return found[0]
+        if request.GET.get('token'):
+            return CachedTokenAuthentication().authenticate_credentials(request.GET['token'])[0]
+    except exceptions.AuthenticationFailed:
+        pass
+    return None
+
+async def event_stream(request):
+    # GET /api/events/ - text/event-stream of the caller's notification and announcement events.
+    # Needs the ASGI server: each open stream is a coroutine waiting on a queue, not a worker thread.
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live events are only served by the ASGI application'}, status=503)
+    error = events.configuration_error()
+    if error:
+        return JsonResponse({'error': error}, status=503)
+    user = await sync_to_async(authenticate_stream)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    course_ids = [course_id async for course_id in Enrollment.objects.filter(student_id=user.pk).values_list('course_id', flat=True)]
+    subscription = await events.broadcaster.subscribe(user.pk, course_ids)
+    heartbeat = getattr(settings, 'API_EVENTS', {}).get('HEARTBEAT_SECONDS', 20)
+
+    async def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    yield events.format_event(await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat))
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+        finally:
+            # Runs when the client disconnects and the server cancels the stream
+            events.broadcaster.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+class SearchView(APIView):
+    # GET /api/search/?q=<words>&type=lesson,comment&course=<id>&limit=20 - ranked hits with <mark> snippets
+    def get(self, request):
+        kinds = [k for k in request.query_params.get('type', '').split(',') if k]
+        unknown = set(kinds) - {kind for kind, _ in SearchDocument.KINDS}
+        if unknown:
+            return Response({'error': f"Unknown type: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 50))
+            course_id = int(request.query_params['course']) if request.query_params.get('course') else None
+        except ValueError:
+            return Response({'error': 'limit and course must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        query = request.query_params.get('q', '')
+        return Response({'query': query, 'results': search.search(query, kinds, course_id, limit)})
+
+class MediaView(APIView):
+    # GET /api/media/<kind>/<pk>/ streams the file (Range, conditional GET, optional proxy offload) to the
+    # owner, enrolled students or staff. GET .../link/ returns a short-lived signed URL for clients that
+    # cannot send an Authorization header; ?download=1 asks for an attachment disposition.
+    permission_classes = [permissions.AllowAny]
+    sources = {
+        'lesson-attachments': (LessonAttachment.objects.select_related('lesson'), 'file'),
+        'submissions': (Submission.objects.all(), 'submitted_file'),
+    }
+
+    def perform_content_negotiation(self, request, force=False):
+        # Players and PDF viewers send media Accept headers no renderer matches
+        return super().perform_content_negotiation(request, force=True)
+
+    def can_read(self, user, obj):
+        if user.is_staff:
+            return True
+        if isinstance(obj, Submission):
+            return obj.student_id == user.pk
+        return Enrollment.objects.filter(student=user, course_id=obj.lesson.course_id).exists()
+
+    def get(self, request, kind, pk, link=False):
+        if kind not in self.sources:
+            raise Http404
+        queryset, file_field = self.sources[kind]
+        obj = queryset.filter(pk=pk).first()
+        if 'sig' in request.query_params and not link:
+            user = User.objects.filter(pk=media.link_user_id(kind, pk, request.query_params['sig'])).first()
+        else:
+            user = request.user if request.user.is_authenticated else None
+        if user is None:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        if obj is None or not getattr(obj, file_field) or not self.can_read(user, obj):
+            raise Http404
+        if link:
+            url = request.build_absolute_uri(f'/api/media/{kind}/{pk}/') + '?sig=' + media.sign_link(kind, pk, user)
+            return Response({'url': url, 'expires_in': getattr(settings, 'API_MEDIA', {}).get('LINK_MAX_AGE', 3600)})
+        return media.serve(request, getattr(obj, file_field), as_attachment=request.query_params.get('download') == '1')
+
 # --- VIEWSETS ---
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(CatalogValidatorsMixin, FastListMixin, CachedRetrieveMixin, PlannedQuerysetMixin, SummaryListMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    summary_serializer_class = CourseSummarySerializer
+    cursor_ordering = ('created_at', 'id')
+
+    # Teacher view: students x projects grade matrix from a few grouped queries
+    @decorators.action(detail=True, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def gradebook(self, request, pk=None):
+        course = generics.get_object_or_404(Course.objects.only('id'), pk=pk)
+        return Response(gradebook.build_gradebook(course))
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(UserScopedMixin, PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
+    owner_field = 'student'
+    cursor_ordering = ('enrolled_at', 'id')
+    filterset_fields = ['course', 'student']
+
+    def enrolling_student_id(self):
+        # Staff may enroll someone else by sending `student`; everybody else enrolls themselves
+        student = self.request.data.get('student')
+        if not self.request.user.is_staff or student in (None, ''):
+            return self.request.user.pk
+        try:
+            return User.objects.values_list('pk', flat=True).get(pk=int(student))
+        except (TypeError, ValueError, User.DoesNotExist):
+            raise exceptions.ValidationError({'student': ['Invalid pk - object does not exist.']})
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'create':
+            context['student_id'] = self.enrolling_student_id()
+        return context
+
+    def perform_create(self, serializer):
+        serializer.save(student_id=serializer.context['student_id'])
 
     @decorators.action(detail=False, methods=['post'])
     def mark_complete(self, request):
+        student = request.data.get('student') if request.user.is_staff else request.user.id
         try:
-            enrollment = Enrollment.objects.get(student_id=request.data.get('student'), course_id=request.data.get('course'))
+            enrollment = Enrollment.objects.get(student_id=student, course_id=request.data.get('course'))
+            # completed_count is updated by the m2m signal; saving the row here would clobber it
             enrollment.completed_lessons.add(request.data.get('lesson'))
-            enrollment.save()
             return Response({'status': 'marked complete', 'progress': enrollment.progress_percent})
         except Enrollment.DoesNotExist:
             return Response({'error': 'Enrollment not found'}, status=404)
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(AggregateValidatorsMixin, FastListMixin, UserScopedMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
+    owner_field = 'user'
+    cursor_ordering = ('-created_at', '-id')
+    filterset_fields = ['is_read']
+
+    # Read state changes are single UPDATEs on the caller's own rows; the unread counter moves by the rows changed
+    def _mark_read(self, queryset):
+        changed = queryset.filter(user=self.request.user, is_read=False).update(is_read=True, updated_at=timezone.now())
+        adjust_unread([self.request.user.pk], -changed)
+        return changed
 
     @decorators.action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
-        try:
-            notif = self.get_object()
-            notif.is_read = True
-            notif.save()
-            return Response({'status': 'marked read'})
-        except Exception:
-            return Response({'error': 'Could not mark as read'}, status=400)
+        if not self._mark_read(Notification.objects.filter(pk=pk)) and not Notification.objects.filter(pk=pk, user=request.user).exists():
+            return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'status': 'marked read'})
 
+    # POST /notifications/mark_read/ {"ids": [...]} - bulk version of the detail action
+    @decorators.action(detail=False, methods=['post'], url_path='mark_read', url_name='mark-read-many')
+    def mark_read_many(self, request):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids) or len(ids) > 1000:
+            return Response({'error': 'ids must be a list of at most 1000 integers'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'marked': self._mark_read(Notification.objects.filter(pk__in=ids))})
 
-class CommentViewSet(viewsets.ModelViewSet):
+    @decorators.action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        return Response({'marked': self._mark_read(Notification.objects.all())})
+
+    # GET /notifications/unread_count/ - the badge number from the materialized counter
+    @decorators.action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread': unread_count(request.user.pk)})
+
+
+class CommentViewSet(PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    cursor_ordering = ('created_at', 'id')
 
 class DeviceViewSet(viewsets.ModelViewSet):
     queryset = Device.objects.all()
@@ -80,6 +351,96 @@ class DeviceViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class SubmissionViewSet(AggregateValidatorsMixin, UserScopedMixin, viewsets.ModelViewSet):
+    queryset = Submission.objects.all()
+    serializer_class = SubmissionSerializer
+    owner_field = 'student'
+    cursor_ordering = ('-submitted_at', '-id')
+    filterset_fields = ['project', 'student']
+
+    def perform_create(self, serializer):
+        serializer.save(student=self.request.user)
+
+    # GET /submissions/export/?output=csv|ndjson&course=&project= - streamed with constant memory
+    @decorators.action(detail=False, methods=['get'])
+    def export(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in ('csv', 'ndjson'):
+            return Response({'error': 'output must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            course_id = int(request.query_params['course']) if request.query_params.get('course') else None
+        except ValueError:
+            return Response({'error': 'course must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
+        if course_id is not None:
+            queryset = queryset.filter(project__course_id=course_id)
+        storage = Submission._meta.get_field('submitted_file').storage
+        rows = gradebook.export_rows(queryset, lambda name: request.build_absolute_uri(storage.url(name)))
+        content_type = 'text/csv' if output == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(gradebook.stream_export(rows, output), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="submissions.{output}"'
+        response['X-Accel-Buffering'] = 'no'
+        return streaming.for_server(request, response)
+
+
+class QuizViewSet(PlannedQuerysetMixin, SummaryListMixin, viewsets.ModelViewSet):
+    queryset = Quiz.objects.all()
+    serializer_class = QuizSerializer
+    summary_serializer_class = QuizSummarySerializer
+
+    def get_serializer_class(self):
+        if self.action in ('document', 'bulk'):
+            return QuizDocumentSerializer
+        return super().get_serializer_class()
+
+    def document_response(self, quizzes, many=False, status_code=status.HTTP_200_OK):
+        queryset = Quiz.objects.filter(pk__in=[q.pk for q in quizzes]).prefetch_related('questions__choices')
+        data = QuizDocumentSerializer(queryset if many else queryset.get(), many=many, context=self.get_serializer_context()).data
+        return Response(data, status=status_code)
+
+    # GET/PUT/PATCH /quizzes/<id>/document/ - read or diff-update the whole quiz in one request (staff: it holds the answer key)
+    @decorators.action(detail=True, methods=['get', 'put', 'patch'], permission_classes=[permissions.IsAdminUser])
+    def document(self, request, pk=None):
+        quiz = self.get_object()
+        if request.method == 'GET':
+            return self.document_response([quiz])
+        serializer = self.get_serializer(quiz, data=request.data, partial=request.method == 'PATCH')
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return self.document_response([quiz])
+
+    # POST /quizzes/bulk/ - create one quiz document or a list of them atomically (staff)
+    @decorators.action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk(self, request):
+        many = isinstance(request.data, list)
+        serializer = self.get_serializer(data=request.data, many=many)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            saved = serializer.save()
+        return self.document_response(saved if many else [saved], many=many, status_code=status.HTTP_201_CREATED)
+
+
+    # POST /quizzes/<id>/submit/ {"answers": [choice ids]} - graded against the cached answer key
+    @decorators.action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def submit(self, request, pk=None):
+        serializer = QuizAttemptSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not str(pk).isdigit():
+            raise Http404
+        try:
+            attempt = scoring.submit_attempt(int(pk), request.user, serializer.validated_data['answers'])
+        except scoring.InvalidAnswers as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(QuizAttemptSerializer(attempt).data, status=status.HTTP_201_CREATED)
+
+
+class QuizAttemptViewSet(UserScopedMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = QuizAttempt.objects.all()
+    serializer_class = QuizAttemptSerializer
+    owner_field = 'user'
+    filterset_fields = ['quiz']
+    cursor_ordering = ('-submitted_at', '-id')
+
 class LessonAttachmentViewSet(viewsets.ModelViewSet):
     queryset = LessonAttachment.objects.all()
     serializer_class = LessonAttachmentSerializer
@@ -91,11 +452,70 @@ class LessonAttachmentViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+class UploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    # Resumable uploads: POST {target, filename, total_size} -> PUT <id>/chunk/ with Upload-Offset and
+    # Upload-Checksum: sha256 <hex> (resume from `received` after a drop) -> POST <id>/commit/ with the
+    # attachment/submission fields. GET <id>/ reports progress, DELETE <id>/ abandons the upload.
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    commit_fields = {
+        'lesson_attachment': (LessonAttachmentSerializer, 'file'),
+        'submission': (SubmissionSerializer, 'submitted_file'),
+    }
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        uploads.discard(instance)
+
+    @decorators.action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return Response({'error': 'Upload-Offset and Content-Length headers are required'}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            session = self.get_queryset().select_for_update().filter(pk=self.kwargs['pk']).first()
+            if session is None:
+                raise Http404
+            try:
+                digest = uploads.parse_checksum(request.headers.get('Upload-Checksum'))
+                received = uploads.append_chunk(session, request.stream, offset, length, digest)
+            except uploads.ChunkError as exc:
+                return Response({'error': str(exc), 'received': session.received}, status=exc.status)
+        return Response({'id': session.pk, 'received': received, 'total_size': session.total_size})
+
+    @decorators.action(detail=True, methods=['post'])
+    def commit(self, request, pk=None):
+        session = self.get_object()
+        serializer_class, file_field = self.commit_fields[session.target]
+        try:
+            part = uploads.committed_file(session)
+        except uploads.ChunkError as exc:
+            return Response({'error': str(exc), 'received': session.received}, status=exc.status)
+        data = {key: value for key, value in request.data.items() if key != file_field}
+        data[file_field] = part
+        extra = {}
+        if session.target == 'submission':
+            data.setdefault('student_name', request.user.username)
+            extra['student'] = request.user
+        serializer = serializer_class(data=data, context=self.get_serializer_context())
+        try:
+            serializer.is_valid(raise_exception=True)
+            serializer.save(**extra)
+        finally:
+            part.close()
+        uploads.discard(session)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
 # Standard ViewSets
-class LessonViewSet(viewsets.ModelViewSet): queryset = Lesson.objects.all(); serializer_class = LessonSerializer
+class LessonViewSet(FastListMixin, PlannedQuerysetMixin, SummaryListMixin, viewsets.ModelViewSet): queryset = Lesson.objects.all(); serializer_class = LessonSerializer; summary_serializer_class = LessonSummarySerializer; cursor_ordering = ('course_id', 'order', 'id')
 class ProjectViewSet(viewsets.ModelViewSet): queryset = Project.objects.all(); serializer_class = ProjectSerializer
-class SubmissionViewSet(viewsets.ModelViewSet): queryset = Submission.objects.all(); serializer_class = SubmissionSerializer
-class QuizViewSet(viewsets.ModelViewSet): queryset = Quiz.objects.all(); serializer_class = QuizSerializer
-class QuestionViewSet(viewsets.ModelViewSet): queryset = Question.objects.all(); serializer_class = QuestionSerializer
+class QuestionViewSet(PlannedQuerysetMixin, viewsets.ModelViewSet): queryset = Question.objects.all(); serializer_class = QuestionSerializer
 class ChoiceViewSet(viewsets.ModelViewSet): queryset = Choice.objects.all(); serializer_class = ChoiceSerializer
-class AnnouncementViewSet(viewsets.ModelViewSet): queryset = Announcement.objects.all(); serializer_class = AnnouncementSerializer
\ No newline at end of file
+class AnnouncementViewSet(viewsets.ModelViewSet): queryset = Announcement.objects.all(); serializer_class = AnnouncementSerializer; cursor_ordering = ('-posted_at', '-id')
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 import mimetypes
+import sys
 import dj_database_url
 from pathlib import Path
 
@@ -48,12 +49,17 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
+    'django_filters',
     'corsheaders',
     'api',
 ]
 
 MIDDLEWARE = [
+    # Opt-in via API_INSTRUMENTATION; outermost so its total covers every other middleware
+    'api.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Routes safe-method API reads to the read replica when REPLICA_DATABASE_URL is set
+    'api.replica.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     # WhiteNoise serves static files directly from Gunicorn in production
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -99,6 +105,148 @@ DATABASES = {
     )
 }
 
+# Optional read replica (api/replica.py): safe-method API reads go to 'replica', writes and the
+# reads of clients that wrote in the last STICKY_SECONDS go to 'default'. For a local test,
+# copy db.sqlite3 and point REPLICA_DATABASE_URL at the copy (a replica that never catches up).
+# `manage.py test` always gets a 'replica' alias mirroring the test database, routing switched off;
+# the routing tests enable it and check which connection served each query.
+TESTING = sys.argv[1:2] == ['test']
+if os.environ.get('REPLICA_DATABASE_URL'):
+    DATABASES['replica'] = dj_database_url.parse(os.environ['REPLICA_DATABASE_URL'], conn_max_age=600, conn_health_checks=True)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+elif TESTING:
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['api.replica.ReplicaRouter']
+API_REPLICA = {
+    'ENABLED': 'replica' in DATABASES and not TESTING,
+    'ALIAS': 'replica',
+    'STICKY_SECONDS': int(os.environ.get('API_REPLICA_STICKY_SECONDS', '15')),
+    'CACHE_ALIAS': 'default',
+}
+
+# CACHE
+# CACHE_BACKEND=db (default; `createcachetable` in build.sh), file (CACHE_LOCATION directory) or
+# locmem. locmem is per process: web workers, runworker and management commands would each see
+# their own version stamps, so the response cache and shared auth tier switch off with it.
+# 'default' holds payloads and other expiring entries and culls past CACHE_MAX_ENTRIES (culling
+# drops keys in alphabetical order, whatever they are). 'stamps' holds version stamps, hit/miss
+# counters and token revocations, a few entries per course, quiz and user, and never culls.
+_cache_backends = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'eduforge'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, '.cache'))),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'api_cache'),
+}
+_cache_class, _cache_location = _cache_backends[os.environ.get('CACHE_BACKEND', 'db')]
+CACHES = {
+    'default': {
+        'BACKEND': _cache_class,
+        'LOCATION': _cache_location,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '100000'))},
+    },
+    'stamps': {
+        'BACKEND': _cache_class,
+        'LOCATION': f'{_cache_location}_stamps',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': sys.maxsize},
+    },
+}
+
+# Versioned course payload cache (see api/cache.py); payloads in ALIAS, version stamps in STAMPS_ALIAS,
+# both on a shared backend
+API_RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('API_RESPONSE_CACHE', 'True') == 'True',
+    'ALIAS': 'default',
+    'STAMPS_ALIAS': 'stamps',
+    'TIMEOUT': int(os.environ.get('API_RESPONSE_CACHE_TIMEOUT', '3600')),
+}
+
+# Delta sync (/api/sync/): rows younger than SETTLE_SECONDS wait for the next sync so
+# late-committing transactions are never skipped. Tombstones are purged after TOMBSTONE_DAYS
+# (see API_RETENTION); an older cursor gets 410 and the device syncs from scratch.
+API_SYNC = {
+    'SETTLE_SECONDS': int(os.environ.get('API_SYNC_SETTLE_SECONDS', '2')),
+    'PAGE_LIMIT': 500,
+    'MAX_LIMIT': 2000,
+    'TOMBSTONE_DAYS': 180,
+}
+
+# Authorized media delivery (api/media.py). SENDFILE: '' streams from Python, 'x-accel-redirect'
+# (nginx, internal location at ACCEL_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile' (Apache/lighttpd).
+API_MEDIA = {
+    'SENDFILE': os.environ.get('MEDIA_SENDFILE', ''),
+    'ACCEL_PREFIX': os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/'),
+    'LINK_MAX_AGE': 3600,
+}
+
+# Background tasks (api/tasks.py): 'database' queues api.Job rows for `manage.py runworker`,
+# 'thread' runs jobs on an in-process pool after commit, 'immediate' runs them inline after commit.
+API_TASKS = {
+    'BACKEND': os.environ.get('API_TASKS_BACKEND', 'database'),
+    'THREADS': int(os.environ.get('API_TASKS_THREADS', '2')),
+}
+
+# Job queue (api/jobs.py); retries back off from RETRY_BASE_SECONDS doubling up to RETRY_MAX_SECONDS.
+# Running jobs refresh their lock every HEARTBEAT_SECONDS; a lock older than LOCK_TIMEOUT means a dead worker.
+API_JOBS = {
+    'BATCH_SIZE': 5,
+    'POLL_INTERVAL': float(os.environ.get('API_JOBS_POLL_INTERVAL', '1.0')),
+    'LOCK_TIMEOUT': 600,
+    'HEARTBEAT_SECONDS': 60,
+    'RETRY_BASE_SECONDS': 10,
+    'RETRY_MAX_SECONDS': 3600,
+}
+
+# Push delivery (api/push.py); api.push.LocMemTransport records messages instead of sending them
+API_PUSH = {
+    'TRANSPORT': os.environ.get('API_PUSH_TRANSPORT', 'api.push.ExpoTransport'),
+    'ACCESS_TOKEN': os.environ.get('EXPO_ACCESS_TOKEN') or None,
+}
+
+# Live events (/api/events/, ASGI only). BACKEND: api.events.PostgresBackend (LISTEN/NOTIFY),
+# api.events.PollingBackend (any database) or api.events.LocalBackend (one process, and only with
+# the 'thread'/'immediate' task backends: runworker publishes from another process).
+_events_backend = 'PostgresBackend' if 'postgresql' in DATABASES['default']['ENGINE'] else 'PollingBackend'
+API_EVENTS = {
+    'BACKEND': os.environ.get('API_EVENTS_BACKEND', f'api.events.{_events_backend}'),
+    'POLL_SECONDS': 2,
+    'HEARTBEAT_SECONDS': 20,
+}
+
+# Per-request SQL/timing instrumentation (api/instrumentation.py): Server-Timing header plus a sampled
+# JSON log line for requests slower than SLOW_MS or repeating one statement REPEAT_THRESHOLD times
+API_INSTRUMENTATION = {
+    'ENABLED': os.environ.get('API_INSTRUMENTATION', 'False') == 'True',
+    'SERVER_TIMING': os.environ.get('API_SERVER_TIMING', 'True') == 'True',
+    'SLOW_MS': int(os.environ.get('API_SLOW_MS', '500')),
+    'LOG_SAMPLE_RATE': float(os.environ.get('API_SLOW_LOG_SAMPLE_RATE', '0.1')),
+    'REPEAT_THRESHOLD': 5,
+}
+
+# Fast list path for courses, lessons and notifications (api/fastjson.py): .values() rows encoded
+# by orjson (stdlib fallback), byte-identical to the serializer output
+API_FAST_JSON = {
+    'ENABLED': os.environ.get('API_FAST_JSON', 'False') == 'True',
+}
+
+# Retention (`manage.py purge_expired`): action 'archive' keeps a JSON copy in api.ArchivedRow, 'delete' drops rows
+API_RETENTION = {
+    'POLICIES': {
+        'read_notifications': {'model': 'api.Notification', 'filter': {'is_read': True}, 'age_field': 'created_at', 'days': 90, 'action': 'delete'},
+        'unread_notifications': {'model': 'api.Notification', 'filter': {'is_read': False}, 'age_field': 'created_at', 'days': 365, 'action': 'archive'},
+        'comments': {'model': 'api.Comment', 'age_field': 'created_at', 'days': 3 * 365, 'action': 'archive'},
+        'done_jobs': {'model': 'api.Job', 'filter': {'status': 'done'}, 'age_field': 'updated_at', 'days': 7, 'action': 'delete'},
+        'failed_jobs': {'model': 'api.Job', 'filter': {'status': 'failed'}, 'age_field': 'updated_at', 'days': 30, 'action': 'delete'},
+        'tombstones': {'model': 'api.Tombstone', 'age_field': 'deleted_at', 'days': API_SYNC['TOMBSTONE_DAYS'], 'action': 'delete'},
+    },
+}
+
+# Resumable uploads (api/uploads.py): part files live here until committed
+CHUNKED_UPLOADS = {
+    'DIR': os.environ.get('CHUNKED_UPLOAD_DIR', ''),
+    'MAX_SIZE': int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', str(2 * 1024 ** 3))),
+    'MAX_AGE_HOURS': 24,
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -137,6 +285,39 @@ SECURE_HSTS_SECONDS = int(os.environ.get('SECURE_HSTS_SECONDS', '0'))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# The mobile app sends `Authorization: Token <key>` on every request
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.CachedTokenAuthentication',
+        'api.authentication.SignedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.OptInCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', '50')),
+}
+
+# Token auth cache (api/authentication.py). SIGNED_TOKENS adds a stateless "Signed" token to login responses;
+# its revocation stamps live under REVOCATION_ALIAS, which must never cull.
+API_AUTH = {
+    'CACHE_ALIAS': 'default',
+    'REVOCATION_ALIAS': 'stamps',
+    'CACHE_TTL': 300,
+    'LOCAL_TTL': int(os.environ.get('API_AUTH_LOCAL_TTL', '30')),
+    'LOCAL_MAX_ENTRIES': 10000,
+    'SIGNED_TOKENS': os.environ.get('API_SIGNED_TOKENS', 'False') == 'True',
+    'SIGNED_TOKEN_MAX_AGE': int(os.environ.get('API_SIGNED_TOKEN_MAX_AGE', '900')),
+}
+
+# Cursor pagination is opt-in per request (?paginate=cursor) until the mobile client has migrated.
+# REQUIRED lists router basenames (e.g. "notification,comment") that always paginate.
+API_CURSOR_PAGINATION = {
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', '50')),
+    'MAX_PAGE_SIZE': int(os.environ.get('API_MAX_PAGE_SIZE', '200')),
+    'REQUIRED': [b.strip() for b in os.environ.get('API_CURSOR_PAGINATION_REQUIRED', '').split(',') if b.strip()],
+}
+
 CORS_ALLOWED_ORIGINS = [
     "https://finalsexam-1.onrender.com", # Your FRONTEND URL (no trailing slash)
 ]
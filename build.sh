@@ -9,4 +9,7 @@ pip install -r requirements.txt
 python manage.py collectstatic --no-input
 
 # Run migrations
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# Tables for CACHE_BACKEND=db, payloads and stamps (no-op for other backends)
+python manage.py createcachetable
\ No newline at end of file